@@ -0,0 +1,379 @@
+"""Cross-run analytics over many finished runs (workspaces or archives).
+
+Each run is read once into columnar NumPy arrays:
+    agent, changes       per log entry: the agent that made it, objects it touched
+    rejects, fixes       per final statement: validation issues and responses
+    edits, status        per final statement: entries that modified it, final status
+    run                  [entries, solved, steps to solve (-1 if unsolved)]
+and the aggregates are computed over the concatenated arrays. Runs are
+read in parallel (a process pool) and each run's arrays are cached in
+contents/cache/analytics/ of the current workspace under a hash of its
+path and stored log (see cache_key()), so analysing the same folder again
+only reads the new and changed runs.
+
+The log does not say which agent made a commit; it is told from what the
+commit changed, after the skills each agent uses (see Readme.md):
+    initialize   creates the root problem
+    solve        creates or updates a problem (incl. linking a new statement to it)
+    check        moves a validating statement to true/false, or records validation issues
+    fix          records validation responses
+    prove        any other statement change (proofs, sub-statements, mark-false)
+Field changes are read from the backups: an entry's backup holds an
+object before the entry, the next backup (or the final object) after it.
+
+Usage:
+    python src/analytics.py runs/ [more runs, workspaces or .mra archives] [--workers 8] [--json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
+
+import numpy as np
+
+from archive import ARCHIVE_SUFFIX, LAYOUT, LOG_NAME, MANIFEST_NAME, Archive, member_name
+from cus_types_main import type_log_segment
+from log_store import iter_lines, read_manifest, segment_file
+from utils import add_workspace_argument, get_log_id_from_entry, get_workspace, set_workspace
+
+
+# Bump when the per-run arrays change: older cache entries are then ignored
+ANALYTICS_VERSION = 1
+
+CACHE_SUBFOLDER = "analytics"
+
+AGENTS = ["initialize", "solve", "prove", "check", "fix", "other"]
+STATEMENT_STATUSES = ["pending", "validating", "true", "false", "abandoned", "other"]
+
+# The root problem created by prob_init.py; the run is solved once it is resolved
+ROOT_PROBLEM = "p-001"
+
+
+class WorkspaceRun:
+    """A workspace read through the same calls as an Archive (member names relative to the root)."""
+
+    def __init__(self, root: str):
+        self.workspace = get_workspace(root)
+
+    def close(self) -> None:
+        pass
+
+    def names(self, prefix: str = "") -> list[str]:
+        folder = os.path.join(self.workspace.root, prefix)
+        if not os.path.isdir(folder):
+            return []
+        return [member_name(os.path.join(folder, name), self.workspace) for name in os.listdir(folder)]
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.workspace.root, name), "rb") as f:
+            return f.read()
+
+    def load_json(self, name: str) -> dict:
+        return json.loads(self.read(name))
+
+    def segments(self) -> list[type_log_segment]:
+        return read_manifest(self.workspace)
+
+    def iter_lines(self) -> Iterator[str]:
+        return iter_lines(workspace=self.workspace)
+
+
+def find_runs(paths: list[str]) -> list[str]:
+    """Runs given directly (workspace folder or archive) or found one level below a folder."""
+    runs = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(path) or os.path.exists(os.path.join(path, "contents", "config.json")):
+            runs.append(path)
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                child = os.path.join(path, name)
+                if name.endswith(ARCHIVE_SUFFIX) and os.path.isfile(child):
+                    runs.append(child)
+                elif os.path.exists(os.path.join(child, "contents", "config.json")):
+                    runs.append(child)
+    return list(dict.fromkeys(runs))
+
+
+def open_run(path: str) -> Archive | WorkspaceRun:
+    return Archive(path) if os.path.isfile(path) else WorkspaceRun(path)
+
+
+def cache_key(path: str, run: Archive | WorkspaceRun) -> str:
+    """Hash of a run's path, stored log and last write.
+
+    Log lines only list object ids, so runs of the same shape have the same
+    log: the path tells runs apart, and the size and time of config.json
+    (rewritten by every commit and rewind) or of the archive tell a run that
+    changed in place.
+    """
+    h = hashlib.sha1(f"analytics-{ANALYTICS_VERSION}:{path}".encode())
+    for segment in run.segments():
+        h.update(run.read(member_name(segment_file(segment, LAYOUT))))
+    for name in (MANIFEST_NAME, LOG_NAME):
+        try:
+            h.update(run.read(name))
+        except FileNotFoundError:
+            pass
+    stat = os.stat(path if os.path.isfile(path) else get_workspace(path).config_path)
+    h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _load(run: Archive | WorkspaceRun, name: str) -> dict | None:
+    try:
+        return run.load_json(name)
+    except FileNotFoundError:
+        return None
+
+
+def _object_name(obj_id: str) -> str:
+    return member_name(os.path.join(LAYOUT.object_folders[obj_id.split("-")[0]], f"{obj_id}.json"))
+
+
+def _backup_name(log_id: str, obj_id: str) -> str:
+    return member_name(os.path.join(LAYOUT.history_folder, log_id, f"{obj_id}.json"))
+
+
+def _statement_agent(before: dict, after: dict | None) -> str:
+    """Agent of one statement update, from its versions before and after."""
+    if after is None:
+        return "prove"
+    old, new = before.get("validation", {}), after.get("validation", {})
+    if len(new.get("issues", [])) > len(old.get("issues", [])):
+        return "check"
+    if before.get("status") == "validating" and after.get("status") in ("true", "false"):
+        return "check"
+    if len(new.get("responses", [])) > len(old.get("responses", [])):
+        return "fix"
+    return "prove"
+
+
+def analyze_run(run: Archive | WorkspaceRun) -> dict[str, np.ndarray]:
+    """Read one run into its columnar arrays (see the module docstring)."""
+    entries = []
+    for line in run.iter_lines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # Torn last line of a crashed append
+        log_id = get_log_id_from_entry(entry)
+        entries.append((log_id, entry[log_id]))
+
+    # Entries that have a backup of an object (it existed before them), in log order
+    backed_up: dict[str, list[int]] = {}
+    for seq, (_, body) in enumerate(entries):
+        for obj_id in body.get("modification", []) + body.get("deletion", []):
+            backed_up.setdefault(obj_id, []).append(seq)
+
+    agent = np.zeros(len(entries), dtype=np.int8)
+    changes = np.zeros(len(entries), dtype=np.int32)
+    position: dict[str, int] = {}
+    solved_at = -1
+    for seq, (log_id, body) in enumerate(entries):
+        created, modified, deleted = body.get("creation", []), body.get("modification", []), body.get("deletion", [])
+        changes[seq] = len(created) + len(modified) + len(deleted)
+        agents = set()
+        if ROOT_PROBLEM in created:
+            agents.add("initialize")
+        elif any(obj_id.startswith("p-") for obj_id in created + modified + deleted):
+            agents.add("solve")
+        if any(obj_id.startswith("s-") for obj_id in created):
+            agents.add("prove")
+        for obj_id in modified + deleted:
+            k = position[obj_id] = position.get(obj_id, -1) + 1
+            if obj_id in deleted or obj_id[0] not in "ps":
+                continue
+            if obj_id[0] == "p" and (obj_id != ROOT_PROBLEM or solved_at >= 0):
+                continue
+            seqs = backed_up[obj_id]
+            before = _load(run, _backup_name(log_id, obj_id)) or {}
+            after = (_load(run, _backup_name(entries[seqs[k + 1]][0], obj_id)) if k + 1 < len(seqs)
+                     else _load(run, _object_name(obj_id)))
+            if obj_id[0] == "s":
+                agents.add(_statement_agent(before, after))
+            elif after and after.get("status") == "resolved" and before.get("status") != "resolved":
+                solved_at = seq
+        agent[seq] = next((AGENTS.index(a) for a in AGENTS if a in agents), AGENTS.index("other"))
+
+    edits: dict[str, int] = {}
+    for _, body in entries:
+        for obj_id in body.get("modification", []):
+            edits[obj_id] = edits.get(obj_id, 0) + 1
+    prefix = member_name(LAYOUT.object_folders["s"]) + "/"
+    statements = [run.load_json(name) for name in sorted(run.names(prefix)) if name.endswith(".json")]
+    root = _load(run, _object_name(ROOT_PROBLEM))
+    solved = bool(root and root.get("status") == "resolved")
+    if solved and solved_at < 0:
+        solved_at = len(entries) - 1  # Resolved when created (never seen changing)
+
+    return {
+        "agent": agent,
+        "changes": changes,
+        "rejects": np.array([len(s.get("validation", {}).get("issues", [])) for s in statements], dtype=np.int32),
+        "fixes": np.array([len(s.get("validation", {}).get("responses", [])) for s in statements], dtype=np.int32),
+        "edits": np.array([edits.get(s["id"], 0) for s in statements], dtype=np.int32),
+        "status": np.array([STATEMENT_STATUSES.index(s.get("status")) if s.get("status") in STATEMENT_STATUSES
+                            else STATEMENT_STATUSES.index("other") for s in statements], dtype=np.int8),
+        "run": np.array([len(entries), solved, solved_at + 1 if solved else -1], dtype=np.int64),
+    }
+
+
+def summarize_run(task: tuple[str, str | None]) -> tuple[str, dict[str, np.ndarray], bool]:
+    """Arrays of one run, from the cache when its log is unchanged.
+
+    Args:
+        task: (run path, cache folder or None for no cache)
+
+    Returns:
+        Tuple of (run path, arrays, True if they came from the cache)
+    """
+    path, cache_folder = task
+    run = open_run(path)
+    try:
+        cache_path = None
+        if cache_folder is not None:
+            key = cache_key(path, run)
+            cache_path = os.path.join(cache_folder, f"run-{key[:16]}.npz")
+            if os.path.exists(cache_path):
+                try:
+                    with np.load(cache_path) as data:
+                        if str(data["key"]) == key:
+                            return path, {name: data[name] for name in data.files if name != "key"}, True
+                except (OSError, ValueError, KeyError):
+                    pass  # Corrupt cache entry: re-read the run and overwrite
+        arrays = analyze_run(run)
+    finally:
+        run.close()
+    if cache_path is not None:
+        os.makedirs(cache_folder, exist_ok=True)
+        temp_path = cache_path + ".tmp.npz"
+        np.savez_compressed(temp_path, key=np.array(key), **arrays)
+        os.replace(temp_path, cache_path)
+    return path, arrays, False
+
+
+def analyze(paths: list[str], workers: int | None = None, use_cache: bool = True) -> tuple[dict, list[str]]:
+    """Per-run arrays of many runs, read across a process pool.
+
+    Returns:
+        Tuple of ({run path: arrays}, paths served from the cache)
+    """
+    cache_folder = os.path.join(get_workspace().cache_folder, CACHE_SUBFOLDER) if use_cache else None
+    results, cached = {}, []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(summarize_run, (path, cache_folder)) for path in paths]
+        for future in as_completed(futures):
+            path, arrays, hit = future.result()
+            results[path] = arrays
+            if hit:
+                cached.append(path)
+    return {path: results[path] for path in paths}, cached
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    if not len(values):
+        return {"mean": 0.0, "p50": 0.0, "p90": 0.0, "max": 0}
+    return {"mean": float(values.mean()), "p50": float(np.percentile(values, 50)),
+            "p90": float(np.percentile(values, 90)), "max": int(values.max())}
+
+
+def build_report(summaries: dict[str, dict[str, np.ndarray]]) -> dict:
+    """Aggregate the per-run arrays."""
+    arrays = list(summaries.values())
+    runs = np.stack([a["run"] for a in arrays]) if arrays else np.zeros((0, 3), dtype=np.int64)
+
+    def column(name: str, dtype) -> np.ndarray:
+        return np.concatenate([a[name] for a in arrays]) if arrays else np.zeros(0, dtype=dtype)
+
+    agent, changes = column("agent", np.int8).astype(np.int64), column("changes", np.int32)
+    rejects, fixes, edits = column("rejects", np.int32), column("fixes", np.int32), column("edits", np.int32)
+    status = column("status", np.int8).astype(np.int64)
+
+    solved = runs[:, 1].astype(bool)
+    commits_by_agent = np.bincount(agent, minlength=len(AGENTS))
+    changes_by_agent = np.bincount(agent, weights=changes, minlength=len(AGENTS))
+    per_run_changes = np.array([a["changes"].sum() for a in arrays], dtype=np.int64)
+    return {
+        "runs": len(arrays),
+        "solved": int(solved.sum()),
+        "solve_rate": float(solved.mean()) if len(arrays) else 0.0,
+        "commits": int(runs[:, 0].sum()),
+        "steps_to_solve": _percentiles(runs[solved, 2]),
+        "statements": {
+            "count": int(len(status)),
+            "status": {s: int(n) for s, n in zip(STATEMENT_STATUSES, np.bincount(status, minlength=len(STATEMENT_STATUSES)))
+                       if n},
+            "rejected": int(np.count_nonzero(rejects)),
+            "cycles": _percentiles(rejects[rejects > 0]),
+            "unanswered": int(np.count_nonzero(rejects > fixes)),
+            "edits": _percentiles(edits),
+        },
+        "agents": {
+            name: {"commits": int(commits_by_agent[i]), "changes": int(changes_by_agent[i]),
+                   "share": float(changes_by_agent[i] / max(changes.sum(), 1))}
+            for i, name in enumerate(AGENTS) if commits_by_agent[i]
+        },
+        "changes_per_run": _percentiles(per_run_changes),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"Runs: {report['runs']} ({report['solved']} solved, solve rate {report['solve_rate']:.1%}), "
+          f"{report['commits']} commits")
+    steps = report["steps_to_solve"]
+    print(f"Steps to solve: mean {steps['mean']:.1f}, p50 {steps['p50']:.0f}, p90 {steps['p90']:.0f}, "
+          f"max {steps['max']}")
+    statements = report["statements"]
+    print(f"Statements: {statements['count']} (" + ", ".join(f"{s} {n}" for s, n in statements["status"].items())
+          + ")")
+    cycles = statements["cycles"]
+    print(f"Reject/fix cycles: {statements['rejected']} statements rejected at least once, "
+          f"mean {cycles['mean']:.2f} / max {cycles['max']} cycles each, {statements['unanswered']} unanswered")
+    print(f"{'agent':<12}{'commits':>9}{'changes':>9}{'share':>8}")
+    for name, a in report["agents"].items():
+        print(f"{name:<12}{a['commits']:>9}{a['changes']:>9}{a['share']:>8.1%}")
+    churn = report["changes_per_run"]
+    print(f"Object changes per run: mean {churn['mean']:.1f}, p90 {churn['p90']:.0f}, max {churn['max']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve rates, steps, reject/fix cycles and churn across runs")
+    parser.add_argument('paths', nargs='+',
+                        help='Workspace folders, .mra archives, or folders holding them (e.g. an orchestrator --root)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-read every run (the cache is not read or written)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    paths = find_runs(args.paths)
+    if not paths:
+        print("Error: no runs found (workspace folders with contents/config.json, or .mra archives)",
+              file=sys.stderr)
+        sys.exit(1)
+    start = time.perf_counter()
+    try:
+        summaries, cached = analyze(paths, args.workers, use_cache=not args.no_cache)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    report = build_report(summaries)
+    print(f"Read {len(paths) - len(cached)} runs, {len(cached)} from the cache, "
+          f"in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
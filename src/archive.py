@@ -0,0 +1,328 @@
+"""Single-file archive of a run: objects, history, log and config.
+
+Copying a run as files means copying thousands of small files; an archive
+is one file that can be copied, piped or opened where it is:
+    MAGIC
+    record*       RECORD header (name length, size, crc32), name, file bytes
+    end record    a RECORD header with name length 0
+    index         JSON list of [name, offset, size, crc32]
+    TRAILER       index offset, index length, MAGIC
+
+Files are stored as they are (log segments are already gzipped), so
+Archive maps the archive and reads any member as a slice of the map
+through the index, while import_run() unpacks from a plain stream (a pipe,
+stdin) front to back without seeking. config.json is packed last: an
+interrupted import leaves no config.json and can simply be run again.
+
+Packed: puzzle.md, the object folders, history/ (backups and the hot log),
+log_segments/ and config.json. Indexes and caches are rebuilt on first
+use; the event spool and the redo stack belong to the live run and are
+left out.
+
+Usage:
+    python src/archive.py --export run-07.mra        ('-': write to stdout)
+    python src/archive.py --import run-07.mra --workspace /tmp/run-07   ('-': read from stdin)
+    python src/archive.py --list run-07.mra | --verify run-07.mra
+    python src/current.py --archive run-07.mra       status of an archived run
+"""
+import argparse
+import gzip
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import BinaryIO, Iterator
+
+from cus_types_main import type_archive_member, type_archive_report, type_log_segment
+from log_store import log_tail, manifest_path, segment_file, uncovered_lines
+from utils import IDManager, Workspace, add_workspace_argument, get_workspace, set_workspace
+
+
+MAGIC = b"MRARUN01"
+RECORD = struct.Struct("<HQI")  # name length, size, crc32
+TRAILER = struct.Struct("<QQ8s")  # index offset, index length, MAGIC
+ARCHIVE_SUFFIX = ".mra"
+
+# Import copies member bytes through this buffer
+CHUNK_BYTES = 1024 * 1024
+
+# Member names are paths relative to the workspace root, the same for every workspace
+LAYOUT = Workspace(os.sep)
+
+
+def member_name(path: str, workspace: Workspace = LAYOUT) -> str:
+    return os.path.relpath(path, workspace.root).replace(os.sep, "/")
+
+
+CONFIG_NAME = member_name(LAYOUT.config_path)
+LOG_NAME = member_name(LAYOUT.log_path)
+MANIFEST_NAME = member_name(manifest_path(LAYOUT))
+
+
+def _member_paths(workspace: Workspace) -> list[str]:
+    """Files to pack, in archive order (config.json last)."""
+    paths = [workspace.puzzle_path] if os.path.exists(workspace.puzzle_path) else []
+    for folder in list(workspace.object_folders.values()) + [workspace.history_folder, workspace.segments_folder]:
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames.sort()
+            paths += [os.path.join(dirpath, name) for name in sorted(filenames) if not name.endswith(".tmp")]
+    return paths + [workspace.config_path]
+
+
+def _pack(stream: BinaryIO, workspace: Workspace) -> list[type_archive_member]:
+    stream.write(MAGIC)
+    offset, members = len(MAGIC), []
+    for path in _member_paths(workspace):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue  # Removed by a commit since the walk; export_run() notices it
+        name = member_name(path, workspace)
+        encoded, crc = name.encode(), zlib.crc32(data)
+        stream.write(RECORD.pack(len(encoded), len(data), crc))
+        stream.write(encoded)
+        stream.write(data)
+        offset += RECORD.size + len(encoded)
+        members.append(type_archive_member(name=name, offset=offset, size=len(data), crc=crc))
+        offset += len(data)
+
+    stream.write(RECORD.pack(0, 0, 0))
+    index = json.dumps([[m.name, m.offset, m.size, m.crc] for m in members]).encode()
+    stream.write(index)
+    stream.write(TRAILER.pack(offset + RECORD.size, len(index), MAGIC))
+    return members
+
+
+def export_run(target: str | BinaryIO, workspace: Workspace | None = None) -> type_archive_report:
+    """Pack a run into one archive.
+
+    Args:
+        target: Archive path, or a binary stream (e.g. sys.stdout.buffer)
+        workspace: Defaults to the current workspace
+
+    Raises:
+        ValueError: If the workspace holds no run, or commits were made during the export
+    """
+    start = time.perf_counter()
+    workspace = workspace or get_workspace()
+    if not os.path.exists(workspace.config_path):
+        raise ValueError(f"{workspace.root} holds no run (no contents/config.json)")
+    log_id, _, _ = log_tail(workspace)
+
+    if isinstance(target, str):
+        with open(target + ".tmp", "wb") as f:
+            members = _pack(f, workspace)
+    else:
+        members = _pack(target, workspace)
+    if log_tail(workspace)[0] != log_id:
+        if isinstance(target, str):
+            os.remove(target + ".tmp")
+        raise ValueError(f"{workspace.root} was committed to during the export; export it again when it is idle")
+    if isinstance(target, str):
+        os.replace(target + ".tmp", target)
+    return type_archive_report(log_id=log_id, members=len(members), bytes=sum(m.size for m in members),
+                               seconds=time.perf_counter() - start)
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    while len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            raise ValueError("The archive is truncated")
+        data += more
+    return data
+
+
+def _target_path(workspace: Workspace, name: str) -> str:
+    """Where a member goes; only puzzle.md and files under contents/ are accepted."""
+    path = os.path.normpath(os.path.join(workspace.root, name))
+    if os.path.isabs(name) or (not path.startswith(workspace.contents + os.sep) and path != workspace.puzzle_path):
+        raise ValueError(f"Unexpected member {name!r} in the archive")
+    return path
+
+
+def import_run(source: str | BinaryIO, workspace: Workspace | None = None) -> type_archive_report:
+    """Unpack an archive into a workspace, reading it front to back.
+
+    Args:
+        source: Archive path, or a binary stream (e.g. sys.stdin.buffer)
+        workspace: Defaults to the current workspace
+
+    Raises:
+        ValueError: If the workspace already holds a run, or the archive is
+            not one, truncated or damaged
+    """
+    workspace = workspace or get_workspace()
+    if os.path.exists(workspace.config_path):
+        raise ValueError(f"{workspace.root} already holds a run (contents/config.json exists)")
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return import_run(f, workspace)
+
+    start = time.perf_counter()
+    if source.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a run archive")
+    report = type_archive_report()
+    while True:
+        name_length, size, crc = RECORD.unpack(_read_exact(source, RECORD.size))
+        if name_length == 0:
+            break
+        name = _read_exact(source, name_length).decode()
+        path = _target_path(workspace, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        check, left = 0, size
+        with open(path, "wb") as f:
+            while left:
+                chunk = _read_exact(source, min(left, CHUNK_BYTES))
+                check = zlib.crc32(chunk, check)
+                f.write(chunk)
+                left -= len(chunk)
+        if check != crc:
+            os.remove(path)
+            raise ValueError(f"{name} is damaged in the archive (checksum mismatch)")
+        report.members += 1
+        report.bytes += size
+
+    IDManager._instances.pop(workspace.root, None)
+    report.log_id = log_tail(workspace)[0]
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+class Archive:
+    """Read-only view of an archive; members are read in place through the index.
+
+    Raises:
+        ValueError: If the file is not a complete run archive
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        try:
+            if len(self._map) < len(MAGIC) + TRAILER.size or self._map[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a run archive")
+            index_offset, index_length, magic = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is incomplete (no index)")
+            rows = json.loads(self._map[index_offset:index_offset + index_length])
+        except ValueError:
+            self.close()
+            raise
+        self.members = {row[0]: type_archive_member(*row) for row in rows}
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def names(self, prefix: str = "") -> list[str]:
+        return [name for name in self.members if name.startswith(prefix)]
+
+    def read(self, name: str) -> bytes:
+        """Bytes of one member.
+
+        Raises:
+            FileNotFoundError: If the archive has no such member
+        """
+        member = self.members.get(name)
+        if member is None:
+            raise FileNotFoundError(f"{name} is not in {self.path}")
+        return self._map[member.offset:member.offset + member.size]
+
+    def load_json(self, name: str) -> dict:
+        return json.loads(self.read(name))
+
+    def config(self) -> dict:
+        return self.load_json(CONFIG_NAME)
+
+    def load_objects(self, obj_type: str) -> list[dict]:
+        """All objects of a type ("p", "s" or "e"), sorted by id."""
+        prefix = member_name(LAYOUT.object_folders[obj_type]) + "/"
+        objects = [self.load_json(name) for name in self.names(prefix) if name.endswith(".json")]
+        objects.sort(key=lambda x: x["id"])
+        return objects
+
+    def segments(self) -> list[type_log_segment]:
+        """Cold log segments in log order (see log_store.read_manifest)."""
+        if MANIFEST_NAME not in self.members:
+            return []
+        return [type_log_segment(**segment) for segment in self.load_json(MANIFEST_NAME)["segments"]]
+
+    def iter_lines(self) -> Iterator[str]:
+        """Raw lines of the archived log, in order (see log_store.iter_lines)."""
+        segments = self.segments()
+        for segment in segments:
+            yield from io.StringIO(gzip.decompress(self.read(member_name(segment_file(segment, LAYOUT)))).decode())
+        if LOG_NAME in self.members:
+            yield from uncovered_lines(io.StringIO(self.read(LOG_NAME).decode()), segments[-1].last if segments else None)
+
+    def verify(self) -> list[str]:
+        """Names of the members whose bytes no longer match their checksum."""
+        return [name for name, member in self.members.items() if zlib.crc32(self.read(name)) != member.crc]
+
+
+def print_report(action: str, report: type_archive_report, file=sys.stdout) -> None:
+    print(f"{action} {report.members} files ({report.bytes} bytes) up to {report.log_id} "
+          f"in {report.seconds:.2f} s", file=file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a run to a single archive, or import one")
+    parser.add_argument('--export', type=str, metavar='FILE',
+                        help="Pack the workspace's run into FILE ('-' for stdout)")
+    parser.add_argument('--import', dest='import_', type=str, metavar='FILE',
+                        help="Unpack FILE ('-' for stdin) into the workspace, which must not hold a run")
+    parser.add_argument('--list', type=str, metavar='FILE',
+                        help='Show the files packed in FILE')
+    parser.add_argument('--verify', type=str, metavar='FILE',
+                        help='Check every file in FILE against its checksum')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    try:
+        if args.export:
+            if args.export == "-":
+                # The archive goes to stdout
+                print_report("Exported", export_run(sys.stdout.buffer), file=sys.stderr)
+            else:
+                print_report("Exported", export_run(args.export))
+        elif args.import_:
+            print_report("Imported", import_run(sys.stdin.buffer if args.import_ == "-" else args.import_))
+        elif args.list or args.verify:
+            with Archive(args.list or args.verify) as archive:
+                if args.list:
+                    for member in archive.members.values():
+                        print(f"  {member.name}  {member.size} bytes")
+                    print(f"{len(archive.members)} files, run at {archive.config().get('l', 'l-000')}")
+                else:
+                    damaged = archive.verify()
+                    for name in damaged:
+                        print(f"  damaged: {name}")
+                    print(f"{len(archive.members) - len(damaged)} of {len(archive.members)} files intact")
+                    if damaged:
+                        sys.exit(1)
+        else:
+            parser.print_help()
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,224 @@
+"""End-to-end throughput benchmark.
+
+Generates puzzles (puzzle_gen.py) and plays each one through the real CLIs
+with a scripted stand-in for the agents, each in its own fresh workspace
+(see utils.Workspace; the live contents/ is never touched), several puzzles
+at once across a process pool:
+
+    prob_init.py --puzzle                       initializer
+    current.py                                  status check
+    state.py (create, then --status validating) prover, one claim per player
+    prob.py --progresses append                 link the claim to the problem
+    state.py --status true                      checker confirms
+    prob.py --status resolved                   solver finishes up
+    current.py                                  final status
+
+The stand-in "knows" the answer from the solver, so every run makes the
+same number of commits for a given player count. The report gives
+commits/sec (over the time of the committing calls, current.py excluded),
+p50/p99 latency per operation and disk bytes per run.
+
+Usage:
+    python src/bench.py --puzzles 100 --players 5 [--forms role,or,count] [--workers 8] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from log_store import log_tail
+from puzzle_gen import DEFAULT_FORMS, generate_puzzle, render_markdown
+from utils import PROJECT_ROOT, get_workspace
+
+
+SRC_FOLDER = os.path.join(PROJECT_ROOT, "src")
+
+# Operations that commit; commits/sec is measured over their time only
+COMMIT_OPERATIONS = ("prob_init", "state_create", "state_update", "prob_update")
+
+
+def make_run_folder(root: str, name: str, puzzle_text: str) -> str:
+    """Fresh workspace: empty contents/ and the puzzle."""
+    folder = os.path.join(root, name)
+    os.makedirs(os.path.join(folder, "contents", "history"))
+    with open(os.path.join(folder, "contents", "config.json"), "w") as f:
+        json.dump({"p": "p-000", "s": "s-000", "e": "e-000", "l": "l-000"}, f, indent=4)
+    open(os.path.join(folder, "contents", "history", "log.jsonl"), "w").close()
+    with open(os.path.join(folder, "puzzle.md"), "w") as f:
+        f.write(puzzle_text)
+    return folder
+
+
+def folder_bytes(folder: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+    return total
+
+
+class ScriptedRun:
+    """Drive one puzzle through the CLIs and time every call."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.timings: list[tuple[str, float]] = []  # (operation, seconds)
+
+    def call(self, op: str, script: str, *args: str) -> str:
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, os.path.join(SRC_FOLDER, script), "--workspace", self.folder, *args],
+            cwd=self.folder, capture_output=True, text=True
+        )
+        self.timings.append((op, time.perf_counter() - start))
+        if result.returncode != 0:
+            raise RuntimeError(f"{script} {' '.join(args)} failed:\n{result.stderr}")
+        return result.stdout
+
+    def play(self, solution: dict[str, str]) -> None:
+        out = self.call("prob_init", "prob_init.py", "--puzzle")
+        problem_id = re.search(r"(p-[a-z]*\d+)", out).group(1)
+        self.call("current", "current.py")
+
+        statement_ids = []
+        for player, role in solution.items():
+            out = self.call("state_create", "state.py", "--type", "proposition",
+                            "--conclusion", f"{player} is a {role}")
+            statement_id = re.search(r"(s-[a-z]*\d+)", out).group(1)
+            statement_ids.append(statement_id)
+            self.call("prob_update", "prob.py", "--id", problem_id, "--progresses", "append", statement_id)
+            self.call("state_update", "state.py", "--id", statement_id, "--status", "validating",
+                      "--proof.full", f"Checked against every statement: {player} can only be a {role}.")
+            self.call("state_update", "state.py", "--id", statement_id, "--status", "true")
+
+        summary = "; ".join(f"{p}: {r}" for p, r in solution.items())
+        self.call("prob_update", "prob.py", "--id", problem_id, "--status", "resolved",
+                  "--solution.full", summary, "--solution.ref", "overwrite", *statement_ids)
+        self.call("current", "current.py")
+
+    def commits(self) -> int:
+        return log_tail(get_workspace(self.folder))[2]
+
+
+def play_puzzle(task: tuple[str, int, int, list[str]]) -> tuple[list[tuple[str, float]], int, int]:
+    """Play one generated puzzle in its own workspace (runs in a pool worker).
+
+    Args:
+        task: (root folder, players, seed, forms)
+
+    Returns:
+        Tuple of (timings, commits, disk bytes of contents/)
+    """
+    root, players, seed, forms = task
+    puzzle, solution = generate_puzzle(players, seed, forms)
+    folder = make_run_folder(root, f"run-{seed}", render_markdown(puzzle))
+    run = ScriptedRun(folder)
+    run.play(solution)
+    return run.timings, run.commits(), folder_bytes(os.path.join(folder, "contents"))
+
+
+def run_bench(
+    puzzles: int,
+    players: int,
+    forms: list[str],
+    seed: int = 0,
+    keep: str | None = None,
+    workers: int | None = None
+) -> dict:
+    """Run the benchmark and return the report.
+
+    Args:
+        puzzles: Number of generated puzzles
+        players: Players per puzzle
+        forms: Statement forms for the generator
+        seed: Seed of the first puzzle
+        keep: Folder to keep the run copies in (default: temporary, removed)
+        workers: Puzzles played at once, each by its own process (default: CPU count)
+    """
+    root = keep or tempfile.mkdtemp(prefix="mra-bench-")
+    os.makedirs(root, exist_ok=True)
+    timings: dict[str, list[float]] = {}
+    commits = 0
+    disk = []
+    start = time.perf_counter()
+    try:
+        tasks = [(root, players, seed + i, forms) for i in range(puzzles)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for run_timings, run_commits, run_disk in pool.map(play_puzzle, tasks):
+                for op, seconds in run_timings:
+                    timings.setdefault(op, []).append(seconds)
+                commits += run_commits
+                disk.append(run_disk)
+    finally:
+        if keep is None:
+            shutil.rmtree(root, ignore_errors=True)
+    wall = time.perf_counter() - start
+    busy = sum(sum(timings.get(op, [])) for op in COMMIT_OPERATIONS)
+
+    return {
+        "puzzles": puzzles,
+        "players": players,
+        "workers": workers or os.cpu_count(),
+        "commits": commits,
+        "wall_seconds": wall,
+        "commits_per_sec": commits / busy if busy else 0.0,
+        "commits_per_wall_sec": commits / wall if wall else 0.0,
+        "operations": {
+            op: {
+                "count": len(values),
+                "p50_ms": float(np.percentile(values, 50)) * 1000,
+                "p99_ms": float(np.percentile(values, 99)) * 1000,
+            }
+            for op, values in sorted(timings.items())
+        },
+        "disk_bytes_per_run": {
+            "mean": float(np.mean(disk)) if disk else 0.0,
+            "max": int(max(disk)) if disk else 0,
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"Puzzles: {report['puzzles']} x {report['players']} players, "
+          f"{report['commits']} commits in {report['wall_seconds']:.1f} s ({report['workers']} workers)")
+    print(f"Commits/sec (time inside committing CLI calls): {report['commits_per_sec']:.1f}; "
+          f"across all workers (wall clock): {report['commits_per_wall_sec']:.1f}")
+    print(f"{'operation':<14} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for op, s in report["operations"].items():
+        print(f"{op:<14} {s['count']:>7} {s['p50_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+    disk = report["disk_bytes_per_run"]
+    print(f"Disk bytes per run: mean {disk['mean']:.0f}, max {disk['max']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark on generated puzzles")
+    parser.add_argument('--puzzles', type=int, default=20,
+                        help='Number of generated puzzles (default: 20)')
+    parser.add_argument('--players', type=int, default=5,
+                        help='Players per puzzle (default: 5)')
+    parser.add_argument('--forms', type=str, default=",".join(DEFAULT_FORMS),
+                        help='Comma-separated statement forms for the generator')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the first puzzle (default: 0)')
+    parser.add_argument('--keep', type=str, default=None,
+                        help='Keep the per-run copies in this folder')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Puzzles played in parallel (default: CPU count)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+
+    args = parser.parse_args()
+
+    forms = [f.strip() for f in args.forms.split(",") if f.strip()]
+    report = run_bench(args.puzzles, args.players, forms, args.seed, args.keep, args.workers)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
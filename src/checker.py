@@ -0,0 +1,303 @@
+"""Symbolic fast path for checking role-level statements.
+
+Before a `validating` statement goes to agent-check, the checker tries to
+decide it without an LLM:
+1. The puzzle's consistent worlds are computed once from puzzle.md (every
+   role assignment satisfying the player statements and hints).
+2. The statement's hypothesis and conclusion are compiled with the puzzle
+   sentence parser (see worlds.py for the supported item forms).
+3. If the conclusion holds in every consistent world where the hypothesis
+   holds, the decision is "confirm" (check-confirm-proof). Otherwise the
+   decision is "mark-false" (state-mark-false) with a counterexample world.
+
+Verdicts already in the verdict cache (verdict_cache.py) are returned as
+is, including earlier agent rejections ("reject"); new symbolic decisions
+are added to it. Statements with an item outside the parser's forms are
+"skip": they fall through to the agent. When part of the puzzle itself could not be parsed,
+the world set is an over-approximation, so only confirmations are emitted.
+
+Skip rate and checker latency are accumulated in contents/cache, together
+with an estimate of the agent time saved.
+
+Usage:
+    python src/checker.py [--id s-001 ...] [--apply] [--stats]
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict
+
+import numpy as np
+
+from cus_types_main import type_check_decision
+from puzzle_parser import SentenceParser, compile_puzzle
+from solver import ROLES, claim_constraint
+from utils import add_workspace_argument, get_workspace, set_workspace
+from verdict_cache import VerdictCache, puzzle_hash, verdict_key
+from worlds import MAX_PLAYERS, WorldSpace, sentence_mask
+
+
+# Stats file in the workspace's contents/cache
+STATS_NAME = "checker_stats.json"
+
+# Rough wall time of one agent-check round trip, for the "saved" estimate
+AGENT_CHECK_SECONDS = 30.0
+
+
+class PuzzleModel:
+    """Consistent worlds of a puzzle, built once per process."""
+
+    def __init__(self, puzzle_path: str | None = None):
+        """Compile the puzzle and filter all worlds by its claims.
+
+        Args:
+            puzzle_path: Puzzle file (default: the workspace's puzzle.md)
+
+        Raises:
+            FileNotFoundError: If the puzzle file does not exist
+            ValueError: If the puzzle has no players or more than MAX_PLAYERS
+        """
+        puzzle = compile_puzzle(puzzle_path)
+        if not puzzle.players:
+            raise ValueError("Puzzle has no players")
+        if len(puzzle.players) > MAX_PLAYERS:
+            raise ValueError(f"Too many players to enumerate ({len(puzzle.players)} > {MAX_PLAYERS})")
+
+        self.space = WorldSpace(puzzle.players)
+        self.parser = SentenceParser(puzzle.players)
+        self.consistent = np.ones(self.space.size, dtype=bool)
+        self.exact = True  # False if some puzzle sentence was not understood
+        for claim in puzzle.hints + puzzle.statements:
+            if claim.expr is None:
+                self.exact = False
+                continue
+            self.consistent &= np.broadcast_to(claim_constraint(claim, self.space.column), (self.space.size,))
+
+    def world(self, index: int) -> dict[str, str]:
+        return {p: ROLES[int(self.space.column(p)[index])] for p in self.space.players}
+
+
+def _items(value) -> list[str]:
+    if isinstance(value, str):
+        return [value]
+    return list(value or [])
+
+
+def check_statement(statement: dict, model: PuzzleModel) -> type_check_decision:
+    """Decide one statement symbolically.
+
+    Args:
+        statement: Statement object (dict as stored)
+        model: Puzzle model
+
+    Returns:
+        type_check_decision ("confirm", "mark-false" or "skip")
+    """
+    start = time.perf_counter()
+    decision = type_check_decision(statement_id=statement["id"], decision="skip")
+
+    premise = model.consistent.copy()
+    for item in _items(statement.get("hypothesis")):
+        mask = sentence_mask(item, model.parser, model.space)
+        if mask is None:
+            decision.reason = f"unsupported hypothesis item: {item}"
+            break
+        premise &= mask
+    else:
+        conclusion = np.ones(model.space.size, dtype=bool)
+        items = _items(statement.get("conclusion"))
+        for item in items:
+            mask = sentence_mask(item, model.parser, model.space)
+            if mask is None:
+                decision.reason = f"unsupported conclusion item: {item}"
+                break
+            conclusion &= mask
+        else:
+            if not items:
+                decision.reason = "empty conclusion"
+            else:
+                counter = np.flatnonzero(premise & ~conclusion)
+                if counter.size == 0:
+                    decision.decision = "confirm"
+                    decision.reason = (f"holds in all {int(np.count_nonzero(premise))} puzzle-consistent "
+                                       f"worlds satisfying the hypothesis")
+                elif model.exact:
+                    decision.decision = "mark-false"
+                    decision.counterexample = model.world(int(counter[0]))
+                    decision.reason = f"fails in {counter.size} puzzle-consistent world(s)"
+                else:
+                    decision.reason = "counterexample found, but the puzzle is only partially parsed"
+
+    decision.elapsed = time.perf_counter() - start
+    return decision
+
+
+def apply_decision(decision: type_check_decision) -> str | None:
+    """Commit a decision like check-confirm-proof / state-mark-false would.
+
+    Returns:
+        The log id of the update, or None for "skip"
+    """
+    from state import handle_statement
+
+    if decision.decision == "confirm":
+        log_id, _ = handle_statement(
+            id=decision.statement_id,
+            status="true",
+            progresses=("append", [f"Checker: confirmed symbolically ({decision.reason})"])
+        )
+        return log_id
+    if decision.decision == "mark-false":
+        world = ", ".join(f"{p}: {r}" for p, r in decision.counterexample.items())
+        log_id, _ = handle_statement(
+            id=decision.statement_id,
+            status="false",
+            progresses=("append", [f"Checker: counterexample ({world})"])
+        )
+        return log_id
+    if decision.decision == "reject":
+        log_id, _ = handle_statement(id=decision.statement_id, validation_issues=("append", decision.issues))
+        return log_id
+    return None
+
+
+def stats_path() -> str:
+    return os.path.join(get_workspace().cache_folder, STATS_NAME)
+
+
+def load_stats() -> dict:
+    path = stats_path()
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {"checked": 0, "confirmed": 0, "refuted": 0, "rejected": 0, "skipped": 0, "cached": 0, "seconds": 0.0}
+
+
+def record_stats(decisions: list[type_check_decision]) -> dict:
+    """Add decisions to the persistent counters and return them."""
+    stats = load_stats()
+    for d in decisions:
+        stats["checked"] += 1
+        stats["seconds"] += d.elapsed
+        key = {"confirm": "confirmed", "mark-false": "refuted", "reject": "rejected"}.get(d.decision, "skipped")
+        stats[key] = stats.get(key, 0) + 1
+        stats["cached"] = stats.get("cached", 0) + int(d.cached)
+    path = stats_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=4)
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    checked = stats["checked"]
+    if not checked:
+        return "Checker stats: no statement checked yet"
+    decided = checked - stats["skipped"]
+    return (f"Checker stats: {checked} checked, {stats['confirmed']} confirmed, {stats['refuted']} refuted, "
+            f"{stats.get('rejected', 0)} rejected, {stats.get('cached', 0)} from cache, {stats['skipped']} skipped (skip rate {stats['skipped'] / checked:.0%}); "
+            f"mean latency {stats['seconds'] / checked * 1000:.1f} ms; "
+            f"~{decided * AGENT_CHECK_SECONDS / 60:.1f} agent-minutes saved (est.)")
+
+
+def run_checks(statement_ids: list[str] | None = None, apply: bool = False) -> list[type_check_decision]:
+    """Check the given statements (default: all `validating` statements).
+
+    Args:
+        statement_ids: Statement ids to check
+        apply: Commit confirm/mark-false/reject decisions
+
+    Returns:
+        One type_check_decision per statement
+    """
+    from current import load_all_statements
+
+    model = PuzzleModel()
+    if statement_ids is None:
+        statements = [s for s in load_all_statements() if s.get("status") == "validating"]
+    else:
+        statements = []
+        for statement_id in statement_ids:
+            with open(os.path.join(get_workspace().object_folders["s"], f"{statement_id}.json"), "r") as f:
+                statements.append(json.load(f))
+
+    cache = VerdictCache()
+    cache.catch_up()
+    puzzle = puzzle_hash()
+    decisions = []
+    try:
+        for statement in statements:
+            start = time.perf_counter()
+            key = verdict_key(statement, puzzle=puzzle)
+            cached = cache.get(key)
+            recorded = statement.get("validation", {}).get("issues", [])
+            if cached is not None and cached["verdict"] == "reject" and (
+                    cached["statement_id"] == statement["id"] or all(i in recorded for i in cached["issues"])):
+                # The key leaves out the validation fields: this is the rejection already recorded
+                decisions.append(type_check_decision(
+                    statement_id=statement["id"],
+                    decision="skip",
+                    reason=f"already rejected (cached verdict of {cached['statement_id']})",
+                    cached=True,
+                    elapsed=time.perf_counter() - start
+                ))
+                continue
+            if cached is not None:
+                decisions.append(type_check_decision(
+                    statement_id=statement["id"],
+                    decision=cached["verdict"],
+                    reason=f"cached verdict (first given for {cached['statement_id']})",
+                    counterexample=cached["counterexample"],
+                    issues=cached["issues"],
+                    cached=True,
+                    elapsed=time.perf_counter() - start
+                ))
+                continue
+            decision = check_statement(statement, model)
+            if decision.decision != "skip":
+                cache.put(key, decision.statement_id, decision.decision, counterexample=decision.counterexample)
+            decisions.append(decision)
+    finally:
+        cache.close()
+    record_stats(decisions)
+    if apply:
+        for decision in decisions:
+            apply_decision(decision)
+    return decisions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Symbolically check role-level statements")
+    parser.add_argument('--id', nargs='+', type=str, default=None,
+                        help='Statement ids to check (default: all validating statements)')
+    parser.add_argument('--apply', action='store_true',
+                        help='Commit confirm / mark-false / reject decisions')
+    parser.add_argument('--json', action='store_true',
+                        help='Print decisions as JSON lines')
+    parser.add_argument('--stats', action='store_true',
+                        help='Only print the accumulated stats')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.stats:
+        print(format_stats(load_stats()))
+    else:
+        decisions = run_checks(args.id, args.apply)
+        for d in decisions:
+            if args.json:
+                print(json.dumps(asdict(d)))
+            elif d.decision == "mark-false":
+                world = ", ".join(f"{p}: {r}" for p, r in d.counterexample.items())
+                print(f"[{d.statement_id}] mark-false: {d.reason}; counterexample {world}")
+            elif d.decision == "confirm":
+                print(f"[{d.statement_id}] confirm: {d.reason}")
+            elif d.decision == "reject":
+                print(f"[{d.statement_id}] reject: {d.reason}; issue: {'; '.join(d.issues)}")
+            else:
+                print(f"[{d.statement_id}] skip (agent): {d.reason}")
+        if not decisions and not args.json:
+            print("(no statement to check)")
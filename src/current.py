@@ -1,13 +1,32 @@
+import argparse
+import ctypes
 import json
 import glob
 import os
+import select
+import sys
+import time
 
-from utils import PROJECT_ROOT, OBJECT_FOLDERS, IDManager
+from archive import Archive
+from log_store import iter_lines, line_log_id, log_tail, read_manifest
+from utils import (IDManager, add_workspace_argument, get_log_id_from_entry, get_workspace, id_sort_key,
+                   set_workspace)
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+# Archived run opened with --archive (archive.py), read in place of the workspace
+_archive: Archive | None = None
 
 
 def load_all_problems() -> list[dict]:
     """Load all problem JSON files from the problems folder."""
-    folder = OBJECT_FOLDERS["p"]
+    if _archive is not None:
+        return _archive.load_objects("p")
+    folder = get_workspace().object_folders["p"]
     pattern = os.path.join(folder, "p-*.json")
     problems = []
 
@@ -22,7 +41,9 @@ def load_all_problems() -> list[dict]:
 
 def load_all_statements() -> list[dict]:
     """Load all statement JSON files from the statements folder."""
-    folder = OBJECT_FOLDERS["s"]
+    if _archive is not None:
+        return _archive.load_objects("s")
+    folder = get_workspace().object_folders["s"]
     pattern = os.path.join(folder, "s-*.json")
     statements = []
 
@@ -48,34 +69,35 @@ def get_actionable_problems(problems: list[dict], statements: list[dict]) -> lis
     problem_lookup = {p["id"]: p for p in problems}
     statement_lookup = {s["id"]: s for s in statements}
 
-    actionable = []
-    for p in problems:
-        # First filter: status must be "unresolved"
-        if p.get("status") != "unresolved":
-            continue
+    return [p for p in problems if is_problem_actionable(p, problem_lookup, statement_lookup)]
 
-        # Second filter: check preliminaries (can be problems or statements)
-        preliminaries = p.get("preliminaries", [])
-        all_prelim_resolved = True
 
-        for prelim_id in preliminaries:
-            # Check if it's a problem
-            if prelim_id.startswith("p-"):
-                prelim = problem_lookup.get(prelim_id)
-                if prelim and prelim.get("status") != "resolved":
-                    all_prelim_resolved = False
-                    break
-            # Check if it's a statement
-            elif prelim_id.startswith("s-"):
-                prelim = statement_lookup.get(prelim_id)
-                if prelim and prelim.get("status") != "true":
-                    all_prelim_resolved = False
-                    break
+def is_problem_actionable(p: dict, problem_lookup: dict, statement_lookup: dict) -> bool:
+    """Check a single problem against the actionable criteria.
 
-        if all_prelim_resolved:
-            actionable.append(p)
+    Args:
+        p: Problem object
+        problem_lookup: {problem_id: problem} for preliminary checks
+        statement_lookup: {statement_id: statement} for preliminary checks
+    """
+    # First filter: status must be "unresolved"
+    if p.get("status") != "unresolved":
+        return False
+
+    # Second filter: check preliminaries (can be problems or statements)
+    for prelim_id in p.get("preliminaries", []):
+        # Check if it's a problem
+        if prelim_id.startswith("p-"):
+            prelim = problem_lookup.get(prelim_id)
+            if prelim and prelim.get("status") != "resolved":
+                return False
+        # Check if it's a statement
+        elif prelim_id.startswith("s-"):
+            prelim = statement_lookup.get(prelim_id)
+            if prelim and prelim.get("status") != "true":
+                return False
 
-    return actionable
+    return True
 
 
 def get_actionable_statements(statements: list[dict]) -> list[dict]:
@@ -85,32 +107,30 @@ def get_actionable_statements(statements: list[dict]) -> list[dict]:
     - status = "pending" OR "validating"
     - All preliminary statements (if any) have status = "true"
     """
-    actionable = []
-
     # Create a lookup dict for quick status checks
     statement_lookup = {s["id"]: s for s in statements}
 
-    for s in statements:
-        status = s.get("status")
+    return [s for s in statements if is_statement_actionable(s, statement_lookup)]
 
-        # First filter: status must be "pending" or "validating"
-        if status not in ("pending", "validating"):
-            continue
 
-        # Second filter: check preliminaries
-        preliminaries = s.get("preliminaries", [])
-        all_prelim_resolved = True
+def is_statement_actionable(s: dict, statement_lookup: dict) -> bool:
+    """Check a single statement against the actionable criteria.
 
-        for prelim_id in preliminaries:
-            prelim = statement_lookup.get(prelim_id)
-            if prelim and prelim.get("status") != "true":
-                all_prelim_resolved = False
-                break
+    Args:
+        s: Statement object
+        statement_lookup: {statement_id: statement} for preliminary checks
+    """
+    # First filter: status must be "pending" or "validating"
+    if s.get("status") not in ("pending", "validating"):
+        return False
 
-        if all_prelim_resolved:
-            actionable.append(s)
+    # Second filter: check preliminaries
+    for prelim_id in s.get("preliminaries", []):
+        prelim = statement_lookup.get(prelim_id)
+        if prelim and prelim.get("status") != "true":
+            return False
 
-    return actionable
+    return True
 
 
 def display_problems(problems: list[dict]) -> None:
@@ -204,6 +224,8 @@ def is_puzzle_initialized() -> bool:
 
     Returns True if log ID > l-000 (meaning at least one operation has been logged).
     """
+    if _archive is not None:
+        return _archive.config().get("l", "l-000") != "l-000"
     id_manager = IDManager()
     current_log_id = id_manager.current_ids.get("l", "l-000")
     return current_log_id != "l-000"
@@ -237,7 +259,299 @@ def show_current_status() -> None:
     display_problems(actionable_problems)
     print()  # separator
     display_statements(actionable_statements)
+    display_worlds()
+
+
+def display_worlds() -> None:
+    """Display the possible-worlds summary when a puzzle model is available."""
+    if _archive is not None:
+        return  # The worlds model is kept in a workspace, an archive is read-only
+    try:
+        from worlds import display_knowledge, knowledge_summary
+    except ImportError:
+        return  # NumPy not installed
+    summary = knowledge_summary()
+    if summary is not None:
+        print()  # separator
+        display_knowledge(summary)
+
+
+class ActionableView:
+    """In-memory actionable view that is refreshed per log entry.
+
+    Objects are loaded once at startup. Afterwards only the ids listed in a
+    log entry's "creation", "modification" and "deletion" are reloaded, and actionability
+    is re-evaluated for those ids and the objects that depend on them through
+    `preliminaries`.
+    """
+
+    def __init__(self):
+        self.problems: dict[str, dict] = {}
+        self.statements: dict[str, dict] = {}
+        self.dependents: dict[str, set[str]] = {}  # {prelim_id: ids listing it}
+        self.actionable: set[str] = set()
+
+    def load_all(self) -> None:
+        """Full scan of all problems and statements (startup / after rewind)."""
+        self.problems = {p["id"]: p for p in load_all_problems()}
+        self.statements = {s["id"]: s for s in load_all_statements()}
+        self.dependents = {}
+        for obj in list(self.problems.values()) + list(self.statements.values()):
+            self._link(obj)
+        self.actionable = {
+            obj_id for obj_id in list(self.problems) + list(self.statements)
+            if self._is_actionable(obj_id)
+        }
+
+    def _link(self, obj: dict) -> None:
+        for prelim_id in obj.get("preliminaries", []):
+            self.dependents.setdefault(prelim_id, set()).add(obj["id"])
+
+    def _unlink(self, obj: dict) -> None:
+        for prelim_id in obj.get("preliminaries", []):
+            self.dependents.get(prelim_id, set()).discard(obj["id"])
+
+    def _lookup(self, obj_id: str) -> dict | None:
+        if obj_id.startswith("p-"):
+            return self.problems.get(obj_id)
+        if obj_id.startswith("s-"):
+            return self.statements.get(obj_id)
+        return None
+
+    def _is_actionable(self, obj_id: str) -> bool:
+        obj = self._lookup(obj_id)
+        if obj is None:
+            return False
+        if obj_id.startswith("p-"):
+            return is_problem_actionable(obj, self.problems, self.statements)
+        return is_statement_actionable(obj, self.statements)
+
+    def _reload(self, obj_id: str) -> None:
+        """Reload a single object from disk (removing it if the file is gone)."""
+        obj_type = obj_id.split("-")[0]
+        if obj_type not in ("p", "s"):
+            return
+        lookup = self.problems if obj_type == "p" else self.statements
+
+        old = lookup.pop(obj_id, None)
+        if old is not None:
+            self._unlink(old)
+
+        file_path = os.path.join(get_workspace().object_folders[obj_type], f"{obj_id}.json")
+        if os.path.exists(file_path):
+            with open(file_path, "r") as f:
+                obj = json.load(f)
+            lookup[obj_id] = obj
+            self._link(obj)
+
+    def apply_entry(self, entry: dict) -> list[str]:
+        """Apply one log entry and return the diff lines to print."""
+        log_id = get_log_id_from_entry(entry)
+        body = entry.get(log_id, {}) if log_id else {}
+        changed = list(dict.fromkeys(body.get("creation", []) + body.get("modification", [])
+                                     + body.get("deletion", [])))
+
+        before = {obj_id: self._lookup(obj_id) for obj_id in changed}
+        for obj_id in changed:
+            self._reload(obj_id)
+
+        # Only changed objects and their direct dependents can flip actionability
+        affected = set(changed)
+        for obj_id in changed:
+            affected |= self.dependents.get(obj_id, set())
+
+        lines = []
+        for obj_id in sorted(affected):
+            was = obj_id in self.actionable
+            now = self._is_actionable(obj_id)
+            obj = self._lookup(obj_id)
+            if now and not was:
+                self.actionable.add(obj_id)
+                lines.append(f"  + [{obj_id}] {describe_object(obj)}")
+            elif was and not now:
+                self.actionable.discard(obj_id)
+                reason = obj.get("status") if obj else "deleted"
+                lines.append(f"  - [{obj_id}] no longer actionable ({reason})")
+
+            old = before.get(obj_id)
+            if old is not None and obj is not None and old.get("status") != obj.get("status"):
+                lines.append(f"  ~ [{obj_id}] status: {old.get('status')} -> {obj.get('status')}")
+
+        created = ", ".join(body.get("creation", [])) or "-"
+        modified = ", ".join(body.get("modification", [])) or "-"
+        header = f"--- {log_id} | created: {created} | modified: {modified}"
+        if body.get("deletion"):
+            header += f" | deleted: {', '.join(body['deletion'])}"
+        header += " ---"
+        return [header] + (lines if lines else ["  (no change to actionable view)"])
+
+    def display(self) -> None:
+        """Display the full actionable view (same layout as show_current_status)."""
+        display_problems([self.problems[i] for i in sorted(self.actionable) if i in self.problems])
+        print()  # separator
+        display_statements([self.statements[i] for i in sorted(self.actionable) if i in self.statements])
+        display_worlds()
+
+
+def describe_object(obj: dict) -> str:
+    """One-line summary of an object for diff output."""
+    if obj["id"].startswith("p-"):
+        text = "; ".join(obj.get("objectives", []))
+    else:
+        text = " ".join(obj.get("conclusion", []))
+    if len(text) > 80:
+        text = text[:77] + "..."
+    return f"({obj.get('status')}) {text}"
+
+
+def _open_inotify(folder: str) -> int | None:
+    """Open an inotify watch on folder, or return None if unavailable."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO
+    if libc.inotify_add_watch(fd, folder.encode(), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _wait_for_change(inotify_fd: int | None, interval: float) -> None:
+    """Block until the history folder changes (inotify) or interval elapses."""
+    if inotify_fd is None:
+        time.sleep(interval)
+        return
+
+    readable, _, _ = select.select([inotify_fd], [], [], interval)
+    if readable:
+        # Drain pending events; we only care that something happened
+        try:
+            while os.read(inotify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def _entries_after(log_id: str) -> list[str] | None:
+    """Complete log lines after log_id, or None if log_id is no longer in the log."""
+    lines, found = [], log_id == "l-000"
+    for line in iter_lines(since=log_id):
+        if not line.endswith("\n"):
+            break  # Partial append, picked up next round
+        if not line.strip():
+            continue
+        if found:
+            lines.append(line)
+        else:
+            found = line_log_id(line) == log_id
+    return lines if found else None
+
+
+def watch(interval: float = 1.0) -> None:
+    """Tail log.jsonl and update the actionable view incrementally.
+
+    Objects are scanned once at startup. Afterwards each new log entry only
+    reloads the ids it created or modified. When log.jsonl is rolled into a
+    cold segment (log_store.py), the entries not seen yet are read back from
+    the segment; if it shrinks otherwise (rewind), the view is rebuilt with
+    a full scan.
+
+    Args:
+        interval: Poll interval in seconds (also the inotify wait timeout)
+    """
+    workspace = get_workspace()
+    log_path = workspace.log_path
+    os.makedirs(workspace.history_folder, exist_ok=True)
+
+    view = ActionableView()
+    view.load_all()
+    view.display()
+
+    offset = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+    last_seen = log_tail(workspace)[0]
+    segment_count = len(read_manifest(workspace))
+    inotify_fd = _open_inotify(workspace.history_folder)
+    mode = "inotify" if inotify_fd is not None else f"polling every {interval}s"
+    print(f"\n=== Watching {os.path.relpath(log_path, workspace.root)} ({mode}, Ctrl-C to stop) ===")
+
+    try:
+        while True:
+            _wait_for_change(inotify_fd, interval)
+
+            size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+            if size < offset:
+                segments = len(read_manifest(workspace))
+                missed = _entries_after(last_seen) if segments > segment_count else None
+                segment_count = segments
+                offset = size
+                if missed is None:
+                    # Log truncated by rewind: objects may have been restored, rescan
+                    print("\n--- log.jsonl truncated (rewind), reloading all objects ---")
+                    view.load_all()
+                    view.display()
+                    last_seen = log_tail(workspace)[0]
+                    continue
+                # Rolled into a cold segment (log_store.py): catch up on the entries not seen yet
+                lines = missed
+            elif size == offset:
+                continue
+            else:
+                with open(log_path, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+
+                # Only consume complete lines; a partial line is picked up next round
+                complete = chunk[:chunk.rfind(b"\n") + 1]
+                offset += len(complete)
+                lines = complete.decode().splitlines()
+
+            for line in lines:
+                if not line.strip():
+                    continue
+                log_id = line_log_id(line)
+                if log_id and id_sort_key(log_id) <= id_sort_key(last_seen):
+                    continue  # Already shown while catching up after a roll
+                print()
+                for out in view.apply_entry(json.loads(line)):
+                    print(out)
+                last_seen = log_id or last_seen
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if inotify_fd is not None:
+            os.close(inotify_fd)
 
 
 if __name__ == "__main__":
-    show_current_status()
+    parser = argparse.ArgumentParser(description="Show current status")
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and print changes as new log entries arrive')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Poll interval in seconds for --watch (default: 1.0)')
+    parser.add_argument('--archive', type=str, default=None, metavar='FILE',
+                        help='Show the status of an archived run (archive.py) without unpacking it')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.archive:
+        if args.watch:
+            print("Error: an archived run does not change, --watch needs a workspace", file=sys.stderr)
+            sys.exit(1)
+        try:
+            _archive = Archive(args.archive)
+        except (ValueError, FileNotFoundError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.watch:
+        watch(args.interval)
+    else:
+        show_current_status()
@@ -65,7 +65,196 @@ class type_problem:
 
 @dataclass
 class type_object_change:
-    """Represents a change operation (create or update) for an object."""
-    change_type: str  # "create" or "update"
-    obj: Union[type_problem, type_statement]  # the object to be changed
+    """Represents a change operation (create, update or delete) for an object."""
+    change_type: str  # "create", "update" or "delete"
+    obj: Union[type_problem, type_statement, dict]  # the object to be changed (dict as stored also accepted)
     updates: Optional[dict] = None  # for update operations, the updates dict
+
+
+@dataclass
+class type_commit_event:
+    """Published by handle_changes after a successful commit."""
+    log_id: str
+    parent_log_id: str  # log id the store was at before this commit
+    created: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    fields: dict[str, list[str]] = field(default_factory=dict)  # {modified_id: changed field paths}
+    time: float = 0.0
+    seq: int = 0  # position in the event feed (assigned on publish)
+
+
+@dataclass
+class type_expr:
+    """Logic expression over player roles (see solver.py).
+
+    op is one of:
+    - "role": players[0] has `role`
+    - "not", "and", "or", "implies", "iff": connectives over args
+    - "same": all `players` have the same role
+    - "count": number of `players` with `role` compared (cmp) to k
+    """
+    op: str
+    args: list["type_expr"] = field(default_factory=list)
+    players: list[str] = field(default_factory=list)
+    role: str = ""
+    cmp: str = ""  # count only: "==", ">=", "<="
+    k: int = 0
+
+@dataclass
+class type_claim:
+    """A sentence of the puzzle: a player statement or a game-manager hint."""
+    speaker: str  # player name; "" for the (truthful) game manager
+    text: str
+    expr: Optional[type_expr] = None  # None if the sentence could not be parsed
+
+@dataclass
+class type_puzzle:
+    players: list[str]
+    statements: list[type_claim] = field(default_factory=list)
+    hints: list[type_claim] = field(default_factory=list)
+
+@dataclass
+class type_solve_result:
+    solutions: list[dict[str, str]]  # each: {player: role}
+    engine: str
+    elapsed: float = 0.0
+    complete: bool = True  # False if the search stopped at max_solutions
+
+@dataclass
+class type_check_decision:
+    """Outcome of the symbolic checker (checker.py) for one statement."""
+    statement_id: str
+    decision: str  # "confirm", "mark-false", "reject" (cached only), or "skip" (left to the agent)
+    reason: str = ""
+    counterexample: dict[str, str] = field(default_factory=dict)  # {player: role}
+    issues: list[str] = field(default_factory=list)  # "reject" only
+    cached: bool = False  # True if taken from the verdict cache
+    elapsed: float = 0.0
+
+@dataclass
+class type_proposal:
+    """A statement an agent backend wants to add (orchestrator.py)."""
+    conclusion: list[str]
+    hypothesis: list[str] = field(default_factory=list)
+    proof: str = ""
+
+@dataclass
+class type_session_result:
+    """Outcome of one orchestrated puzzle session (orchestrator.py)."""
+    name: str
+    workspace: str
+    status: str  # "solved", "unsolved" (backend gave up / step limit) or "error"
+    steps: int = 0
+    commits: int = 0  # commits made in this session (not counting earlier ones)
+    seconds: float = 0.0
+    resumed: bool = False  # the workspace already had log entries
+    recovered: str = ""  # log id of an unfinished commit that was rolled back
+    decisions: dict[str, int] = field(default_factory=dict)  # {"checker:confirm": 3, "backend:reject": 1, ...}
+    timings: list[tuple[str, float]] = field(default_factory=list)  # (phase, seconds)
+    error: str = ""
+
+@dataclass
+class type_transaction:
+    """One handle_changes() commit rebuilt from log.jsonl and the backups (replay.py)."""
+    log_id: str
+    parent_log_id: str
+    current: list[str]  # [p, s, e] counters after the commit
+    creates: list[dict] = field(default_factory=list)  # full objects as written
+    updates: list[tuple[str, dict]] = field(default_factory=list)  # (obj_id, updates for apply_updates)
+    deletes: list[str] = field(default_factory=list)  # ids removed by the commit
+
+@dataclass
+class type_fsck_issue:
+    """One inconsistency found by fsck.py."""
+    kind: str  # e.g. "orphan-object", "missing-backup", "counter-behind" (see fsck.ISSUE_KINDS)
+    target: str  # object id, log id, "<log_id>/<obj_id>" or "config.json"
+    detail: str = ""
+    severity: str = "error"  # "error" or "warning"
+    repaired: str = ""  # what --repair did about it ("" if nothing)
+
+@dataclass
+class type_revert_plan:
+    """Inverse of one log entry, computed by revert.py."""
+    log_id: str  # the entry being reverted
+    updates: list[tuple[str, dict]] = field(default_factory=list)  # (obj_id, updates putting its fields back)
+    recreates: list[dict] = field(default_factory=list)  # objects the entry deleted
+    deletes: list[str] = field(default_factory=list)  # objects the entry created
+    conflicts: list[str] = field(default_factory=list)  # "obj_id: reason"; later work the revert would undo or break
+    notes: list[str] = field(default_factory=list)  # "obj_id: reason"; parts with nothing to undo
+
+@dataclass
+class type_field_change:
+    """One changed field of an object (diff.py)."""
+    path: str  # dot path, e.g. "validation.issues"
+    kind: str  # "set", "append" (list grew at the end), "add" or "remove" (key)
+    old: Any = None
+    new: Any = None  # for "append": the added items only
+
+@dataclass
+class type_object_diff:
+    """How one object differs between two log ids (diff.py)."""
+    obj_id: str
+    change: str  # "created", "deleted" or "modified"
+    fields: list[type_field_change] = field(default_factory=list)  # "modified" only
+    obj: Optional[dict] = None  # "created": the new object, "deleted": its last version
+    log_ids: list[str] = field(default_factory=list)  # entries in the range that touched it
+
+@dataclass
+class type_redo_segment:
+    """Log entries dropped by one rewind, kept on the redo stack (redo.py)."""
+    name: str  # folder under contents/redo (stack order)
+    base: str  # log id the rewind went back to
+    head: str  # log id before the rewind
+    entries: int = 0
+    bytes: int = 0
+    time: float = 0.0  # when the rewind happened
+
+@dataclass
+class type_rewind_plan:
+    """Everything a rewind will do, computed before touching any file (rewind.py)."""
+    target: str  # log id to rewind to
+    current: list[str]  # [p, s, e] counters at the target
+    deletes: list[str] = field(default_factory=list)  # objects that did not exist at the target
+    restores: dict[str, str] = field(default_factory=dict)  # {obj_id: log id whose backup is its version at the target}
+    cleanup: list[str] = field(default_factory=list)  # dropped log ids (their backup folders leave history/)
+    bytes: dict[str, int] = field(default_factory=dict)  # {"delete", "restore", "cleanup", "log"}: bytes involved
+
+@dataclass
+class type_log_segment:
+    """One gzipped cold segment of the log (log_store.py)."""
+    name: str  # file contents/log_segments/<name>.jsonl.gz
+    first: str  # first log id in the segment
+    last: str  # last log id in the segment
+    entries: int = 0
+    current: list[str] = field(default_factory=list)  # [p, s, e] counters of the last entry
+    bytes: int = 0  # uncompressed
+    stored: int = 0  # gzipped
+
+@dataclass
+class type_ship_report:
+    """One replication pass (replicate.py)."""
+    log_id: str = "l-000"  # last log id of the replica after the pass
+    entries: int = 0  # log entries shipped
+    objects: int = 0  # object files copied
+    deleted: int = 0  # object files removed from the replica
+    backups: int = 0  # backup files copied
+    bytes: int = 0  # bytes copied
+    resynced: bool = False  # the replica was rebuilt (source rewound past it)
+    seconds: float = 0.0
+
+@dataclass
+class type_archive_member:
+    """One file packed in a run archive (archive.py)."""
+    name: str  # path relative to the workspace root, "/"-separated
+    offset: int  # position of the file's bytes in the archive
+    size: int
+    crc: int  # zlib.crc32 of the bytes
+
+@dataclass
+class type_archive_report:
+    """One archive export or import (archive.py)."""
+    log_id: str = "l-000"  # last log id of the run
+    members: int = 0  # files packed or unpacked
+    bytes: int = 0  # bytes of those files
+    seconds: float = 0.0
@@ -0,0 +1,267 @@
+"""Duplicate-statement detection.
+
+Two lookups over the statements, kept in contents/index/dedupe.db:
+- Exact: hash of the normalized conclusion plus the sorted, normalized
+  hypothesis items (statement id prefixes such as "(s-001)" are ignored).
+- Near: MinHash signatures over word shingles, bucketed with LSH bands, so
+  candidates are found without comparing against every statement.
+
+The index catches up incrementally from the event spool when it is read
+(see index_store.py); it only rescans the statement folder when the spool
+cannot account for the commits since its last read.
+
+Usage:
+    python src/dedupe.py --conclusion "Alice is a knave" [--hypothesis ...]
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+
+from index_store import StatementIndex
+from utils import add_workspace_argument, load_object, set_workspace
+
+# MinHash / LSH parameters: NUM_PERM = LSH_BANDS * LSH_ROWS
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = 4
+NEAR_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20260101)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+ARTICLES = {"a", "an", "the"}
+
+DEDUPE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS statements (
+    id TEXT PRIMARY KEY, key TEXT, status TEXT, signature TEXT
+);
+CREATE INDEX IF NOT EXISTS statements_by_key ON statements (key);
+CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket TEXT, id TEXT);
+CREATE INDEX IF NOT EXISTS bands_by_bucket ON bands (band, bucket);
+CREATE INDEX IF NOT EXISTS bands_by_id ON bands (id);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for comparison.
+
+    Drops statement id references, punctuation, case and articles.
+
+    Examples:
+        "(s-001) Alice is a knave." -> "alice is knave"
+    """
+    text = re.sub(r'\([se]-[a-z]*\d+\)', ' ', text.lower())
+    words = [w for w in re.findall(r"[a-z0-9]+", text) if w not in ARTICLES]
+    return " ".join(words)
+
+
+def statement_key(conclusion: list[str], hypothesis: list[str]) -> str:
+    """Exact-match key of a statement's conclusion plus hypothesis."""
+    parts = [normalize_text(" ".join(conclusion))]
+    parts.extend(sorted(normalize_text(h) for h in hypothesis))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def shingles(conclusion: list[str], hypothesis: list[str]) -> set[str]:
+    """Word unigrams and bigrams of the normalized statement text."""
+    words = normalize_text(" ".join(conclusion + sorted(hypothesis))).split()
+    result = set(words)
+    result.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return result
+
+
+def minhash(items: set[str]) -> list[int]:
+    """MinHash signature of a shingle set (NUM_PERM values)."""
+    if not items:
+        return [_MERSENNE_PRIME] * NUM_PERM
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in items]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature: list[int]) -> list[tuple[int, str]]:
+    """LSH buckets (band, bucket_hash) of a signature."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        bucket = hashlib.blake2b(json.dumps(rows).encode(), digest_size=8).hexdigest()
+        buckets.append((band, bucket))
+    return buckets
+
+
+class DuplicateIndex(StatementIndex):
+    """Exact-hash and MinHash/LSH index over statements."""
+    DB_NAME = "dedupe.db"
+    SCHEMA = DEDUPE_SCHEMA
+    TABLES = ("statements", "bands")
+
+    def _remove(self, statement_id: str) -> None:
+        self.conn.execute("DELETE FROM statements WHERE id = ?", (statement_id,))
+        self.conn.execute("DELETE FROM bands WHERE id = ?", (statement_id,))
+
+    def _upsert(self, statement: dict) -> None:
+        statement_id = statement["id"]
+        self._remove(statement_id)
+
+        conclusion = statement.get("conclusion", [])
+        hypothesis = statement.get("hypothesis", [])
+        signature = minhash(shingles(conclusion, hypothesis))
+        self.conn.execute(
+            "INSERT INTO statements (id, key, status, signature) VALUES (?, ?, ?, ?)",
+            (statement_id, statement_key(conclusion, hypothesis), statement.get("status"), json.dumps(signature))
+        )
+        self.conn.executemany(
+            "INSERT INTO bands (band, bucket, id) VALUES (?, ?, ?)",
+            [(band, bucket, statement_id) for band, bucket in band_buckets(signature)]
+        )
+
+    def find(
+        self,
+        conclusion: list[str],
+        hypothesis: list[str],
+        threshold: float = NEAR_THRESHOLD
+    ) -> tuple[list[dict], list[dict]]:
+        """Find exact and near duplicates of a candidate statement.
+
+        Args:
+            conclusion: Candidate conclusion list
+            hypothesis: Candidate hypothesis list
+            threshold: Minimum estimated Jaccard similarity for near duplicates
+
+        Returns:
+            Tuple of (exact, near):
+            - exact: [{"id", "status"}]
+            - near: [{"id", "status", "similarity"}], most similar first
+        """
+        key = statement_key(conclusion, hypothesis)
+        exact = [
+            {"id": statement_id, "status": status}
+            for statement_id, status in self.conn.execute(
+                "SELECT id, status FROM statements WHERE key = ? ORDER BY id", (key,)
+            )
+        ]
+        exact_ids = {e["id"] for e in exact}
+
+        signature = minhash(shingles(conclusion, hypothesis))
+        candidates = set()
+        for band, bucket in band_buckets(signature):
+            for (statement_id,) in self.conn.execute(
+                "SELECT id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+            ):
+                candidates.add(statement_id)
+        candidates -= exact_ids
+
+        near = []
+        for statement_id in sorted(candidates):
+            status, stored = self.conn.execute(
+                "SELECT status, signature FROM statements WHERE id = ?", (statement_id,)
+            ).fetchone()
+            stored = json.loads(stored)
+            similarity = sum(1 for x, y in zip(signature, stored) if x == y) / NUM_PERM
+            if similarity >= threshold:
+                near.append({"id": statement_id, "status": status, "similarity": similarity})
+        near.sort(key=lambda x: (-x["similarity"], x["id"]))
+
+        return exact, near
+
+
+def find_duplicates(
+    conclusion: list[str],
+    hypothesis: list[str] | None = None,
+    threshold: float = NEAR_THRESHOLD
+) -> tuple[list[dict], list[dict]]:
+    """Find exact and near duplicates (see DuplicateIndex.find)."""
+    index = DuplicateIndex()
+    try:
+        index.ensure_current()
+        return index.find(conclusion, hypothesis or [], threshold)
+    finally:
+        index.close()
+
+
+def find_reusable_statement(
+    conclusion: list[str],
+    hypothesis: list[str] | None = None,
+    statement_type: str | None = None,
+    reuse: bool = True
+) -> str | None:
+    """Check a statement about to be created against existing ones.
+
+    Exact duplicates that are neither abandoned nor false (and of the same
+    type, if given) are returned for reuse. Near duplicates only produce a
+    warning.
+
+    Args:
+        conclusion: Conclusion of the statement to be created
+        hypothesis: Processed hypothesis items of the statement to be created
+        statement_type: Only reuse statements of this type
+        reuse: False to only warn about an identical statement (the caller
+            brings content of its own and creates a new one)
+
+    Returns:
+        Id of an existing identical statement, or None
+    """
+    exact, near = find_duplicates(conclusion, hypothesis)
+
+    for match in exact:
+        if match["status"] in ("abandoned", "false"):
+            continue
+        if statement_type is not None:
+            try:
+                if load_object(match["id"]).get("type") != statement_type:
+                    continue
+            except FileNotFoundError:
+                continue  # Index not caught up with a deletion yet
+        if not reuse:
+            print(f"Warning: identical to existing statement {match['id']} ({match['status']}); "
+                  f"creating a new one with the given proof and status", file=sys.stderr)
+            return None
+        print(f"Warning: identical to existing statement {match['id']} ({match['status']}); reusing it",
+              file=sys.stderr)
+        return match["id"]
+
+    if near:
+        listed = ", ".join(f"{n['id']} ({n['status']}, {n['similarity']:.2f})" for n in near[:5])
+        print(f"Warning: similar existing statements: {listed}", file=sys.stderr)
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up duplicates of a statement")
+    parser.add_argument('--conclusion', nargs='+', type=str,
+                        help='Conclusion of the candidate statement')
+    parser.add_argument('--hypothesis', nargs='+', type=str, default=[],
+                        help='Hypothesis items of the candidate statement')
+    parser.add_argument('--threshold', type=float, default=NEAR_THRESHOLD,
+                        help=f'Near-duplicate similarity threshold (default: {NEAR_THRESHOLD})')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Rebuild the index from the statement files')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.rebuild:
+        index = DuplicateIndex()
+        count = index.rebuild()
+        index.close()
+        print(f"Rebuilt duplicate index: {count} statements")
+
+    if args.conclusion:
+        exact, near = find_duplicates(args.conclusion, args.hypothesis, args.threshold)
+        if not exact and not near:
+            print("(no duplicate)")
+        for e in exact:
+            print(f"[{e['id']}] ({e['status']}) exact")
+        for n in near:
+            print(f"[{n['id']}] ({n['status']}) similarity={n['similarity']:.2f}")
+    elif not args.rebuild:
+        parser.error("--conclusion or --rebuild is required")
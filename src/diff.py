@@ -0,0 +1,186 @@
+"""Field-level difference between the store at two log ids.
+
+Only the objects touched by the entries between the two ids are looked at,
+and each is read at most twice, so the cost follows the size of the change
+and not the size of the store. An object's version at log id L is:
+- absent, if its next change after L is a creation (or it was never created),
+- the backup taken by its next modification or deletion after L,
+- the object file, if nothing touched it after L.
+
+The changes in the range and each touched object's next change after it
+are looked up in the history index (history_index.py), so the log itself
+is not read.
+
+Usage:
+    python src/diff.py l-003 [l-010] [--json]     (second id defaults to the latest)
+"""
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict
+
+from current import describe_object
+from cus_types_main import type_field_change, type_object_diff
+from history_index import HistoryIndex
+from utils import IDManager, add_workspace_argument, get_workspace, id_sort_key, set_workspace
+
+
+def field_changes(old: dict, new: dict, prefix: str = "") -> list[type_field_change]:
+    """Changed fields between two versions of an object (nested dicts by dot path)."""
+    changes = []
+    for key in list(old) + [k for k in new if k not in old]:
+        path = prefix + key
+        if key not in new:
+            changes.append(type_field_change(path=path, kind="remove", old=old[key]))
+        elif key not in old:
+            changes.append(type_field_change(path=path, kind="add", new=new[key]))
+        elif old[key] != new[key]:
+            before, after = old[key], new[key]
+            if isinstance(before, dict) and isinstance(after, dict):
+                changes += field_changes(before, after, path + ".")
+            elif isinstance(before, list) and isinstance(after, list) and after[:len(before)] == before:
+                changes.append(type_field_change(path=path, kind="append", old=before, new=after[len(before):]))
+            else:
+                changes.append(type_field_change(path=path, kind="set", old=before, new=after))
+    return changes
+
+
+def scan_range(log_a: str, log_b: str) -> tuple[dict[str, list[str]], dict[str, tuple[str, str]],
+                                                dict[str, tuple[str, str]]]:
+    """Changes between two log ids, from the history index.
+
+    Args:
+        log_a, log_b: Log ids in either order ("l-000" is the empty store)
+
+    Returns:
+        Tuple of (touched, next_after_low, next_after_high):
+        - touched: {obj_id: log ids in (low, high] touching it}
+        - next_after_low / next_after_high: {obj_id: (log_id, "creation" | "modification" | "deletion")}
+          first change after each end (missing if none)
+
+    Raises:
+        ValueError: If a log id is not in log.jsonl
+    """
+    low, high = sorted([log_a, log_b], key=id_sort_key)
+    touched: dict[str, list[str]] = {}
+    after_low: dict[str, tuple[str, str]] = {}
+    after_high: dict[str, tuple[str, str]] = {}
+    index = HistoryIndex()
+    try:
+        index.ensure_current()
+        low_seq, high_seq = index.seq_of(low), index.seq_of(high)
+        for log_id, seq in ((low, low_seq), (high, high_seq)):
+            if seq is None:
+                raise ValueError(f"Log ID '{log_id}' not found in log.jsonl")
+        for obj_id, log_id, kind in index.changes_between(low_seq, high_seq):
+            touched.setdefault(obj_id, []).append(log_id)
+            after_low.setdefault(obj_id, (log_id, kind))
+        for obj_id in touched:
+            next_change = index.next_change(obj_id, high_seq)
+            if next_change:
+                after_high[obj_id] = next_change
+    finally:
+        index.close()
+    return touched, after_low, after_high
+
+
+def _version(obj_id: str, next_change: tuple[str, str] | None) -> dict | None:
+    workspace = get_workspace()
+    if next_change is None:
+        path = os.path.join(workspace.object_folders[obj_id.split("-")[0]], f"{obj_id}.json")
+    elif next_change[1] == "creation":
+        return None
+    else:
+        path = os.path.join(workspace.history_folder, next_change[0], f"{obj_id}.json")
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def diff_log_ids(log_a: str, log_b: str) -> list[type_object_diff]:
+    """Objects that differ between the store at log_a and at log_b.
+
+    Args:
+        log_a: Log id of the old side ("l-000": empty store)
+        log_b: Log id of the new side (may be older than log_a)
+
+    Returns:
+        One entry per created, deleted or modified object, in id order
+    """
+    touched, after_low, after_high = scan_range(log_a, log_b)
+    reverse = id_sort_key(log_a) > id_sort_key(log_b)
+
+    diffs = []
+    for obj_id in sorted(touched, key=lambda i: (i.split("-")[0], id_sort_key(i))):
+        old, new = _version(obj_id, after_low.get(obj_id)), _version(obj_id, after_high.get(obj_id))
+        if reverse:
+            old, new = new, old
+        if old == new:
+            continue
+        if old is None:
+            diff = type_object_diff(obj_id=obj_id, change="created", obj=new)
+        elif new is None:
+            diff = type_object_diff(obj_id=obj_id, change="deleted", obj=old)
+        else:
+            diff = type_object_diff(obj_id=obj_id, change="modified", fields=field_changes(old, new))
+        diff.log_ids = touched[obj_id]
+        diffs.append(diff)
+    return diffs
+
+
+def _short(value, width: int = 70) -> str:
+    text = json.dumps(value, ensure_ascii=False)
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def print_diff(log_a: str, log_b: str, diffs: list[type_object_diff]) -> None:
+    counts = {kind: sum(d.change == kind for d in diffs) for kind in ("created", "deleted", "modified")}
+    print(f"{log_a}..{log_b}: {counts['created']} created, {counts['deleted']} deleted, "
+          f"{counts['modified']} modified")
+    for diff in diffs:
+        via = ", ".join(diff.log_ids)
+        if diff.change == "created":
+            print(f"+ [{diff.obj_id}] {describe_object(diff.obj)}  ({via})")
+        elif diff.change == "deleted":
+            print(f"- [{diff.obj_id}] {describe_object(diff.obj)}  ({via})")
+        else:
+            print(f"~ [{diff.obj_id}] ({via})")
+            for change in diff.fields:
+                if change.kind == "append":
+                    print(f"    {change.path}: + {_short(change.new)}")
+                elif change.kind == "add":
+                    print(f"    {change.path}: (new) {_short(change.new)}")
+                elif change.kind == "remove":
+                    print(f"    {change.path}: (removed) {_short(change.old)}")
+                else:
+                    print(f"    {change.path}: {_short(change.old, 35)} -> {_short(change.new, 35)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Objects created, deleted and modified between two log ids")
+    parser.add_argument('log_a', type=str,
+                        help='Old side (e.g. l-003; l-000 is the empty store)')
+    parser.add_argument('log_b', type=str, nargs='?', default=None,
+                        help='New side (default: the latest log id)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the differences as JSON')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    log_b = args.log_b or IDManager().current_ids["l"]
+    try:
+        diffs = diff_log_ids(args.log_a, log_b)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps([asdict(d) for d in diffs], indent=2))
+    else:
+        print_diff(args.log_a, log_b, diffs)
@@ -0,0 +1,379 @@
+"""Post-commit event stream.
+
+handle_changes() publishes one type_commit_event after every successful
+commit. Consumers can react to commits without polling the object folders:
+
+- In-process: register a callback with subscribe(). Callbacks run
+  synchronously after the commit; a failing callback is reported and skipped,
+  it never undoes the commit.
+- Out-of-process: every event is appended to the spool file
+  contents/events/feed.jsonl (the source of truth, numbered by "seq").
+  If a reader holds the FIFO contents/events/feed.fifo open, the event is
+  also written there for low latency.
+
+Backpressure: the publisher never blocks. FIFO writes are non-blocking, so a
+slow reader whose pipe is full simply misses FIFO lines; it detects the gap
+in "seq" and catches up from the spool (see follow_events()).
+
+The derived stores (search, dedupe, worlds, verdict_cache) are not
+subscribers, so a commit never waits for them: when one is next read it
+asks events_since() for the commits since the log id it reflects and
+applies only those, or rebuilds when the spool cannot account for them
+(a rewind, a rotated-away spool, a commit made without events).
+"""
+import argparse
+import errno
+import json
+import os
+import select
+import stat
+import sys
+import time
+from dataclasses import asdict
+from typing import BinaryIO, Callable, Iterator
+
+from cus_types_main import type_commit_event
+from utils import add_workspace_argument, get_workspace, set_workspace
+
+
+# File names inside the workspace's contents/events folder
+SPOOL_NAME = "feed.jsonl"
+FIFO_NAME = "feed.fifo"
+
+# Rotate the spool once it grows past this size (one rotated file is kept)
+MAX_SPOOL_BYTES = 8 * 1024 * 1024
+
+# Writes up to PIPE_BUF bytes are atomic on a pipe
+PIPE_BUF = 4096
+
+# read_spool() looks for the first new event this many bytes at a time from the end
+TAIL_CHUNK_BYTES = 64 * 1024
+
+_subscribers: list[tuple[str, Callable[[type_commit_event], None]]] = []
+
+
+def subscribe(callback: Callable[[type_commit_event], None], name: str | None = None) -> str:
+    """Register an in-process callback for commit events.
+
+    Args:
+        callback: Called with a type_commit_event after each commit
+        name: Subscriber name (defaults to the callback's qualified name)
+
+    Returns:
+        The subscriber name (use it to unsubscribe)
+    """
+    if name is None:
+        name = f"{callback.__module__}.{callback.__qualname__}"
+    unsubscribe(name)
+    _subscribers.append((name, callback))
+    return name
+
+
+def unsubscribe(name: str) -> bool:
+    """Remove a subscriber by name. Returns True if one was removed."""
+    for i, (sub_name, _) in enumerate(_subscribers):
+        if sub_name == name:
+            del _subscribers[i]
+            return True
+    return False
+
+
+def spool_path() -> str:
+    """Spool file of the current workspace."""
+    return os.path.join(get_workspace().events_folder, SPOOL_NAME)
+
+
+def fifo_path() -> str:
+    """FIFO of the current workspace."""
+    return os.path.join(get_workspace().events_folder, FIFO_NAME)
+
+
+def last_seq() -> int:
+    """Read the seq of the last event in the spool (0 if empty)."""
+    spool = spool_path()
+    for path in (spool, spool + ".1"):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - PIPE_BUF * 4))
+            lines = f.read().splitlines()
+        for line in reversed(lines):
+            try:
+                return json.loads(line)["seq"]
+            except (ValueError, KeyError):
+                continue
+    return 0
+
+
+def _append_spool(line: str) -> None:
+    """Append one event line to the spool, rotating it if too large."""
+    spool = spool_path()
+    os.makedirs(os.path.dirname(spool), exist_ok=True)
+    if os.path.exists(spool) and os.path.getsize(spool) > MAX_SPOOL_BYTES:
+        os.replace(spool, spool + ".1")
+    with open(spool, "a") as f:
+        f.write(line + "\n")
+
+
+def _write_fifo(line: str, seq: int, log_id: str) -> bool:
+    """Write to the FIFO without blocking. Returns True if delivered."""
+    fifo = fifo_path()
+    try:
+        if not stat.S_ISFIFO(os.stat(fifo).st_mode):
+            return False
+    except FileNotFoundError:
+        return False
+
+    data = (line + "\n").encode()
+    if len(data) > PIPE_BUF:
+        # Keep the write atomic; the reader fetches the full event from the spool
+        data = (json.dumps({"seq": seq, "log_id": log_id, "truncated": True}) + "\n").encode()
+
+    try:
+        fd = os.open(fifo, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno == errno.ENXIO:
+            return False  # No reader attached
+        raise
+    try:
+        os.write(fd, data)
+        return True
+    except OSError as e:
+        if e.errno in (errno.EAGAIN, errno.EPIPE):
+            return False  # Reader is lagging or gone; it catches up from the spool
+        raise
+    finally:
+        os.close(fd)
+
+
+def publish(event: type_commit_event) -> type_commit_event:
+    """Publish a commit event to the spool, the FIFO and in-process subscribers.
+
+    Args:
+        event: The commit event (seq is assigned here)
+
+    Returns:
+        The event with its seq set
+    """
+    event.seq = last_seq() + 1
+    line = json.dumps(asdict(event))
+    _append_spool(line)
+    _write_fifo(line, event.seq, event.log_id)
+
+    for name, callback in list(_subscribers):
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"Warning: event subscriber {name} failed on {event.log_id}: {e}", file=sys.stderr)
+
+    return event
+
+
+def _read_events(f: BinaryIO, offset: int, after_seq: int) -> tuple[list[dict], int]:
+    """Events with seq > after_seq in the complete lines of a spool file from offset on.
+
+    Returns:
+        Tuple of (events, offset after the last complete line); a line still
+        being appended is left for the next read
+    """
+    f.seek(offset)
+    data = f.read()
+    end = data.rfind(b"\n") + 1
+    events = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue  # Damaged line (e.g. a crash mid-append)
+        if event["seq"] > after_seq:
+            events.append(event)
+    return events, offset + end
+
+
+def _offset_after(f: BinaryIO, after_seq: int) -> int:
+    """Offset in a spool file before which every event has seq <= after_seq.
+
+    Steps back from the end a chunk at a time (lines are in seq order), so
+    reading the newest events does not parse the whole file.
+    """
+    offset = f.seek(0, os.SEEK_END)
+    while offset > 0 and after_seq > 0:
+        offset = max(0, offset - TAIL_CHUNK_BYTES)
+        f.seek(offset)
+        if offset:
+            f.readline()  # Partial line
+        start = f.tell()
+        try:
+            if json.loads(f.readline())["seq"] <= after_seq:
+                return start
+        except (ValueError, KeyError):
+            continue
+    return 0
+
+
+def read_spool(after_seq: int = 0) -> list[dict]:
+    """Read spooled events with seq > after_seq (rotated file included)."""
+    spool = spool_path()
+    events = []
+    for path in (spool + ".1", spool):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            events += _read_events(f, _offset_after(f, after_seq), after_seq)[0]
+    return events
+
+
+def events_since(log_id: str, target: str, after_seq: int = 0) -> list[dict] | None:
+    """Spooled events of the commits that lead from log_id to target, in order.
+
+    Args:
+        log_id: Log id a derived store reflects
+        target: Log id to catch up to (usually the config's current one)
+        after_seq: Seq known to precede those commits (reads less of the spool)
+
+    Returns:
+        The events, or None if the spool does not hold every commit from
+        log_id to target (rewound past log_id, rotated away, not published)
+    """
+    if log_id == target:
+        return []
+    by_log_id = {event["log_id"]: event for event in read_spool(after_seq)}
+    chain = []
+    while target != log_id:
+        event = by_log_id.get(target)
+        if event is None:
+            return None
+        chain.append(event)
+        target = event["parent_log_id"]
+    chain.reverse()
+    return chain
+
+
+def statements_touched(events: list[dict]) -> tuple[list[str], dict[str, list[str]]]:
+    """Statements touched by a run of events, with their changed fields merged.
+
+    Returns:
+        Tuple of (statement ids in order of first touch, {id: changed field
+        paths}); statements created or deleted in the run have no fields entry
+    """
+    touched: dict[str, None] = {}
+    fields: dict[str, set[str]] = {}
+    whole: set[str] = set()
+    for event in events:
+        for obj_id in event["created"] + event["modified"] + event["deleted"]:
+            if obj_id.startswith("s-"):
+                touched[obj_id] = None
+        whole.update(event["created"] + event["deleted"])
+        for obj_id, paths in event["fields"].items():
+            fields.setdefault(obj_id, set()).update(paths)
+    return list(touched), {i: sorted(paths) for i, paths in fields.items() if i in touched and i not in whole}
+
+
+class _SpoolTail:
+    """Reads what was appended to the spool since the previous call.
+
+    Keeps the inode and byte offset of the spool file being read; when the
+    spool is rotated, the rest of that file is read from spool.1 first.
+    """
+
+    def __init__(self, spool: str):
+        self.spool = spool
+        self.inode: int | None = None
+        self.offset = 0
+
+    def read(self, after_seq: int) -> list[dict]:
+        try:
+            f = open(self.spool, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            events = []
+            if inode != self.inode:
+                # First read, or the spool was rotated since the last one
+                try:
+                    with open(self.spool + ".1", "rb") as rotated:
+                        same = os.fstat(rotated.fileno()).st_ino == self.inode
+                        events, _ = _read_events(rotated, self.offset if same else 0, after_seq)
+                except FileNotFoundError:
+                    pass
+                self.inode, self.offset = inode, 0
+            more, self.offset = _read_events(f, self.offset, after_seq)
+        return events + more
+
+
+def follow_events(after_seq: int = 0, interval: float = 1.0) -> Iterator[dict]:
+    """Yield events forever, starting after after_seq.
+
+    Uses the FIFO for wake-ups when possible and the spool as the source of
+    truth, so a reader that fell behind never loses events. Each pass reads
+    only the bytes appended to the spool since the previous one.
+
+    Args:
+        after_seq: Last seq already processed (0 for the whole spool)
+        interval: Maximum wait between spool checks in seconds
+    """
+    fifo = fifo_path()
+    os.makedirs(os.path.dirname(fifo), exist_ok=True)
+    if not os.path.exists(fifo):
+        try:
+            os.mkfifo(fifo)
+        except (OSError, AttributeError):
+            pass  # No FIFO support: poll the spool only
+
+    fifo_fd = None
+    if os.path.exists(fifo):
+        # Read-write: holding a write end ourselves, the FIFO never reports EOF
+        # when a publisher closes it, so select() only wakes up on new data
+        fifo_fd = os.open(fifo, os.O_RDWR | os.O_NONBLOCK)
+
+    tail = _SpoolTail(spool_path())
+    last_seq = after_seq
+    try:
+        while True:
+            for event in tail.read(last_seq):
+                last_seq = event["seq"]
+                yield event
+
+            if fifo_fd is None:
+                time.sleep(interval)
+                continue
+
+            readable, _, _ = select.select([fifo_fd], [], [], interval)
+            if readable:
+                # FIFO lines only signal new events; contents are read from the spool
+                try:
+                    while os.read(fifo_fd, 65536):
+                        pass
+                except BlockingIOError:
+                    pass
+    finally:
+        if fifo_fd is not None:
+            os.close(fifo_fd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the post-commit event feed")
+    parser.add_argument('--since', type=int, default=0,
+                        help='Only show events with seq greater than this')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep running and print new events as they are published')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.follow:
+        try:
+            for event in follow_events(args.since):
+                print(json.dumps(event), flush=True)
+        except KeyboardInterrupt:
+            pass
+    else:
+        for event in read_spool(args.since):
+            print(json.dumps(event))
@@ -0,0 +1,514 @@
+"""Consistency check (and repair) of a workspace.
+
+The object files, the history backup folders, the log and the
+config.json counters must agree. fsck streams the log once, lists each
+backup folder once and parses the object files in parallel, then reports:
+
+    log-parse            unreadable log line (a torn last line is a crashed append)
+    duplicate-log-id     the same log id twice
+    log-gap              a log id that does not follow the previous one (warning)
+    duplicate-creation   an object created by two log entries
+    modified-before-created  modification/deletion of an id no entry created (warning)
+    missing-backup       a logged modification or deletion without its backup file
+    orphan-backup        a backup folder/file no log entry accounts for (warning)
+    missing-object       an object the log created (and did not delete) whose file is gone
+    unreadable-object    an object file that is not a JSON object
+    id-mismatch          an object file whose "id" does not match its name/folder
+    orphan-object        an object file no log entry created, or one the log deleted
+    dangling-reference   a preliminaries/progresses/ref/hypothesis reference to a missing object (warning)
+    counter-behind       a config.json counter below the highest id in use
+    unfinished-commit    config.json ahead of the last log entry (crash before the log append)
+    config-missing       no config.json
+    unfinished-rewind    a rewind stopped part way (rewind.py journal present)
+    missing-log-segment  a cold log segment (log_store.py) that is gone or unreadable;
+                         nothing else is checked or repaired then
+
+With --repair, fsck finishes an interrupted rewind, rolls back an
+unfinished commit, raises counters, moves orphan and unreadable files to
+contents/lost+found, restores missing objects from their latest backup
+(later changes to them are lost), and checks again. References and missing backups are only reported.
+
+Usage:
+    python src/fsck.py [--repair] [--workers 8] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+from cus_types_main import type_fsck_issue
+from log_store import iter_lines, log_tail, read_manifest, segment_file
+from refs import parse_reference
+from rewind import PHASES, read_journal, resume_rewind
+from utils import (IDManager, Workspace, add_workspace_argument, ensure_config, get_log_id_from_entry,
+                   get_workspace, id_sort_key, increment_id, set_workspace, use_workspace)
+
+
+ISSUE_KINDS = {
+    "log-parse": "error",
+    "duplicate-log-id": "error",
+    "log-gap": "warning",
+    "duplicate-creation": "error",
+    "modified-before-created": "warning",
+    "missing-backup": "error",
+    "orphan-backup": "warning",
+    "missing-object": "error",
+    "unreadable-object": "error",
+    "id-mismatch": "error",
+    "orphan-object": "error",
+    "dangling-reference": "warning",
+    "counter-behind": "error",
+    "unfinished-commit": "error",
+    "config-missing": "error",
+    "unfinished-rewind": "error",
+    "missing-log-segment": "error",
+}
+
+ID_PATTERN = re.compile(r'^[pse]-[a-z]*\d+$')
+
+# Fields holding object ids (dot paths); hypothesis items use "(s-...)" prefixes
+REFERENCE_FIELDS = ["preliminaries", "progresses", "proof.ref", "solution.ref"]
+
+# Object files are parsed in a process pool above this count, in chunks
+PARALLEL_THRESHOLD = 2000
+CHUNK_SIZE = 1000
+
+LOST_FOUND_NAME = "lost+found"
+
+
+# ============================================================================
+# Crash recovery
+# ============================================================================
+def recover_workspace() -> str:
+    """Roll back a commit whose log entry was never written.
+
+    handle_changes() bumps the ids in config.json, writes the objects and
+    appends to log.jsonl last. If config.json is ahead of the last log
+    entry, the objects it touched are restored from their backups, objects
+    with ids past the logged counters are deleted and config.json is reset.
+
+    Returns:
+        The log id that was rolled back ("" if the workspace was consistent)
+    """
+    workspace = get_workspace()
+    config = ensure_config(workspace)
+    log_id, current, _ = log_tail()
+    expected = dict(zip("pse", current), l=log_id)
+    if all(config.get(k) == v for k, v in expected.items()):
+        return ""
+
+    # A torn trailing line belongs to the unfinished commit
+    if os.path.exists(workspace.log_path):
+        with open(workspace.log_path, "r") as f:
+            lines = f.readlines()
+        if lines and not lines[-1].endswith("\n"):
+            with open(workspace.log_path, "w") as f:
+                f.writelines(lines[:-1])
+
+    unfinished = config.get("l", log_id)
+    backup_folder = os.path.join(workspace.history_folder, unfinished)
+    if unfinished != log_id and os.path.isdir(backup_folder):
+        for filename in os.listdir(backup_folder):
+            obj_type = filename.split("-")[0]
+            if obj_type in workspace.object_folders:
+                shutil.copy2(os.path.join(backup_folder, filename),
+                             os.path.join(workspace.object_folders[obj_type], filename))
+        shutil.rmtree(backup_folder)
+
+    for obj_type, folder in workspace.object_folders.items():
+        if not os.path.isdir(folder):
+            continue
+        limit = id_sort_key(expected[obj_type])
+        for filename in os.listdir(folder):
+            obj_id = filename[:-5]
+            if filename.endswith(".json") and ID_PATTERN.match(obj_id) and id_sort_key(obj_id) > limit:
+                os.remove(os.path.join(folder, filename))
+
+    with open(workspace.config_path, "w") as f:
+        json.dump(expected, f, indent=4)
+    IDManager._instances.pop(workspace.root, None)
+    return unfinished
+
+
+# ============================================================================
+# Scanning
+# ============================================================================
+def object_references(obj: dict) -> list[str]:
+    """Object ids an object refers to."""
+    refs = []
+    for item in obj.get("hypothesis") or []:
+        ref = parse_reference(item) if isinstance(item, str) else None
+        if ref:
+            refs.append(ref)
+    for field in REFERENCE_FIELDS:
+        value = obj
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        for item in value if isinstance(value, list) else []:
+            if isinstance(item, str) and ID_PATTERN.match(item.strip()):
+                refs.append(item.strip())
+    return refs
+
+
+def _scan_objects(paths: list[str]) -> list[tuple[str, str, list[str], str]]:
+    """Parse object files (process pool worker).
+
+    Returns:
+        [(path, "id" field, referenced ids, error)]
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            results.append((path, "", [], f"{type(e).__name__}: {e}"))
+            continue
+        if not isinstance(data, dict):
+            results.append((path, "", [], "not a JSON object"))
+            continue
+        results.append((path, str(data.get("id", "")), object_references(data), ""))
+    return results
+
+
+class Fsck:
+    """One check of a workspace; issues accumulate in self.issues."""
+
+    def __init__(self, workspace: Workspace, workers: int | None = None):
+        self.workspace = workspace
+        self.workers = workers
+        self.issues: list[type_fsck_issue] = []
+        self.stats: dict[str, int] = {}
+
+        self.log_ids: set[str] = set()
+        self.last_log_id = "l-000"
+        self.torn_tail = False
+        self.log_lost = False  # A cold log segment is missing or unreadable
+        self.created: dict[str, str] = {}  # obj_id -> creating log id
+        self.modified: dict[str, list[str]] = {}  # log_id -> modified or deleted ids (each has a backup)
+        self.deleted: dict[str, str] = {}  # obj_id -> deleting log id (unless created again)
+        self.backups: dict[str, set[str]] = {}  # backup folder -> obj ids in it
+        self.files: dict[str, str] = {}  # obj_id -> path
+        self.max_ids: dict[str, str] = {}  # type -> highest id in use
+
+    def report(self, kind: str, target: str, detail: str = "") -> None:
+        self.issues.append(type_fsck_issue(kind=kind, target=target, detail=detail, severity=ISSUE_KINDS[kind]))
+
+    def run(self) -> list[type_fsck_issue]:
+        self.check_rewind()
+        self.scan_log()
+        if self.log_lost:
+            return self.issues  # Without the whole log every object would look orphaned
+        self.scan_backups()
+        self.scan_objects()
+        self.collect_max_ids()
+        self.check_config()
+        return self.issues
+
+    def check_rewind(self) -> None:
+        """A rewind journal means the store is half way between two states."""
+        with use_workspace(self.workspace):
+            journal = read_journal()
+        if journal is not None:
+            phase = PHASES[min(journal["phase"], len(PHASES) - 1)]
+            self.report("unfinished-rewind", journal["plan"]["target"], f"stopped at phase '{phase}'")
+
+    def scan_log(self) -> None:
+        """Stream the log (cold segments, then log.jsonl) once."""
+        previous = "l-000"
+        count = 0
+        for segment in read_manifest(self.workspace):
+            if not os.path.exists(segment_file(segment, self.workspace)):
+                self.report("missing-log-segment", segment.name, f"{segment.first}..{segment.last}: file is gone")
+                self.log_lost = True
+        if self.log_lost:
+            self.stats["log_entries"] = 0
+            return
+        try:
+            for lineno, line in enumerate(iter_lines(workspace=self.workspace), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    log_id = get_log_id_from_entry(entry)
+                    changes = entry[log_id]
+                except (ValueError, KeyError, TypeError):
+                    self.torn_tail = not line.endswith("\n")
+                    self.report("log-parse", f"log line {lineno}",
+                                "torn last line" if self.torn_tail else f"unreadable: {line[:60]!r}")
+                    continue
+                count += 1
+                if log_id in self.log_ids:
+                    self.report("duplicate-log-id", log_id, f"line {lineno}")
+                elif log_id != increment_id(previous):
+                    self.report("log-gap", log_id, f"follows {previous}")
+                self.log_ids.add(log_id)
+                previous = self.last_log_id = log_id
+
+                for obj_id in changes.get("creation", []):
+                    if obj_id in self.created and obj_id not in self.deleted:
+                        self.report("duplicate-creation", obj_id, f"in {self.created[obj_id]} and {log_id}")
+                    else:
+                        self.created[obj_id] = log_id
+                        self.deleted.pop(obj_id, None)  # A revert may create a deleted id again
+                modified = changes.get("modification", []) + changes.get("deletion", [])
+                for obj_id in modified:
+                    if obj_id not in self.created:
+                        self.report("modified-before-created", obj_id, f"in {log_id}")
+                for obj_id in changes.get("deletion", []):
+                    self.deleted[obj_id] = log_id
+                self.modified[log_id] = modified
+        except (OSError, EOFError) as e:
+            self.report("missing-log-segment", "log_segments", f"unreadable: {e}")
+            self.log_lost = True
+        self.stats["log_entries"] = count
+
+    def scan_backups(self) -> None:
+        """List every backup folder once and match it against the log."""
+        history = self.workspace.history_folder
+        if os.path.isdir(history):
+            with os.scandir(history) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        self.backups[entry.name] = {n[:-5] for n in os.listdir(entry.path) if n.endswith(".json")}
+        self.stats["backup_folders"] = len(self.backups)
+
+        for log_id, modified in self.modified.items():
+            present = self.backups.get(log_id, set())
+            for obj_id in modified:
+                if obj_id not in present:
+                    self.report("missing-backup", f"{log_id}/{obj_id}")
+        for folder, obj_ids in self.backups.items():
+            if folder not in self.log_ids:
+                self.report("orphan-backup", folder, "backup folder of no log entry")
+                continue
+            for obj_id in sorted(obj_ids - set(self.modified.get(folder, []))):
+                self.report("orphan-backup", f"{folder}/{obj_id}", "not modified or deleted by that log entry")
+
+    def scan_objects(self) -> None:
+        """Parse every object file (in parallel for large stores) and check it against the log."""
+        paths = []
+        for obj_type, folder in self.workspace.object_folders.items():
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as it:
+                paths += [e.path for e in it if e.name.endswith(".json")]
+        self.stats["object_files"] = len(paths)
+
+        if len(paths) >= PARALLEL_THRESHOLD and self.workers != 1:
+            chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = [r for chunk in pool.map(_scan_objects, chunks) for r in chunk]
+        else:
+            results = _scan_objects(paths)
+
+        references: list[tuple[str, str]] = []
+        folder_types = {folder: t for t, folder in self.workspace.object_folders.items()}
+        for path, file_id, refs, error in results:
+            folder, filename = path.rsplit(os.sep, 1)
+            obj_id, folder_type = filename[:-5], folder_types[folder]
+            if error:
+                self.report("unreadable-object", obj_id, error)
+                continue
+            if file_id != obj_id or not obj_id.startswith(folder_type + "-"):
+                self.report("id-mismatch", obj_id, f"file holds id {file_id!r} in the {folder_type} folder")
+                continue
+            self.files[obj_id] = path
+            if obj_id not in self.created:
+                self.report("orphan-object", obj_id, "no log entry created it")
+            elif obj_id in self.deleted:
+                self.report("orphan-object", obj_id, f"deleted in {self.deleted[obj_id]}")
+            references += [(obj_id, ref) for ref in refs]
+
+        for obj_id, log_id in self.created.items():
+            if obj_id not in self.files and obj_id not in self.deleted and not any(i.target == obj_id for i in self.issues
+                                                    if i.kind in ("unreadable-object", "id-mismatch")):
+                self.report("missing-object", obj_id, f"created in {log_id}")
+        for obj_id, ref in references:
+            if ref not in self.files:
+                self.report("dangling-reference", obj_id, f"refers to missing {ref}")
+
+    def collect_max_ids(self) -> None:
+        """Highest id of each type among log entries, logged creations and object files."""
+        by_type: dict[str, set[str]] = {}
+        for obj_id in set(self.created) | set(self.files) | self.log_ids:
+            by_type.setdefault(obj_id.split("-")[0], set()).add(obj_id)
+        self.max_ids = {t: max(ids, key=id_sort_key) for t, ids in by_type.items()}
+
+    def check_config(self) -> None:
+        """Counters must cover every id in use; "l" must match the last log entry."""
+        if not os.path.exists(self.workspace.config_path):
+            self.report("config-missing", "config.json")
+            return
+        with open(self.workspace.config_path, "r") as f:
+            config = json.load(f)
+        for obj_type in "pse":
+            highest = self.max_ids.get(obj_type)
+            counter = config.get(obj_type, f"{obj_type}-000")
+            if highest and id_sort_key(counter) < id_sort_key(highest):
+                self.report("counter-behind", "config.json", f"{obj_type} is {counter}, {highest} is in use")
+        counter = config.get("l", "l-000")
+        if id_sort_key(counter) < id_sort_key(self.last_log_id):
+            self.report("counter-behind", "config.json", f"l is {counter}, log is at {self.last_log_id}")
+        elif counter != self.last_log_id:
+            self.report("unfinished-commit", counter, f"config.json is at {counter}, log at {self.last_log_id}")
+
+
+# ============================================================================
+# Repair
+# ============================================================================
+def _move_to_lost_found(workspace: Workspace, path: str) -> str:
+    target = os.path.join(workspace.contents, LOST_FOUND_NAME, os.path.relpath(path, workspace.contents))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.exists(target):
+        target += f".{int(time.time())}"
+    shutil.move(path, target)
+    return os.path.relpath(target, workspace.root)
+
+
+def repair(check: Fsck) -> list[type_fsck_issue]:
+    """Fix what can be fixed; returns the issues with their "repaired" note set."""
+    workspace = check.workspace
+    kinds = {i.kind for i in check.issues}
+    fixed = []
+
+    unfinished = next((i.target for i in check.issues if i.kind == "unfinished-commit"), None)
+    if check.torn_tail:
+        with open(workspace.log_path, "r") as f:
+            lines = f.readlines()
+        if lines and not lines[-1].endswith("\n"):
+            with open(workspace.log_path, "w") as f:
+                f.writelines(lines[:-1])
+        for issue in check.issues:
+            if issue.kind == "log-parse" and issue.detail == "torn last line":
+                issue.repaired = "dropped the torn line"
+                fixed.append(issue)
+
+    # Orphans go to lost+found first so that the rollback below deletes nothing
+    for issue in check.issues:
+        if issue.kind in ("orphan-object", "unreadable-object", "id-mismatch"):
+            obj_type = issue.target.split("-")[0]
+            folders = [workspace.object_folders[obj_type]] if obj_type in workspace.object_folders \
+                else list(workspace.object_folders.values())
+            for folder in folders:
+                path = os.path.join(folder, f"{issue.target}.json")
+                if os.path.exists(path):
+                    issue.repaired = f"moved to {_move_to_lost_found(workspace, path)}"
+                    fixed.append(issue)
+                    break
+        elif issue.kind == "orphan-backup" and issue.target != unfinished:
+            path = os.path.join(workspace.history_folder, *issue.target.split("/"))
+            path = path if os.path.isdir(path) else path + ".json"
+            if os.path.exists(path):
+                issue.repaired = f"moved to {_move_to_lost_found(workspace, path)}"
+                fixed.append(issue)
+
+    if unfinished:
+        rolled_back = recover_workspace()
+        for issue in check.issues:
+            if issue.kind == "unfinished-commit":
+                issue.repaired = f"rolled back {rolled_back}" if rolled_back else "nothing to roll back"
+                fixed.append(issue)
+
+    # Restore objects that are gone (or were just moved away) from their latest backup
+    lost = {i.target for i in check.issues
+            if i.kind == "missing-object" or (i.kind in ("unreadable-object", "id-mismatch") and i.repaired)}
+    for obj_id in lost:
+        if obj_id not in check.created or obj_id in check.deleted:
+            continue
+        for log_id in sorted(check.backups, key=id_sort_key, reverse=True):
+            if obj_id in check.backups[log_id] and log_id in check.log_ids:
+                folder = workspace.object_folders[obj_id.split("-")[0]]
+                os.makedirs(folder, exist_ok=True)
+                shutil.copy2(os.path.join(workspace.history_folder, log_id, f"{obj_id}.json"),
+                             os.path.join(folder, f"{obj_id}.json"))
+                for issue in check.issues:
+                    if issue.target == obj_id and issue.kind in ("missing-object", "unreadable-object", "id-mismatch"):
+                        issue.repaired = (issue.repaired + "; " if issue.repaired else "") + \
+                            f"restored the version before {log_id} (later changes lost)"
+                        if issue not in fixed:
+                            fixed.append(issue)
+                break
+
+    if "counter-behind" in kinds:
+        # Scan again: ids moved to lost+found or rolled back above are no longer in use
+        rescan = Fsck(workspace, check.workers)
+        rescan.run()
+        config = ensure_config(workspace)
+        raised = False
+        for obj_type, highest in rescan.max_ids.items():
+            if obj_type in config and id_sort_key(config[obj_type]) < id_sort_key(highest):
+                config[obj_type] = highest
+                raised = True
+        with open(workspace.config_path, "w") as f:
+            json.dump(config, f, indent=4)
+        IDManager._instances.pop(workspace.root, None)
+        for issue in check.issues:
+            if issue.kind == "counter-behind":
+                issue.repaired = "raised to the highest id in use" if raised else \
+                    "no id past the counters is left in use"
+                fixed.append(issue)
+    return fixed
+
+
+def run_fsck(workspace: Workspace | None = None, do_repair: bool = False,
+             workers: int | None = None) -> tuple[list[type_fsck_issue], list[type_fsck_issue], dict]:
+    """Check (and optionally repair) a workspace.
+
+    Returns:
+        Tuple of (remaining issues, repaired issues, stats)
+    """
+    workspace = workspace or get_workspace()
+    start = time.perf_counter()
+    check = Fsck(workspace, workers)
+    check.run()
+    fixed = []
+    if do_repair and check.issues:
+        with use_workspace(workspace):
+            pending = [i for i in check.issues if i.kind == "unfinished-rewind"]
+            if pending:
+                resume_rewind()
+                pending[0].repaired = "finished the rewind"
+                fixed.append(pending[0])
+                check = Fsck(workspace, workers)
+                check.run()
+            fixed += repair(check)
+        check = Fsck(workspace, workers)
+        check.run()
+    check.stats["seconds"] = round(time.perf_counter() - start, 3)
+    return check.issues, fixed, check.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that objects, backups, log.jsonl and config.json agree")
+    parser.add_argument('--repair', action='store_true',
+                        help='Fix what can be fixed, then check again')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes for parsing object files (default: CPU count)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print issues as JSON')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    issues, fixed, stats = run_fsck(do_repair=args.repair, workers=args.workers)
+    if args.json:
+        print(json.dumps({"issues": [asdict(i) for i in issues], "repaired": [asdict(i) for i in fixed],
+                          "stats": stats}, indent=2))
+    else:
+        for issue in fixed:
+            print(f"[repaired] {issue.kind} {issue.target}: {issue.repaired}")
+        for issue in issues:
+            print(f"[{issue.severity}] {issue.kind} {issue.target}" + (f": {issue.detail}" if issue.detail else ""))
+        errors = sum(i.severity == "error" for i in issues)
+        print(f"{stats.get('log_entries', 0)} log entries, {stats.get('object_files', 0)} object files, "
+              f"{stats.get('backup_folders', 0)} backup folders checked in {stats['seconds']:.2f} s: "
+              f"{errors} errors, {len(issues) - errors} warnings")
+    sys.exit(1 if any(i.severity == "error" for i in issues) else 0)
@@ -0,0 +1,219 @@
+"""Index from object ids to the log entries that created, modified or deleted them.
+
+An SQLite index over the log (contents/index/history.db), so that
+per-object questions ("which entries modified s-012?", "when was p-003
+created?") and the "first change after log id L" lookups of diff.py and
+rewind.py do not scan the log:
+    entries (seq, log_id, current, bytes)   one row per log entry; seq is its position in the log
+    changes (obj_id, seq, kind)             kind: creation, modification or deletion
+
+LogManager.append() indexes each entry right after writing it, and a
+rewind drops the rows after its target (truncate()). ensure_current()
+catches up from the log when the index lags the config's log id (redo.py
+appends, an index update that failed) and rebuilds it when its last log
+id is no longer in the log, so deleting history.db is always safe.
+
+Usage:
+    python src/history_index.py s-012 p-003      history of objects
+    python src/history_index.py --rebuild
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from log_store import iter_lines, line_log_id
+from utils import (IDManager, Workspace, add_workspace_argument, get_log_id_from_entry, get_workspace,
+                   increment_id, set_workspace)
+
+
+DB_NAME = "history.db"
+
+# Rebuildable and written once per commit: WAL without a sync per transaction
+HISTORY_SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY, log_id TEXT UNIQUE, current TEXT, bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS changes (obj_id TEXT, seq INTEGER, kind TEXT);
+CREATE INDEX IF NOT EXISTS changes_by_object ON changes (obj_id, seq);
+CREATE INDEX IF NOT EXISTS changes_by_seq ON changes (seq);
+"""
+
+CHANGE_KINDS = ("creation", "modification", "deletion")
+
+
+class HistoryIndex:
+    """SQLite index of the log, by object id and by position."""
+
+    def __init__(self, workspace: Workspace | None = None):
+        self.workspace = workspace or get_workspace()
+        os.makedirs(self.workspace.index_folder, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.workspace.index_folder, DB_NAME))
+        self.conn.executescript(HISTORY_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @property
+    def last_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM entries").fetchone()[0]
+
+    @property
+    def last_log_id(self) -> str:
+        """Log id of the last indexed entry ("l-000" if none)."""
+        row = self.conn.execute("SELECT log_id FROM entries ORDER BY seq DESC LIMIT 1").fetchone()
+        return row[0] if row else "l-000"
+
+    def _add(self, seq: int, entry: dict, size: int) -> None:
+        log_id = get_log_id_from_entry(entry)
+        body = entry[log_id]
+        self.conn.execute("INSERT INTO entries (seq, log_id, current, bytes) VALUES (?, ?, ?, ?)",
+                          (seq, log_id, json.dumps(entry["current"]), size))
+        self.conn.executemany("INSERT INTO changes (obj_id, seq, kind) VALUES (?, ?, ?)",
+                              [(obj_id, seq, kind) for kind in CHANGE_KINDS for obj_id in body.get(kind, [])])
+
+    def append(self, entry: dict, size: int) -> bool:
+        """Index the entry just appended to the log.
+
+        Args:
+            entry: The log entry
+            size: Bytes of its log line
+
+        Returns:
+            False (nothing written) if the index does not end at the entry's
+            parent; ensure_current() fills the gap from the log
+        """
+        if get_log_id_from_entry(entry) != increment_id(self.last_log_id):
+            return False
+        with self.conn:
+            self._add(self.last_seq + 1, entry, size)
+        return True
+
+    def rebuild(self) -> int:
+        """Re-index the whole log; returns the number of entries."""
+        seq = 0
+        with self.conn:
+            self.conn.execute("DELETE FROM changes")
+            self.conn.execute("DELETE FROM entries")
+            for line in iter_lines(workspace=self.workspace):
+                try:
+                    entry = json.loads(line) if line.strip() else None
+                except ValueError:
+                    continue  # Torn last line of a crashed append
+                if entry is not None:
+                    seq += 1
+                    self._add(seq, entry, len(line.encode()))
+        return seq
+
+    def ensure_current(self) -> None:
+        """Catch up with the log if the index lags the config's log id."""
+        last = self.last_log_id
+        if last == IDManager(self.workspace).current_ids["l"]:
+            return
+        found, pending = last == "l-000", []
+        for line in iter_lines(since=None if found else last, workspace=self.workspace):
+            if not line.strip():
+                continue
+            if not found:
+                found = line_log_id(line) == last
+                continue
+            try:
+                pending.append((json.loads(line), len(line.encode())))
+            except ValueError:
+                continue  # Torn last line of a crashed append
+        if not found:
+            # The last indexed entry was rewound away behind the index's back
+            self.rebuild()
+            return
+        seq = self.last_seq
+        with self.conn:
+            for entry, size in pending:
+                seq += 1
+                self._add(seq, entry, size)
+
+    def truncate(self, log_id: str) -> None:
+        """Drop the entries after log_id ("l-000": all); everything if log_id is not indexed."""
+        seq = self.seq_of(log_id) or 0
+        with self.conn:
+            self.conn.execute("DELETE FROM changes WHERE seq > ?", (seq,))
+            self.conn.execute("DELETE FROM entries WHERE seq > ?", (seq,))
+
+    def seq_of(self, log_id: str) -> int | None:
+        """Position of a log id in the log (0 for "l-000", None if absent)."""
+        if log_id == "l-000":
+            return 0
+        row = self.conn.execute("SELECT seq FROM entries WHERE log_id = ?", (log_id,)).fetchone()
+        return row[0] if row else None
+
+    def current_at(self, log_id: str) -> list[str] | None:
+        """[p, s, e] counters recorded by an entry."""
+        row = self.conn.execute("SELECT current FROM entries WHERE log_id = ?", (log_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def entries_after(self, seq: int) -> list[tuple[str, int]]:
+        """(log_id, line bytes) of the entries after a position, in log order."""
+        return self.conn.execute("SELECT log_id, bytes FROM entries WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+
+    def changes_between(self, low: int, high: int | None = None) -> list[tuple[str, str, str]]:
+        """(obj_id, log_id, kind) of the changes in positions (low, high], in log order."""
+        return self.conn.execute(
+            "SELECT c.obj_id, e.log_id, c.kind FROM changes c JOIN entries e ON e.seq = c.seq "
+            "WHERE c.seq > ? AND c.seq <= ? ORDER BY c.seq, c.rowid",
+            (low, self.last_seq if high is None else high)).fetchall()
+
+    def next_change(self, obj_id: str, seq: int) -> tuple[str, str] | None:
+        """(log_id, kind) of the first change to an object after a position."""
+        return self.conn.execute(
+            "SELECT e.log_id, c.kind FROM changes c JOIN entries e ON e.seq = c.seq "
+            "WHERE c.obj_id = ? AND c.seq > ? ORDER BY c.seq LIMIT 1", (obj_id, seq)).fetchone()
+
+    def history(self, obj_id: str) -> list[tuple[str, str]]:
+        """(log_id, kind) of every change to an object, in log order."""
+        return self.conn.execute(
+            "SELECT e.log_id, c.kind FROM changes c JOIN entries e ON e.seq = c.seq "
+            "WHERE c.obj_id = ? ORDER BY c.seq", (obj_id,)).fetchall()
+
+
+def on_append(workspace: Workspace, entry: dict, size: int) -> None:
+    """Index an entry LogManager.append() just wrote; a failure only leaves the index behind."""
+    try:
+        index = HistoryIndex(workspace)
+        try:
+            index.append(entry, size)
+        finally:
+            index.close()
+    except sqlite3.Error as e:
+        print(f"Warning: history index not updated ({e}); it catches up on its next use", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log entries that created, modified or deleted objects")
+    parser.add_argument('ids', nargs='*',
+                        help='Object ids (e.g. s-012 p-003)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Re-index the whole log')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    index = HistoryIndex()
+    try:
+        if args.rebuild:
+            print(f"Indexed {index.rebuild()} log entries.")
+        else:
+            index.ensure_current()
+        for obj_id in args.ids:
+            changes = index.history(obj_id)
+            if not changes:
+                print(f"{obj_id}: never changed")
+                continue
+            print(f"{obj_id}:")
+            for log_id, kind in changes:
+                print(f"  {log_id}  {kind}")
+    finally:
+        index.close()
@@ -0,0 +1,103 @@
+"""Base class for SQLite indexes derived from the statement files.
+
+Derived indexes live in contents/index/ and can always be rebuilt from the
+object files. Each index records the log id it reflects ("last_log_id")
+and how far it has read the event spool ("spool_seq"). Commits do not
+touch the indexes; ensure_current() brings one up to the config's log id
+when it is read: it re-indexes the statements touched by the commits in
+between (see events.events_since()) and rebuilds only when the spool
+cannot account for them (rewind, rotated spool, new index).
+"""
+import json
+import os
+import sqlite3
+
+from events import events_since, last_seq, statements_touched
+from utils import IDManager, get_workspace
+
+
+class StatementIndex:
+    """SQLite-backed index over statements, kept in sync with the log.
+
+    Subclasses set DB_NAME (file in the workspace's contents/index), SCHEMA
+    and TABLES, and implement _upsert() and
+    _remove(). SCHEMA must create a `meta (key, value)` table.
+    """
+    DB_NAME = ""
+    SCHEMA = ""
+    TABLES: tuple[str, ...] = ()
+
+    def __init__(self, db_path: str | None = None):
+        db_path = db_path or os.path.join(get_workspace().index_folder, self.DB_NAME)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _get_meta(self, key: str, default: str) -> str:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def last_log_id(self) -> str:
+        """Log id the index reflects."""
+        return self._get_meta("last_log_id", "")
+
+    def _upsert(self, statement: dict) -> None:
+        """Add or replace one statement (called inside a transaction)."""
+        raise NotImplementedError
+
+    def _remove(self, statement_id: str) -> None:
+        """Drop one statement if indexed (called inside a transaction)."""
+        raise NotImplementedError
+
+    def update(self, statement_ids: list[str], log_id: str) -> None:
+        """Re-index the given statements from disk and record log_id."""
+        folder = get_workspace().object_folders["s"]
+        with self.conn:
+            for statement_id in statement_ids:
+                file_path = os.path.join(folder, f"{statement_id}.json")
+                if os.path.exists(file_path):
+                    with open(file_path, "r") as f:
+                        self._upsert(json.load(f))
+                else:
+                    self._remove(statement_id)
+            self._set_meta("last_log_id", log_id)
+
+    def rebuild(self) -> int:
+        """Rebuild the whole index from the statement files.
+
+        Returns:
+            Number of indexed statements
+        """
+        from current import load_all_statements
+
+        statements = load_all_statements()
+        with self.conn:
+            for table in self.TABLES + ("meta",):
+                self.conn.execute(f"DELETE FROM {table}")
+            for statement in statements:
+                self._upsert(statement)
+            self._set_meta("last_log_id", IDManager().current_ids["l"])
+            self._set_meta("spool_seq", last_seq())
+        return len(statements)
+
+    def ensure_current(self) -> None:
+        """Catch up with the config's log id (incrementally when the event spool allows)."""
+        current = IDManager().current_ids["l"]
+        if self.last_log_id == current:
+            return
+        events = None
+        if self.last_log_id:
+            events = events_since(self.last_log_id, current, int(self._get_meta("spool_seq", "0")))
+        if events is None:
+            self.rebuild()
+            return
+        touched, _ = statements_touched(events)
+        self._set_meta("spool_seq", events[-1]["seq"])
+        self.update(touched, current)
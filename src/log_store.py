@@ -0,0 +1,294 @@
+"""Segmented log.jsonl: an appended hot segment and gzipped cold segments.
+
+contents/history/log.jsonl stays the hot segment: every commit appends to
+it (LogManager.append) and current.py --watch tails it. Once it grows past
+SEGMENT_BYTES it is rolled: its entries are gzipped into
+contents/log_segments/<nnnn>.jsonl.gz, listed in manifest.json with the
+log ids they cover, and log.jsonl starts over empty.
+
+Readers go through iter_lines(since=...), which skips the cold segments
+that end before a log id without opening them, so reading from a recent
+log id costs about the same however long the run is.
+
+A roll writes the segment, then the manifest, then empties log.jsonl.
+Hot lines the manifest already covers (a roll interrupted before its last
+step) are skipped by the readers and dropped by the next roll.
+
+Usage:
+    python src/log_store.py [--list]
+    python src/log_store.py --roll      roll the hot segment now
+    python src/log_store.py --merge     put every entry back into log.jsonl
+"""
+import argparse
+import gzip
+import json
+import os
+from dataclasses import asdict
+from typing import Iterable, Iterator
+
+from cus_types_main import type_log_segment
+from utils import (Workspace, add_workspace_argument, get_log_id_from_entry, get_workspace, id_sort_key,
+                   set_workspace)
+
+
+# The hot segment is rolled once it reaches this size
+SEGMENT_BYTES = 4 * 1024 * 1024
+COMPRESS_LEVEL = 6
+
+MANIFEST_NAME = "manifest.json"
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+def line_log_id(line: str) -> str | None:
+    """Log id of a log line; entries are written with it as the first key."""
+    try:
+        if line.startswith('{"l-'):
+            return line[2:line.index('"', 2)]
+        return get_log_id_from_entry(json.loads(line))
+    except ValueError:
+        return None
+
+
+def manifest_path(workspace: Workspace | None = None) -> str:
+    return os.path.join((workspace or get_workspace()).segments_folder, MANIFEST_NAME)
+
+
+def segment_file(segment: type_log_segment, workspace: Workspace | None = None) -> str:
+    return os.path.join((workspace or get_workspace()).segments_folder, segment.name + SEGMENT_SUFFIX)
+
+
+def read_manifest(workspace: Workspace | None = None) -> list[type_log_segment]:
+    """Cold segments in log order (empty for a log that was never rolled)."""
+    path = manifest_path(workspace)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [type_log_segment(**segment) for segment in json.load(f)["segments"]]
+
+
+def _write_manifest(workspace: Workspace, segments: list[type_log_segment]) -> None:
+    os.makedirs(workspace.segments_folder, exist_ok=True)
+    path = manifest_path(workspace)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"segments": [asdict(s) for s in segments]}, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def _replace_hot(workspace: Workspace, lines: list[str]) -> None:
+    # Write aside and swap, so the log is never half written
+    with open(workspace.log_path + ".tmp", "w") as f:
+        f.writelines(lines)
+    os.replace(workspace.log_path + ".tmp", workspace.log_path)
+
+
+def uncovered_lines(lines: Iterable[str], covered: str | None) -> Iterator[str]:
+    """Lines of a hot segment, minus those a cold segment already holds (up to log id covered)."""
+    limit = id_sort_key(covered) if covered else None
+    for line in lines:
+        if limit is not None:
+            log_id = line_log_id(line) if line.strip() else None
+            if log_id and id_sort_key(log_id) <= limit:
+                continue
+            limit = None
+        yield line
+
+
+def _hot_lines(workspace: Workspace, covered: str | None) -> Iterator[str]:
+    """Lines of log.jsonl, minus those a cold segment already holds."""
+    if not os.path.exists(workspace.log_path):
+        return
+    with open(workspace.log_path, "r") as f:
+        yield from uncovered_lines(f, covered)
+
+
+def iter_lines(since: str | None = None, workspace: Workspace | None = None) -> Iterator[str]:
+    """Raw lines of the whole log, in order, blank and torn lines included.
+
+    Args:
+        since: Only segments that can hold entries from this log id on are
+            read; lines before it may still be yielded, callers skip them
+        workspace: Defaults to the current workspace
+
+    Raises:
+        FileNotFoundError: If a segment listed in the manifest is gone
+    """
+    workspace = workspace or get_workspace()
+    segments = read_manifest(workspace)
+    start = id_sort_key(since) if since else None
+    for segment in segments:
+        if start is not None and id_sort_key(segment.last) < start:
+            continue
+        with gzip.open(segment_file(segment, workspace), "rt") as f:
+            yield from f
+    yield from _hot_lines(workspace, segments[-1].last if segments else None)
+
+
+def iter_entries(since: str | None = None, workspace: Workspace | None = None) -> Iterator[dict]:
+    """Parsed log entries (see iter_lines); blank and unreadable lines are skipped."""
+    for line in iter_lines(since, workspace):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue  # Torn last line of a crashed append
+
+
+def log_tail(workspace: Workspace | None = None) -> tuple[str, list[str], int]:
+    """Last complete entry without reading the cold segments.
+
+    Returns:
+        Tuple of (log id, [p, s, e] current ids, number of entries);
+        ("l-000", ["p-000", "s-000", "e-000"], 0) for an empty log
+    """
+    workspace = workspace or get_workspace()
+    segments = read_manifest(workspace)
+    log_id, current, count = "l-000", ["p-000", "s-000", "e-000"], 0
+    if segments:
+        log_id, current, count = segments[-1].last, segments[-1].current, sum(s.entries for s in segments)
+    for line in _hot_lines(workspace, log_id if segments else None):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # Torn last line of a crashed append
+        log_id, current, count = get_log_id_from_entry(entry), entry["current"], count + 1
+    return log_id, current, count
+
+
+def _drop_unlisted(workspace: Workspace, segments: list[type_log_segment]) -> None:
+    """Delete segment files the manifest no longer lists (left by truncate())."""
+    if not os.path.isdir(workspace.segments_folder):
+        return
+    listed = {segment.name + SEGMENT_SUFFIX for segment in segments}
+    for name in os.listdir(workspace.segments_folder):
+        if name.endswith(SEGMENT_SUFFIX) and name not in listed:
+            os.remove(os.path.join(workspace.segments_folder, name))
+
+
+def roll(workspace: Workspace | None = None, force: bool = False) -> type_log_segment | None:
+    """Move the hot segment into a new cold segment once it reaches SEGMENT_BYTES.
+
+    A torn last line stays in log.jsonl (fsck.py reports it).
+
+    Args:
+        workspace: Defaults to the current workspace
+        force: Roll whatever the size
+
+    Returns:
+        The new segment, or None if nothing was rolled
+    """
+    workspace = workspace or get_workspace()
+    if not os.path.exists(workspace.log_path):
+        return None
+    if not force and os.path.getsize(workspace.log_path) < SEGMENT_BYTES:
+        return None
+    segments = read_manifest(workspace)
+    lines, torn, first, last, current = [], [], None, None, None
+    for line in _hot_lines(workspace, segments[-1].last if segments else None):
+        if torn or not line.endswith("\n"):
+            torn.append(line)
+            continue
+        if not line.strip():
+            continue
+        lines.append(line)
+        entry_id = line_log_id(line)
+        if entry_id:
+            first, last = first or entry_id, entry_id
+            current = json.loads(line)["current"]
+    if last is None:
+        return None
+
+    segment = type_log_segment(name=f"{int(segments[-1].name) + 1 if segments else 1:04d}", first=first,
+                               last=last, entries=len(lines), current=current,
+                               bytes=sum(len(line.encode()) for line in lines))
+    path = segment_file(segment, workspace)
+    os.makedirs(workspace.segments_folder, exist_ok=True)
+    with gzip.open(path + ".tmp", "wt", compresslevel=COMPRESS_LEVEL) as f:
+        f.writelines(lines)
+    os.replace(path + ".tmp", path)
+    segment.stored = os.path.getsize(path)
+    _write_manifest(workspace, segments + [segment])
+    _replace_hot(workspace, torn)
+    return segment
+
+
+def _lines_until(lines, log_id: str) -> list[str]:
+    kept = []
+    for line in lines:
+        kept.append(line)
+        if line.strip() and line_log_id(line) == log_id:
+            break
+    return kept
+
+
+def truncate(log_id: str, workspace: Workspace | None = None) -> None:
+    """Keep the log up to and including log_id ("l-000": empty).
+
+    Cold segments after log_id are dropped; if log_id falls inside a cold
+    segment, its entries up to log_id become the hot segment. Safe to repeat
+    after an interruption (rewind.py runs it as a journaled phase).
+    """
+    workspace = workspace or get_workspace()
+    segments = read_manifest(workspace)
+    keep, lines = segments, []
+    if log_id == "l-000":
+        keep = []
+    else:
+        target = id_sort_key(log_id)
+        position = next((i for i, s in enumerate(segments) if id_sort_key(s.last) >= target), None)
+        if position is None:
+            lines = _lines_until(_hot_lines(workspace, segments[-1].last if segments else None), log_id)
+        elif segments[position].last == log_id:
+            keep = segments[:position + 1]
+        else:
+            keep = segments[:position]
+            with gzip.open(segment_file(segments[position], workspace), "rt") as f:
+                lines = _lines_until(f, log_id)
+
+    # Hot first: until the manifest changes, the old segments still cover (and hide) these lines
+    _replace_hot(workspace, lines)
+    if keep != segments:
+        _write_manifest(workspace, keep)
+    _drop_unlisted(workspace, keep)
+
+
+def merge(workspace: Workspace | None = None) -> int:
+    """Put every entry back into a single log.jsonl; returns the number of segments merged."""
+    workspace = workspace or get_workspace()
+    segments = read_manifest(workspace)
+    if not segments:
+        return 0
+    _replace_hot(workspace, list(iter_lines(workspace=workspace)))
+    _write_manifest(workspace, [])
+    _drop_unlisted(workspace, [])
+    return len(segments)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show and maintain the log segments")
+    parser.add_argument('--list', action='store_true',
+                        help='Show the segments (default)')
+    parser.add_argument('--roll', action='store_true',
+                        help='Roll the hot segment now, whatever its size')
+    parser.add_argument('--merge', action='store_true',
+                        help='Put every entry back into log.jsonl')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.roll:
+        segment = roll(force=True)
+        print(f"Rolled {segment.first}..{segment.last} into {segment.name}{SEGMENT_SUFFIX}" if segment
+              else "Nothing to roll.")
+    elif args.merge:
+        print(f"Merged {merge()} segments into log.jsonl.")
+    else:
+        workspace = get_workspace()
+        segments = read_manifest(workspace)
+        for segment in segments:
+            print(f"  {segment.name}  {segment.first}..{segment.last}: {segment.entries} entries, "
+                  f"{segment.bytes} bytes ({segment.stored} gzipped)")
+        hot = os.path.getsize(workspace.log_path) if os.path.exists(workspace.log_path) else 0
+        print(f"{len(segments)} cold segments, hot log.jsonl {hot} bytes")
@@ -0,0 +1,540 @@
+"""Run many puzzle sessions in parallel.
+
+Each puzzle gets its own workspace (see utils.Workspace) under a root
+folder, and the sessions are sharded across a process pool. A session runs
+the init -> solve -> check loop through the same functions the agents'
+CLIs use, one commit per move:
+
+    init      prob_init from the workspace's puzzle.md
+    propose   the backend proposes statements; each is created as
+              "validating" and linked to the root problem in one commit
+    check     checker.py decides what it can symbolically (verdict cache
+              included); the backend checks the rest
+    revise    rejected statements get a new proof from the backend (or
+              are abandoned)
+    conclude  once the backend can answer every objective, the root
+              problem is resolved
+
+The agents are pluggable: a backend is a subclass of AgentBackend, given as
+"module:Class". The default, ScriptedAgent, is a deterministic local
+stand-in that knows the answer from the solver.
+
+Every move is derived from the objects on disk, so a session that crashed
+simply continues when the orchestrator is run again. A commit cut short
+before its log.jsonl entry was written is rolled back first (see
+fsck.recover_workspace()). Solved workspaces are skipped.
+
+Usage:
+    python src/orchestrator.py --root runs/ --puzzles puzzles/ [--workers 8]
+    python src/orchestrator.py --root runs/ --generate 100 --players 6 [--mistake-rate 0.2]
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+
+import numpy as np
+
+from cus_types_main import type_check_decision, type_proposal, type_puzzle, type_session_result
+from fsck import recover_workspace
+from log_store import log_tail
+from puzzle_parser import ParseError, SentenceParser, compile_puzzle, content_hash, initial_problem_args
+from solver import ROLES, evaluate, solve
+from utils import use_workspace
+
+
+DEFAULT_BACKEND = "orchestrator:ScriptedAgent"
+
+# Moves per session before it is reported as unsolved
+DEFAULT_MAX_STEPS = 500
+
+# Session output (stdout/stderr of the moves), in the workspace root
+SESSION_LOG_NAME = "session.log"
+
+REPORT_NAME = "report.json"
+
+PHASES = ["init", "propose", "check", "revise", "conclude"]
+
+
+# ============================================================================
+# Agent backends
+# ============================================================================
+class AgentBackend:
+    """Interface between the orchestrator and the agents.
+
+    One instance is created per session with the compiled puzzle, a seed
+    derived from the puzzle text and the backend options.
+    """
+
+    def __init__(self, puzzle: type_puzzle, seed: int = 0, **options):
+        self.puzzle = puzzle
+        self.seed = seed
+        self.options = options
+
+    def propose(self, problem: dict, statements: list[dict]) -> list[type_proposal]:
+        """New statements to work on (empty: the backend is stuck).
+
+        Args:
+            problem: Root problem
+            statements: Statements linked to its progresses
+        """
+        raise NotImplementedError
+
+    def check(self, statement: dict) -> type_check_decision:
+        """Decide a validating statement the symbolic checker skipped."""
+        raise NotImplementedError
+
+    def revise(self, statement: dict) -> str | None:
+        """New proof for a rejected statement, or None to abandon it."""
+        return None
+
+    def conclude(self, problem: dict, statements: list[dict]) -> tuple[str, list[str]] | None:
+        """(solution text, supporting statement ids) once every objective is answered, else None."""
+        raise NotImplementedError
+
+
+ROLE_CLAIM = re.compile(r"^(\S+) is an? (knight|knave|spy)$")
+
+
+class ScriptedAgent(AgentBackend):
+    """Deterministic stand-in for the agents, for tests and benchmarks.
+
+    It solves the puzzle up front and claims one role per player. With the
+    mistake_rate option, a player's first claim names a wrong role with that
+    probability, which exercises the mark-false path; retries are always
+    right.
+    """
+
+    def __init__(self, puzzle: type_puzzle, seed: int = 0, **options):
+        super().__init__(puzzle, seed, **options)
+        self.mistake_rate = float(options.get("mistake_rate", 0.0))
+        solutions = solve(puzzle, max_solutions=2).solutions
+        if len(solutions) != 1:
+            raise ValueError(f"Scripted agent needs a unique solution, found {len(solutions)}")
+        self.solution = solutions[0]
+        self.parser = SentenceParser(puzzle.players)
+
+    def _claims(self, statements: list[dict]) -> dict[str, list[dict]]:
+        """Role claims per player: {player: [statement, ...]}."""
+        claims: dict[str, list[dict]] = {p: [] for p in self.puzzle.players}
+        for statement in statements:
+            conclusion = statement.get("conclusion") or []
+            m = ROLE_CLAIM.match(conclusion[0]) if len(conclusion) == 1 else None
+            if m and m.group(1) in claims:
+                claims[m.group(1)].append(statement)
+        return claims
+
+    def propose(self, problem: dict, statements: list[dict]) -> list[type_proposal]:
+        proposals = []
+        for player, claimed in self._claims(statements).items():
+            statuses = [s["status"] for s in claimed]
+            if "true" in statuses or "validating" in statuses or "pending" in statuses:
+                continue
+            attempt = statuses.count("false") + statuses.count("abandoned")
+            role = self.solution[player]
+            rng = random.Random(f"{self.seed}:{player}:{attempt}")
+            if attempt == 0 and rng.random() < self.mistake_rate:
+                role = rng.choice([r for r in ROLES if r != role])
+            proposals.append(type_proposal(
+                conclusion=[f"{player} is a {role}"],
+                proof=f"Every consistent role assignment makes {player} a {role}."
+            ))
+        return proposals
+
+    def check(self, statement: dict) -> type_check_decision:
+        decision = type_check_decision(statement_id=statement["id"], decision="confirm",
+                                       reason="scripted check against the known solution")
+        try:
+            holds = all(
+                bool(evaluate(self.parser.parse(item), lambda p: np.uint8(ROLES.index(self.solution[p]))))
+                for item in statement.get("conclusion") or []
+            )
+        except ParseError:
+            return decision  # Outside the scripted agent's knowledge: trust the prover
+        if not holds:
+            decision.decision = "mark-false"
+            decision.counterexample = dict(self.solution)
+        return decision
+
+    def conclude(self, problem: dict, statements: list[dict]) -> tuple[str, list[str]] | None:
+        refs = []
+        for player, claimed in self._claims(statements).items():
+            proven = [s for s in claimed if s["status"] == "true"]
+            if not proven:
+                return None
+            refs.append(proven[0]["id"])
+        summary = "; ".join(f"{p}: {r}" for p, r in self.solution.items())
+        return summary, refs
+
+
+def load_backend(spec: str) -> type[AgentBackend]:
+    """Import a backend class from a "module:Class" spec."""
+    module_name, class_name = spec.split(":")
+    backend = getattr(importlib.import_module(module_name), class_name)
+    # Compare with the importable module's class (this file may be running as __main__)
+    base = importlib.import_module("orchestrator").AgentBackend
+    if not (isinstance(backend, type) and issubclass(backend, base)):
+        raise ValueError(f"{spec} is not an AgentBackend subclass")
+    return backend
+
+
+# ============================================================================
+# Sessions
+# ============================================================================
+class Session:
+    """One puzzle's init -> solve -> check loop in the current workspace."""
+
+    def __init__(self, backend: AgentBackend, result: type_session_result):
+        self.backend = backend
+        self.result = result
+
+    def _timed(self, phase: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.result.timings.append((phase, time.perf_counter() - start))
+
+    def _count(self, key: str) -> None:
+        self.result.decisions[key] = self.result.decisions.get(key, 0) + 1
+
+    def step(self) -> str:
+        """Make one move.
+
+        Returns:
+            "continue", "solved" or "stuck"
+        """
+        from current import load_all_problems, load_all_statements
+
+        problems = load_all_problems()
+        if not problems:
+            self._timed("init", self.init)
+            return "continue"
+        root = problems[0]
+        if root.get("status") == "resolved":
+            return "solved"
+
+        by_id = {s["id"]: s for s in load_all_statements()}
+        linked = [by_id[i] for i in root.get("progresses", []) if i in by_id]
+        validating = [s for s in linked if s["status"] == "validating"]
+        rejected = [s for s in validating
+                    if len(s["validation"]["issues"]) > len(s["validation"]["responses"])]
+        if rejected:
+            self._timed("revise", self.revise, rejected)
+            return "continue"
+        if validating:
+            self._timed("check", self.check, validating)
+            return "continue"
+
+        answer = self._timed("conclude", self.backend.conclude, root, linked)
+        if answer is not None:
+            self._timed("conclude", self.conclude, root, *answer)
+            return "continue"
+
+        proposals = self._timed("propose", self.backend.propose, root, linked)
+        if not proposals:
+            return "stuck"
+        self._timed("propose", self.propose, root, proposals)
+        return "continue"
+
+    def init(self) -> None:
+        from prob_init import create_initial_problem
+
+        create_initial_problem(*initial_problem_args(compile_puzzle()))
+
+    def propose(self, root: dict, proposals: list[type_proposal]) -> None:
+        """Create each proposal as a validating statement linked to the root problem."""
+        from prob import handle_problem
+        from state import handle_statement
+        from utils import handle_changes
+
+        for proposal in proposals:
+            statement_id, changes = handle_statement(
+                type="proposition",
+                conclusion=proposal.conclusion,
+                hypothesis=("overwrite", proposal.hypothesis) if proposal.hypothesis else None,
+                proof_full=proposal.proof,
+                status="validating",
+                root_change=False
+            )
+            if statement_id not in root.get("progresses", []):
+                _, problem_changes = handle_problem(id=root["id"], progresses=("append", [statement_id]),
+                                                    root_change=False)
+                changes += problem_changes
+            if changes:
+                handle_changes(changes)
+
+    def check(self, statements: list[dict]) -> None:
+        from checker import apply_decision, run_checks
+
+        by_id = {s["id"]: s for s in statements}
+        for decision in run_checks(list(by_id), apply=True):
+            if decision.decision != "skip":
+                self._count(f"{'cache' if decision.cached else 'checker'}:{decision.decision}")
+                continue
+            decision = self.backend.check(by_id[decision.statement_id])
+            self._count(f"backend:{decision.decision}")
+            apply_decision(decision)
+
+    def revise(self, statements: list[dict]) -> None:
+        from state import handle_statement
+
+        for statement in statements:
+            proof = self.backend.revise(statement)
+            if proof is None:
+                handle_statement(id=statement["id"], status="abandoned",
+                                 progresses=("append", ["Abandoned after rejection"]))
+            else:
+                handle_statement(id=statement["id"], proof_full=proof,
+                                 validation_responses=("append", ["Proof revised"]))
+
+    def conclude(self, root: dict, summary: str, refs: list[str]) -> None:
+        from prob import handle_problem
+
+        handle_problem(id=root["id"], status="resolved", solution_full=summary,
+                       solution_ref=("overwrite", refs))
+
+
+def run_session(task: tuple[str, str, str, dict, int]) -> type_session_result:
+    """Run (or resume) one session; the process pool's worker function.
+
+    Args:
+        task: (name, workspace folder, backend spec, backend options, max steps)
+
+    Returns:
+        The session result (errors are reported in it, never raised)
+    """
+    name, folder, backend_spec, options, max_steps = task
+    result = type_session_result(name=name, workspace=folder, status="unsolved")
+    start = time.perf_counter()
+
+    with use_workspace(folder) as workspace, \
+            open(os.path.join(workspace.root, SESSION_LOG_NAME), "a") as out, \
+            contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            result.recovered = recover_workspace()
+            _, _, commits_before = log_tail()
+            result.resumed = commits_before > 0
+
+            with open(workspace.puzzle_path, "r") as f:
+                seed = int(content_hash(f.read())[:8], 16)
+            backend = load_backend(backend_spec)(compile_puzzle(), seed, **options)
+
+            session = Session(backend, result)
+            for _ in range(max_steps):
+                outcome = session.step()
+                if outcome != "continue":
+                    result.status = "solved" if outcome == "solved" else "unsolved"
+                    break
+                result.steps += 1
+            result.commits = log_tail()[2] - commits_before
+        except Exception as e:
+            result.status = "error"
+            result.error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+# ============================================================================
+# Orchestration
+# ============================================================================
+def collect_puzzles(paths: list[str]) -> list[str]:
+    """Puzzle files from a list of files and folders (*.md, sorted)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".md"))
+        else:
+            files.append(path)
+    return files
+
+
+def prepare_workspaces(root: str, puzzle_files: list[str]) -> list[tuple[str, str]]:
+    """Create one workspace per puzzle under root (existing ones are kept).
+
+    Returns:
+        [(name, workspace folder)]
+
+    Raises:
+        ValueError: If a workspace already holds a different puzzle
+    """
+    workspaces = []
+    for path in puzzle_files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        folder = os.path.join(root, name)
+        target = os.path.join(folder, "puzzle.md")
+        with open(path, "r") as f:
+            text = f.read()
+        if os.path.exists(target):
+            with open(target, "r") as f:
+                if f.read() != text:
+                    raise ValueError(f"Workspace {folder} already holds a different puzzle")
+        else:
+            os.makedirs(folder, exist_ok=True)
+            with open(target, "w") as f:
+                f.write(text)
+        workspaces.append((name, folder))
+    return workspaces
+
+
+def generate_workspaces(root: str, count: int, players: int, seed: int = 0,
+                        forms: list[str] | None = None) -> list[tuple[str, str]]:
+    """Create workspaces for generated puzzles (see puzzle_gen.py).
+
+    Returns:
+        [(name, workspace folder)]
+    """
+    from puzzle_gen import generate_puzzle, render_markdown
+
+    workspaces = []
+    for s in range(seed, seed + count):
+        name = f"gen-{players}p-{s}"
+        folder = os.path.join(root, name)
+        if not os.path.exists(os.path.join(folder, "puzzle.md")):
+            puzzle, _ = generate_puzzle(players, s, forms)
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, "puzzle.md"), "w") as f:
+                f.write(render_markdown(puzzle))
+        workspaces.append((name, folder))
+    return workspaces
+
+
+def run_all(
+    workspaces: list[tuple[str, str]],
+    backend: str = DEFAULT_BACKEND,
+    options: dict | None = None,
+    workers: int | None = None,
+    max_steps: int = DEFAULT_MAX_STEPS,
+    progress: bool = True
+) -> list[type_session_result]:
+    """Run the sessions across a process pool.
+
+    Args:
+        workspaces: [(name, workspace folder)]
+        backend: Agent backend spec ("module:Class")
+        options: Backend options
+        workers: Process count (default: CPU count)
+        max_steps: Moves per session before giving up
+        progress: Print one line per finished session to stderr
+
+    Returns:
+        Session results, in the order of workspaces
+    """
+    load_backend(backend)  # Fail early on a bad spec
+    tasks = [(name, os.path.abspath(folder), backend, options or {}, max_steps) for name, folder in workspaces]
+    results: dict[str, type_session_result] = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(run_session, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.name] = result
+            if progress:
+                detail = f" ({result.error})" if result.error else ""
+                print(f"[{len(results)}/{len(tasks)}] {result.name}: {result.status}, "
+                      f"{result.commits} commits in {result.seconds:.1f} s{detail}", file=sys.stderr)
+    return [results[name] for name, _ in workspaces]
+
+
+def build_report(results: list[type_session_result], wall_seconds: float) -> dict:
+    """Aggregate session results and timings."""
+    phases: dict[str, list[float]] = {}
+    decisions: dict[str, int] = {}
+    for result in results:
+        for phase, seconds in result.timings:
+            phases.setdefault(phase, []).append(seconds)
+        for key, n in result.decisions.items():
+            decisions[key] = decisions.get(key, 0) + n
+    commits = sum(r.commits for r in results)
+    statuses = [r.status for r in results]
+    return {
+        "sessions": len(results),
+        "solved": statuses.count("solved"),
+        "unsolved": statuses.count("unsolved"),
+        "errors": statuses.count("error"),
+        "resumed": sum(r.resumed for r in results),
+        "recovered": sum(bool(r.recovered) for r in results),
+        "commits": commits,
+        "wall_seconds": wall_seconds,
+        "commits_per_sec": commits / wall_seconds if wall_seconds else 0.0,
+        "phases": {
+            phase: {
+                "count": len(values),
+                "p50_ms": float(np.percentile(values, 50)) * 1000,
+                "p99_ms": float(np.percentile(values, 99)) * 1000,
+                "total_seconds": float(sum(values)),
+            }
+            for phase, values in sorted(phases.items(), key=lambda kv: PHASES.index(kv[0]))
+        },
+        "decisions": dict(sorted(decisions.items())),
+        "results": [asdict(r) for r in results],
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"Sessions: {report['sessions']} ({report['solved']} solved, {report['unsolved']} unsolved, "
+          f"{report['errors']} errors; {report['resumed']} resumed, {report['recovered']} recovered)")
+    print(f"Commits: {report['commits']} in {report['wall_seconds']:.1f} s "
+          f"({report['commits_per_sec']:.1f} commits/sec)")
+    print(f"{'phase':<10} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for phase, s in report["phases"].items():
+        print(f"{phase:<10} {s['count']:>7} {s['p50_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['total_seconds']:>9.1f}")
+    if report["decisions"]:
+        print("Decisions: " + ", ".join(f"{k} {v}" for k, v in report["decisions"].items()))
+    for r in report["results"]:
+        if r["status"] == "error":
+            print(f"  [error] {r['name']}: {r['error']} (see {os.path.join(r['workspace'], SESSION_LOG_NAME)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many puzzle sessions in parallel, one workspace each")
+    parser.add_argument('--root', type=str, required=True,
+                        help='Folder holding one workspace per puzzle (rerun to resume)')
+    parser.add_argument('--puzzles', nargs='+', type=str, default=[],
+                        help='Puzzle files or folders of *.md puzzles')
+    parser.add_argument('--generate', type=int, default=0, metavar='N',
+                        help='Also generate N puzzles (see puzzle_gen.py)')
+    parser.add_argument('--players', type=int, default=5,
+                        help='Players per generated puzzle (default: 5)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the first generated puzzle (default: 0)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--backend', type=str, default=DEFAULT_BACKEND,
+                        help=f'Agent backend as module:Class (default: {DEFAULT_BACKEND})')
+    parser.add_argument('--mistake-rate', type=float, default=0.0,
+                        help='ScriptedAgent: probability that a first claim is wrong (default: 0)')
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS,
+                        help=f'Moves per session before giving up (default: {DEFAULT_MAX_STEPS})')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+
+    args = parser.parse_args()
+
+    if not args.puzzles and not args.generate:
+        parser.error("Give --puzzles and/or --generate")
+    os.makedirs(args.root, exist_ok=True)
+    workspaces = prepare_workspaces(args.root, collect_puzzles(args.puzzles))
+    if args.generate:
+        workspaces += generate_workspaces(args.root, args.generate, args.players, args.seed)
+
+    options = {"mistake_rate": args.mistake_rate} if args.mistake_rate else {}
+    start = time.perf_counter()
+    results = run_all(workspaces, args.backend, options, args.workers, args.max_steps)
+    report = build_report(results, time.perf_counter() - start)
+    with open(os.path.join(args.root, REPORT_NAME), "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
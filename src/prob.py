@@ -7,91 +7,51 @@ This script handles both problem creation and updates.
 For initial problem creation from puzzle, use prob_init.py instead.
 """
 import argparse
-import json
-import os
-import re
 from dataclasses import asdict
 from typing import Optional
 
 from cus_types_main import type_problem, type_statement, type_object_change
-from utils import IDManager, handle_changes, load_object, OBJECT_FOLDERS
+from dedupe import find_reusable_statement
+from refs import parse_reference, resolve_references, strip_reference
+from utils import IDManager, add_workspace_argument, handle_changes, load_object, set_workspace
 
 
-STATEMENT_FOLDER = OBJECT_FOLDERS["s"]
-
-
-def parse_statement_id(text: str) -> str | None:
-    """Extract statement ID from text starting with (s-...) or (e-...).
-
-    Args:
-        text: Input text to parse
-
-    Returns:
-        Statement ID if found, else None
-    """
-    text = text.lstrip()
-    if not text.startswith('('):
-        return None
-
-    match = re.match(r'^\(([se]-[a-z]*\d+)\)', text)
-    if match:
-        return match.group(1)
-    return None
-
-
-def load_statement_conclusion(statement_id: str) -> str | None:
-    """Load conclusion from statement file.
-
-    Args:
-        statement_id: Statement ID (e.g., "s-001")
-
-    Returns:
-        Conclusion text (joined from list) if file exists, else None
-    """
-    statement_path = os.path.join(STATEMENT_FOLDER, f"{statement_id}.json")
-
-    if not os.path.exists(statement_path):
-        return None
-
-    try:
-        with open(statement_path, 'r') as f:
-            statement_data = json.load(f)
-
-        conclusion = statement_data.get('conclusion', [])
-        if isinstance(conclusion, list):
-            return ' '.join(conclusion)
-        return str(conclusion)
-    except Exception:
-        return None
-
-
-def process_hypothesis_item(item: str) -> tuple[str, list[type_object_change]]:
+def process_hypothesis_item(
+    item: str,
+    references: dict[str, str]
+) -> tuple[str, list[type_object_change]]:
     """Process single hypothesis item for problem creation.
 
-    New statements are created with type='normal' and status='pending'.
+    New statements are created with type='normal' and status='pending',
+    unless an identical statement already exists (see dedupe.py).
 
     Args:
         item: Hypothesis item text
+        references: {referenced_id: text} from refs.resolve_references()
 
     Returns:
         Tuple of (formatted_hypothesis_string, list of type_object_change)
     """
     # Check for existing statement ID
-    statement_id = parse_statement_id(item)
+    statement_id = parse_reference(item)
 
     if statement_id:
-        # Try to load the statement
-        conclusion = load_statement_conclusion(statement_id)
+        conclusion = references.get(statement_id)
         if conclusion:
             # Existing statement found, no new objects to create
             return (f"({statement_id}) {conclusion}", [])
 
-        # ID format valid but file doesn't exist - strip invalid ID
-        cleaned_text = re.sub(r'^\([se]-[a-z]*\d+\)\s*', '', item.lstrip()).strip()
+        # ID format valid but object doesn't exist - strip invalid ID
+        cleaned_text = strip_reference(item)
     else:
         # No ID pattern found, use original text
         cleaned_text = item.strip()
 
+    # Reuse an identical existing statement instead of creating a copy
+    existing_id = find_reusable_statement([cleaned_text])
+    if existing_id is not None:
+        return (f"({existing_id}) {cleaned_text}", [])
+
     # Generate new statement ID
     id_manager = IDManager()
     new_statement_id = id_manager.generate_id("s")
@@ -232,8 +192,9 @@ def _create_problem(
 
     # Process hypothesis items if provided
     if hypothesis:
+        references, _ = resolve_references(hypothesis)
         for item in hypothesis:
-            formatted, new_changes = process_hypothesis_item(item)
+            formatted, new_changes = process_hypothesis_item(item, references)
             processed_hypothesis.append(formatted)
             changes.extend(new_changes)
             nested_count += len(new_changes)
@@ -468,8 +429,11 @@ if __name__ == "__main__":
                         help='Mode (Overwrite/Append) followed by chain-of-thought steps')
     parser.add_argument('--solution.ref', nargs='+', type=str, dest='solution_ref',
                         help='Mode (Overwrite/Append) followed by references')
+    add_workspace_argument(parser)
 
     args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
 
     kwargs = build_args_from_parsed(args)
 
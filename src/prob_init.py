@@ -3,90 +3,46 @@
 This script is only used for the initial problem creation from a puzzle.
 All hypothesis items are treated as assumptions with status='true'.
 
+With --puzzle, the hypothesis and objectives are generated from the parsed
+puzzle file (see puzzle_parser.py) instead of being passed by hand.
+
 For creating subsequent problems or updating problems, use prob.py instead.
 """
 import argparse
-import json
-import os
-import re
 from dataclasses import asdict
 
 from cus_types_main import type_problem, type_statement, type_object_change
-from utils import IDManager, handle_changes, OBJECT_FOLDERS
-
-
-STATEMENT_FOLDER = OBJECT_FOLDERS["s"]
-
-
-def parse_statement_id(text: str) -> str | None:
-    """Extract statement ID from text starting with (s-...) or (e-...).
-
-    Args:
-        text: Input text to parse
-
-    Returns:
-        Statement ID if found, else None
-    """
-    text = text.lstrip()
-    if not text.startswith('('):
-        return None
-
-    # Match pattern like (s-001), (s-a001), (e-001), etc.
-    match = re.match(r'^\(([se]-[a-z]*\d+)\)', text)
-    if match:
-        return match.group(1)
-    return None
+from puzzle_parser import compile_puzzle, initial_problem_args
+from refs import parse_reference, resolve_references, strip_reference
+from utils import IDManager, add_workspace_argument, handle_changes, set_workspace
 
 
-def load_statement_conclusion(statement_id: str) -> str | None:
-    """Load conclusion from statement file.
-
-    Args:
-        statement_id: Statement ID (e.g., "s-001")
-
-    Returns:
-        Conclusion text (joined from list) if file exists, else None
-    """
-    statement_path = os.path.join(STATEMENT_FOLDER, f"{statement_id}.json")
-
-    if not os.path.exists(statement_path):
-        return None
-
-    try:
-        with open(statement_path, 'r') as f:
-            statement_data = json.load(f)
-
-        conclusion = statement_data.get('conclusion', [])
-        if isinstance(conclusion, list):
-            return ' '.join(conclusion)
-        return str(conclusion)
-    except Exception:
-        return None
-
-
-def process_hypothesis_item(item: str) -> tuple[str, list[type_object_change]]:
+def process_hypothesis_item(
+    item: str,
+    references: dict[str, str]
+) -> tuple[str, list[type_object_change]]:
     """Process single hypothesis item for initial problem.
 
     All new statements are created as assumptions with status='true'.
 
     Args:
         item: Hypothesis item text
+        references: {referenced_id: text} from refs.resolve_references()
 
     Returns:
         Tuple of (formatted_hypothesis_string, list of type_object_change)
     """
     # Check for existing statement ID
-    statement_id = parse_statement_id(item)
+    statement_id = parse_reference(item)
 
     if statement_id:
-        # Try to load the statement
-        conclusion = load_statement_conclusion(statement_id)
+        conclusion = references.get(statement_id)
         if conclusion:
             # Existing statement found, no new objects to create
             return (f"({statement_id}) {conclusion}", [])
 
-        # ID format valid but file doesn't exist - strip invalid ID
-        cleaned_text = re.sub(r'^\([se]-[a-z]*\d+\)\s*', '', item.lstrip()).strip()
+        # ID format valid but object doesn't exist - strip invalid ID
+        cleaned_text = strip_reference(item)
     else:
         # No ID pattern found, use original text
         cleaned_text = item.strip()
@@ -135,9 +91,10 @@ def create_initial_problem(
     processed_hypothesis = []
     nested_count = 0
 
-    # Process each hypothesis item
+    # Process each hypothesis item (all references resolved in one bulk read)
+    references, _ = resolve_references(hypothesis)
     for item in hypothesis:
-        formatted, new_changes = process_hypothesis_item(item)
+        formatted, new_changes = process_hypothesis_item(item, references)
         processed_hypothesis.append(formatted)
         changes.extend(new_changes)
         nested_count += len(new_changes)
@@ -169,14 +126,28 @@ def create_initial_problem(
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Initialize problem from puzzle")
-    parser.add_argument('--hypothesis', nargs='+', type=str, required=True,
+    parser.add_argument('--hypothesis', nargs='+', type=str, default=[],
                         help='List of hypothesis items')
-    parser.add_argument('--objectives', nargs='+', type=str, required=True,
+    parser.add_argument('--objectives', nargs='+', type=str, default=[],
                         help='List of objective items')
+    parser.add_argument('--puzzle', nargs='?', const="", default=None,
+                        help='Build hypothesis/objectives from a puzzle file (default: puzzle.md of the workspace); '
+                             'extra --hypothesis items are appended, --objectives replaces the generated ones')
+    add_workspace_argument(parser)
 
     args = parser.parse_args()
-
-    problem_id, nested_count = create_initial_problem(args.hypothesis, args.objectives)
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    hypothesis, objectives = args.hypothesis, args.objectives
+    if args.puzzle is not None:
+        puzzle_hypothesis, puzzle_objectives = initial_problem_args(compile_puzzle(args.puzzle or None))
+        hypothesis = puzzle_hypothesis + hypothesis
+        objectives = objectives or puzzle_objectives
+    if not hypothesis or not objectives:
+        parser.error("--hypothesis and --objectives are required unless --puzzle is given")
+
+    problem_id, nested_count = create_initial_problem(hypothesis, objectives)
 
     if nested_count > 0:
         print(f"Created initial problem: {problem_id} [+{nested_count} statements]")
@@ -0,0 +1,245 @@
+"""Knights/Knaves/Spy puzzle generator.
+
+Generates puzzles in the puzzle.md format with a guaranteed unique solution:
+1. Roles are planted at random.
+2. Every player gets one statement (drawn from the enabled forms) whose
+   truth value fits their planted role: true for knights, false for knaves,
+   either for spies. The game manager announces the number of spies.
+3. While the solver finds a second solution, a random player's statement is
+   replaced by one about a player whose role differs from the planted one in
+   another solution; the replacement is kept if it does not increase the
+   number of solutions. If that does not converge within max_steps, the
+   game manager gives away roles until the solution is unique.
+
+Every sentence is produced as text and read back with the puzzle parser,
+so generated puzzles only use forms the parser understands.
+
+Usage:
+    python src/puzzle_gen.py --players 6 --seed 1 [--forms role,or,count] [--out puzzle.md]
+    python src/puzzle_gen.py --players 6 --count 100 --dir /tmp/puzzles
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+
+from cus_types_main import type_claim, type_puzzle
+from puzzle_parser import NUMBER_WORDS, SentenceParser
+from solver import ROLES, evaluate, solve
+
+
+NAMES = [
+    "Alice", "Bob", "Carl", "Diana", "Ethan", "Fiona", "George", "Hannah", "Ivy", "Jack",
+    "Kate", "Liam", "Mia", "Noah", "Olivia", "Peter", "Quinn", "Rose", "Sam", "Tina",
+    "Uma", "Victor", "Wendy", "Xavier", "Yara", "Zack",
+]
+
+# Statement forms; {x}, {y}, {z} are other players, {a_r}, {a_r2} roles with article
+FORMS = {
+    "self": "I am {a_r}",
+    "role": "{x} is {a_r}",
+    "not": "{x} is not {a_r}",
+    "either": "{x} is {a_r} or {a_r2}",
+    "or": "{x} is {a_r} or {y} is {a_r2}",
+    "and": "{x} is {a_r} and {y} is {a_r2}",
+    "if": "If {x} is {a_r} then {y} is {a_r2}",
+    "same": "{x} and I have the same role",
+    "different": "{x} and {y} have different roles",
+    "count": "Exactly {k} of {x}, {y} and {z} {be} {rs}",
+}
+DEFAULT_FORMS = list(FORMS)
+
+HEADER = """# KKS puzzle
+
+## Basic game setup
+- There are several players in the game, and each player has a role among three possibilities:
+    - Knight: who will always telling the truth
+    - Knave: who will always be lying.
+    - Spy: who can either speak truth or lie.
+
+- The game manager will provide a hint (he's telling truth)
+
+- The goal is to solve the puzzle by deducing the role of every player. It has been guaranteed that there is a unique solution to the game.
+
+## Game Text
+"""
+
+_NUMBER_NAMES = {v: k for k, v in NUMBER_WORDS.items() if k not in ("no",)}
+_PLURALS = {"knight": "knights", "knave": "knaves", "spy": "spies"}
+
+# Solutions counted per candidate puzzle while searching for uniqueness
+COUNT_CAP = 64
+
+
+def player_names(n: int) -> list[str]:
+    """n distinct single-word player names."""
+    if n <= len(NAMES):
+        return NAMES[:n]
+    return [f"{NAMES[i % len(NAMES)]}{i // len(NAMES) + 1}" for i in range(n)]
+
+
+def _article(role: str) -> str:
+    return f"a {role}"
+
+
+def _number(k: int) -> str:
+    return _NUMBER_NAMES.get(k, str(k))
+
+
+def render_statement(form: str, speaker: str, players: list[str], rng: random.Random,
+                     about: str | None = None) -> str:
+    """Random sentence of a given form spoken by speaker.
+
+    Args:
+        about: Player the sentence must mention (if the form allows it)
+    """
+    others = [p for p in players if p != speaker]
+    if about is not None and about != speaker and about in others:
+        rest = [p for p in others if p != about]
+        rng.shuffle(rest)
+        picked = [about] + rest
+    else:
+        picked = others[:] or [speaker]
+        rng.shuffle(picked)
+    r, r2 = rng.choice(ROLES), rng.choice(ROLES)
+    k = rng.randint(0, 3)
+    return FORMS[form].format(
+        x=picked[0], y=picked[1 % len(picked)], z=picked[2 % len(picked)],
+        a_r=_article(r), a_r2=_article(r2),
+        k=_number(k), be="is" if k == 1 else "are", rs=_article(r) if k == 1 else _PLURALS[r],
+    )
+
+
+def _usable_forms(forms: list[str], n: int) -> list[str]:
+    needed = {"role": 1, "not": 1, "either": 1, "same": 1, "or": 2, "and": 2, "if": 2, "different": 2, "count": 3}
+    return [f for f in forms if n - 1 >= needed.get(f, 0)]
+
+
+def _claim_truth(claim: type_claim, roles: dict[str, str]) -> bool:
+    return bool(evaluate(claim.expr, lambda p: np.uint8(ROLES.index(roles[p]))))
+
+
+def _fitting_claim(speaker: str, roles: dict[str, str], forms: list[str], parser: SentenceParser,
+                   players: list[str], rng: random.Random, about: str | None = None) -> type_claim:
+    """Statement by speaker whose truth value fits their planted role."""
+    want = {"knight": True, "knave": False}.get(roles[speaker])
+    while True:
+        text = render_statement(rng.choice(forms), speaker, players, rng, about) + "."
+        claim = type_claim(speaker=speaker, text=text, expr=parser.parse(text, speaker))
+        if want is None or _claim_truth(claim, roles) == want:
+            return claim
+
+
+def generate_puzzle(
+    n: int,
+    seed: int = 0,
+    forms: list[str] | None = None,
+    max_steps: int = 100
+) -> tuple[type_puzzle, dict[str, str]]:
+    """Generate a puzzle with a unique solution.
+
+    Args:
+        n: Number of players (at least 1)
+        seed: Random seed (same seed, same puzzle)
+        forms: Statement forms to use (keys of FORMS; default all)
+        max_steps: Statement replacements before the game manager gives roles away
+
+    Returns:
+        Tuple of (puzzle, solution {player: role})
+    """
+    rng = random.Random(seed)
+    players = player_names(n)
+    parser = SentenceParser(players)
+    usable = _usable_forms(forms or DEFAULT_FORMS, n) or ["self"]
+    roles = {p: rng.choice(ROLES) for p in players}
+
+    statements = {p: _fitting_claim(p, roles, usable, parser, players, rng) for p in players}
+    spies = sum(1 for r in roles.values() if r == "spy")
+    spy_text = (f"Among all players, there {'is' if spies == 1 else 'are'} exactly "
+                f"{_number(spies)} {'spy' if spies == 1 else 'spies'}.")
+    hints = [type_claim(speaker="", text=spy_text, expr=parser.parse(spy_text))]
+
+    def build() -> type_puzzle:
+        return type_puzzle(players=players, statements=[statements[p] for p in players], hints=list(hints))
+
+    def count() -> tuple[int, dict[str, str] | None]:
+        solutions = solve(build(), max_solutions=COUNT_CAP).solutions
+        return len(solutions), next((x for x in solutions if x != roles), None)
+
+    current, other = count()
+    for _ in range(max_steps):
+        if current == 1:
+            return build(), roles
+        target = rng.choice([p for p in players if other[p] != roles[p]])
+        speaker = rng.choice(players)
+        previous = statements[speaker]
+        statements[speaker] = _fitting_claim(speaker, roles, usable, parser, players, rng, about=target)
+        candidate, candidate_other = count()
+        if candidate <= current:
+            current, other = candidate, candidate_other
+        else:
+            statements[speaker] = previous
+
+    while current > 1:
+        target = rng.choice([p for p in players if other[p] != roles[p]])
+        text = f"{target} is {_article(roles[target])}."
+        hints.append(type_claim(speaker="", text=text, expr=parser.parse(text)))
+        current, other = count()
+    return build(), roles
+
+
+def render_markdown(puzzle: type_puzzle) -> str:
+    """Puzzle text in the puzzle.md format."""
+    lines = [HEADER.rstrip("\n")]
+    for claim in puzzle.statements:
+        lines += ["---", f"Player name: {claim.speaker}", f"Player statement: {claim.text}"]
+    for claim in puzzle.hints:
+        lines += ["---", f"Message from the game manager: I am the game manager and here is a hint for you: "
+                         f"{claim.text}"]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Knights/Knaves/Spy puzzles with a unique solution")
+    parser.add_argument('--players', type=int, default=5,
+                        help='Number of players (default: 5)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed of the first puzzle (default: 0)')
+    parser.add_argument('--forms', type=str, default=",".join(DEFAULT_FORMS),
+                        help=f'Comma-separated statement forms (default: all of {",".join(DEFAULT_FORMS)})')
+    parser.add_argument('--count', type=int, default=1,
+                        help='Number of puzzles (seeds seed, seed+1, ...)')
+    parser.add_argument('--out', type=str, default=None,
+                        help='Output file for a single puzzle (default: print)')
+    parser.add_argument('--dir', type=str, default=None,
+                        help='Output folder for --count puzzles (puzzle-<seed>.md)')
+    parser.add_argument('--show-solution', action='store_true',
+                        help='Also print the solution')
+
+    args = parser.parse_args()
+
+    forms = [f.strip() for f in args.forms.split(",") if f.strip()]
+    unknown = [f for f in forms if f not in FORMS]
+    if unknown:
+        parser.error(f"Unknown forms: {unknown}. Expected some of: {DEFAULT_FORMS}")
+    if args.count > 1 and not args.dir:
+        parser.error("--dir is required with --count > 1")
+
+    for seed in range(args.seed, args.seed + args.count):
+        puzzle, solution = generate_puzzle(args.players, seed, forms)
+        text = render_markdown(puzzle)
+        if args.dir:
+            os.makedirs(args.dir, exist_ok=True)
+            path = os.path.join(args.dir, f"puzzle-{seed}.md")
+            with open(path, "w") as f:
+                f.write(text)
+            print(f"Wrote {path}")
+        elif args.out:
+            with open(args.out, "w") as f:
+                f.write(text)
+            print(f"Wrote {args.out}")
+        else:
+            print(text)
+        if args.show_solution:
+            print("Solution: " + ", ".join(f"{p}: {r}" for p, r in solution.items()))
@@ -0,0 +1,449 @@
+"""Structured parser for puzzle.md.
+
+Turns the free-form puzzle markdown into a typed AST (type_puzzle):
+- "Player name:" / "Player statement:" blocks become type_claim objects
+- game-manager messages become hints (speaker "")
+- each sentence is parsed by SentenceParser into a type_expr, or kept with
+  expr=None when it is outside the supported forms
+
+The puzzle file defaults to the workspace's puzzle.md (see utils.Workspace).
+The compiled puzzle is cached as JSON in contents/cache, keyed by the hash of
+the file content (and PARSER_VERSION), so repeated loads skip parsing.
+initial_problem_args() turns a puzzle into the hypothesis/objectives of
+prob_init.create_initial_problem(), which makes initialization deterministic.
+
+Usage:
+    python src/puzzle_parser.py [path/to/puzzle.md] [--no-cache] [--json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict
+
+from cus_types_main import type_claim, type_expr, type_puzzle
+from utils import add_workspace_argument, get_workspace, set_workspace
+
+
+# Bump when the parser output changes, to invalidate cached puzzles
+PARSER_VERSION = 1
+
+ROLE_WORDS = {
+    "knight": "knight", "knights": "knight",
+    "knave": "knave", "knaves": "knave",
+    "spy": "spy", "spies": "spy",
+}
+
+NUMBER_WORDS = {
+    "no": 0, "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+}
+
+COUNT_QUALIFIERS = {"exactly": "==", "only": "==", "at least": ">=", "at most": "<="}
+
+
+class ParseError(ValueError):
+    """Raised when a sentence is outside the supported statement forms."""
+
+
+# ============================================================================
+# Sentence parsing
+# ============================================================================
+_ROLE = r"(?:a |an |the )?(knights?|knaves?|spy|spies)"
+_QUALIFIER = r"(exactly|only|at least|at most)"
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+
+def _number(word: str) -> int:
+    return int(word) if word.isdigit() else NUMBER_WORDS[word]
+
+
+class SentenceParser:
+    """Parse controlled natural-language sentences into type_expr.
+
+    Supported forms (case-insensitive, combinable with connectives):
+        X is (not) a knight/knave/spy        I am a spy
+        X is a knight or a spy               X and Y are (both) knaves
+        X and Y have the same role           X and Y have different roles
+        exactly/at least/at most N of X, Y and Z are spies
+        there is exactly one spy (among ...) none of us is a knave
+        if A then B / A if and only if B / either A or B / neither A nor B
+        A and B / A or B / it is not the case that A
+    """
+
+    def __init__(self, players: list[str]):
+        self.players = list(players)
+        self._by_lower = {p.lower(): p for p in self.players}
+
+    def parse(self, text: str, speaker: str | None = None) -> type_expr:
+        """Parse one sentence.
+
+        Args:
+            text: Sentence text
+            speaker: Player saying it ("I", "me" refer to them), None for hints
+
+        Raises:
+            ParseError: If the sentence is not in a supported form
+        """
+        self._speaker = speaker
+        sentence = text.strip().lower()
+        sentence = re.sub(r"\s+", " ", sentence).rstrip(".!").strip()
+        sentence = re.sub(r"^(among all players|among us|in this game),? ", "", sentence)
+        return self._parse(sentence)
+
+    # ------------------------------------------------------------------
+    def _person(self, word: str) -> str:
+        word = word.strip()
+        if word in ("i", "me", "myself"):
+            if not self._speaker:
+                raise ParseError("'I' used outside a player statement")
+            return self._speaker
+        if word in self._by_lower:
+            return self._by_lower[word]
+        raise ParseError(f"Unknown player: {word}")
+
+    def _group(self, text: str) -> list[str]:
+        text = text.strip()
+        if text in ("us", "we", "all of us", "all players", "the players", "everyone", "all", "them"):
+            return list(self.players)
+        if text.startswith("us ") or text.startswith("all of "):
+            raise ParseError(f"Unsupported group: {text}")
+        parts = re.split(r",\s*(?:and\s+)?|\s+and\s+", text)
+        people = [self._person(p) for p in parts if p]
+        if len(set(people)) != len(people):
+            raise ParseError(f"Repeated player in group: {text}")
+        return people
+
+    def _parse(self, s: str) -> type_expr:
+        s = s.strip().strip(",").strip()
+        if not s:
+            raise ParseError("Empty sentence")
+
+        atom = self._atom(s)
+        if atom is not None:
+            return atom
+
+        m = re.fullmatch(r"(?:it is not the case that|it is false that) (.+)", s)
+        if m:
+            return type_expr(op="not", args=[self._parse(m.group(1))])
+
+        m = re.fullmatch(r"if (.+?),? then (.+)", s) or re.fullmatch(r"if (.+?), (.+)", s)
+        if m:
+            return type_expr(op="implies", args=[self._parse(m.group(1)), self._parse(m.group(2))])
+
+        m = re.fullmatch(r"(.+?),? if and only if (.+)", s)
+        if m:
+            return type_expr(op="iff", args=[self._parse(m.group(1)), self._parse(m.group(2))])
+
+        m = re.fullmatch(r"neither (.+?) nor (.+)", s)
+        if m:
+            return type_expr(op="and", args=[
+                type_expr(op="not", args=[self._parse(m.group(1))]),
+                type_expr(op="not", args=[self._parse(m.group(2))]),
+            ])
+
+        m = re.fullmatch(r"either (.+?),? or (.+)", s)
+        if m:
+            return type_expr(op="or", args=[self._parse(m.group(1)), self._parse(m.group(2))])
+
+        # Binary connectives: try every split point, leftmost first
+        for word, op in ((" or ", "or"), (" and ", "and"), (", ", "and")):
+            start = 0
+            while True:
+                i = s.find(word, start)
+                if i < 0:
+                    break
+                try:
+                    left = self._parse(s[:i])
+                    right = self._parse(s[i + len(word):])
+                    return type_expr(op=op, args=[left, right])
+                except ParseError:
+                    start = i + 1
+
+        raise ParseError(f"Unsupported sentence: {s}")
+
+    def _atom(self, s: str) -> type_expr | None:
+        """Match the whole sentence against the atomic forms."""
+        for matcher in (
+            self._count_atom,
+            self._role_atom,
+            self._comparison_atom,
+            self._group_atom,
+        ):
+            try:
+                expr = matcher(s)
+            except ParseError:
+                continue
+            if expr is not None:
+                return expr
+        return None
+
+    def _role_atom(self, s: str) -> type_expr | None:
+        # X is (not) a <role> / I am (not) a <role>
+        m = re.fullmatch(r"(\w+) (?:am|is) (not )?" + _ROLE, s)
+        if m:
+            expr = type_expr(op="role", players=[self._person(m.group(1))], role=ROLE_WORDS[m.group(3)])
+            return type_expr(op="not", args=[expr]) if m.group(2) else expr
+
+        # X is a <role> or a <role>
+        m = re.fullmatch(r"(\w+) (?:am|is) " + _ROLE + r" or " + _ROLE, s)
+        if m:
+            person = self._person(m.group(1))
+            return type_expr(op="or", args=[
+                type_expr(op="role", players=[person], role=ROLE_WORDS[m.group(2)]),
+                type_expr(op="role", players=[person], role=ROLE_WORDS[m.group(3)]),
+            ])
+
+        # X is the only <role>
+        m = re.fullmatch(r"(\w+) (?:am|is) the only (knight|knave|spy)", s)
+        if m:
+            role = ROLE_WORDS[m.group(2)]
+            return type_expr(op="and", args=[
+                type_expr(op="role", players=[self._person(m.group(1))], role=role),
+                type_expr(op="count", players=list(self.players), role=role, cmp="==", k=1),
+            ])
+        return None
+
+    def _comparison_atom(self, s: str) -> type_expr | None:
+        # X and Y have the same role / different roles
+        m = re.fullmatch(r"(.+?) (?:have|has) (the same role|the same roles|different roles)", s)
+        if not m:
+            return None
+        group = self._group(m.group(1))
+        if len(group) < 2:
+            raise ParseError(f"Role comparison needs two players: {s}")
+        if m.group(2).startswith("the same"):
+            return type_expr(op="same", players=group)
+        if len(group) == 2:
+            return type_expr(op="not", args=[type_expr(op="same", players=group)])
+        # All pairwise different
+        return type_expr(op="and", args=[
+            type_expr(op="not", args=[type_expr(op="same", players=[a, b])])
+            for i, a in enumerate(group) for b in group[i + 1:]
+        ])
+
+    def _group_atom(self, s: str) -> type_expr | None:
+        # X and Y are (both / all) (not) <role>s / we are all <role>s
+        m = re.fullmatch(r"(.+?) are (?:both |all )?(not )?(?:both |all )?" + _ROLE, s)
+        if not m:
+            return None
+        group = self._group(m.group(1))
+        role = ROLE_WORDS[m.group(3)]
+        atoms = [type_expr(op="role", players=[p], role=role) for p in group]
+        if m.group(2):
+            atoms = [type_expr(op="not", args=[a]) for a in atoms]
+        return atoms[0] if len(atoms) == 1 else type_expr(op="and", args=atoms)
+
+    def _count_atom(self, s: str) -> type_expr | None:
+        # none of X, Y is a <role> / neither X nor Y is a <role>
+        m = (re.fullmatch(r"none of (.+?) (?:is|are) " + _ROLE, s)
+             or re.fullmatch(r"neither (\w+ nor \w+) (?:is|are) " + _ROLE, s))
+        if m:
+            group = self._group(m.group(1).replace(" nor ", " and "))
+            return type_expr(op="count", players=group, role=ROLE_WORDS[m.group(2)], cmp="==", k=0)
+
+        # exactly N of X, Y and Z are <role>s
+        m = re.fullmatch(_QUALIFIER + r" " + _NUMBER + r" of (.+?) (?:is|are) " + _ROLE, s)
+        if m:
+            return type_expr(op="count", players=self._group(m.group(3)), role=ROLE_WORDS[m.group(4)],
+                             cmp=COUNT_QUALIFIERS[m.group(1)], k=_number(m.group(2)))
+
+        # there is exactly one spy (among X, Y and Z)
+        m = re.fullmatch(r"there (?:is|are) (?:" + _QUALIFIER + r" )?" + _NUMBER + r" " + _ROLE
+                         + r"(?: (?:among|in) (.+))?", s)
+        if m:
+            group = self._group(m.group(4)) if m.group(4) else list(self.players)
+            cmp = COUNT_QUALIFIERS[m.group(1)] if m.group(1) else "=="
+            return type_expr(op="count", players=group, role=ROLE_WORDS[m.group(3)], cmp=cmp,
+                             k=_number(m.group(2)))
+        return None
+
+
+# ============================================================================
+# Puzzle loading
+# ============================================================================
+def parse_puzzle_text(text: str) -> type_puzzle:
+    """Parse puzzle markdown into a type_puzzle.
+
+    Recognizes "Player name:" / "Player statement:" pairs and game-manager
+    messages (the text after "hint for you:" when present).
+    Sentences that cannot be parsed are kept with expr=None.
+    """
+    players = []
+    raw_statements = []
+    raw_hints = []
+    current_player = None
+    for line in text.splitlines():
+        line = line.strip()
+        m = re.match(r"player name:\s*(.+)", line, re.IGNORECASE)
+        if m:
+            current_player = m.group(1).strip()
+            players.append(current_player)
+            continue
+        m = re.match(r"player statement:\s*(.+)", line, re.IGNORECASE)
+        if m and current_player:
+            raw_statements.append((current_player, m.group(1).strip()))
+            continue
+        m = re.match(r"message from the game manager:\s*(.+)", line, re.IGNORECASE)
+        if m:
+            message = m.group(1).strip()
+            hint = re.split(r"hint for you:\s*", message, flags=re.IGNORECASE)
+            raw_hints.append(hint[-1].strip())
+
+    parser = SentenceParser(players)
+    puzzle = type_puzzle(players=players)
+    for speaker, sentence in raw_statements:
+        puzzle.statements.append(type_claim(speaker=speaker, text=sentence,
+                                            expr=_try_parse(parser, sentence, speaker)))
+    for sentence in raw_hints:
+        puzzle.hints.append(type_claim(speaker="", text=sentence, expr=_try_parse(parser, sentence, None)))
+    return puzzle
+
+
+def load_puzzle(path: str | None = None) -> type_puzzle:
+    """Read and parse a puzzle file (uncached, see compile_puzzle)."""
+    with open(path or get_workspace().puzzle_path, "r") as f:
+        return parse_puzzle_text(f.read())
+
+
+def _try_parse(parser: SentenceParser, sentence: str, speaker: str | None) -> type_expr | None:
+    try:
+        return parser.parse(sentence, speaker)
+    except ParseError:
+        return None
+
+
+# ============================================================================
+# Compiled cache
+# ============================================================================
+def content_hash(text: str) -> str:
+    """Cache key of a puzzle text."""
+    return hashlib.sha256(f"{PARSER_VERSION}\n{text}".encode()).hexdigest()
+
+
+def expr_from_dict(data: dict) -> type_expr:
+    """Rebuild a type_expr (recursively) from its asdict() form."""
+    return type_expr(
+        op=data["op"],
+        args=[expr_from_dict(a) for a in data.get("args", [])],
+        players=data.get("players", []),
+        role=data.get("role", ""),
+        cmp=data.get("cmp", ""),
+        k=data.get("k", 0)
+    )
+
+
+def puzzle_from_dict(data: dict) -> type_puzzle:
+    """Rebuild a type_puzzle from its asdict() form."""
+    def claim(c: dict) -> type_claim:
+        expr = expr_from_dict(c["expr"]) if c.get("expr") else None
+        return type_claim(speaker=c["speaker"], text=c["text"], expr=expr)
+
+    return type_puzzle(
+        players=data["players"],
+        statements=[claim(c) for c in data.get("statements", [])],
+        hints=[claim(c) for c in data.get("hints", [])]
+    )
+
+
+def compile_puzzle(path: str | None = None, use_cache: bool = True) -> type_puzzle:
+    """Load a puzzle through the compiled cache.
+
+    Args:
+        path: Puzzle markdown file (default: the workspace's puzzle.md)
+        use_cache: Read/write contents/cache (False always re-parses)
+
+    Returns:
+        The parsed type_puzzle
+    """
+    workspace = get_workspace()
+    path = path or workspace.puzzle_path
+    with open(path, "r") as f:
+        text = f.read()
+    if not use_cache:
+        return parse_puzzle_text(text)
+
+    key = content_hash(text)
+    cache_path = os.path.join(workspace.cache_folder, f"puzzle-{key[:16]}.json")
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("hash") == key:
+                return puzzle_from_dict(cached["puzzle"])
+        except (ValueError, KeyError):
+            pass  # Corrupt cache entry: re-parse and overwrite
+
+    puzzle = parse_puzzle_text(text)
+    os.makedirs(workspace.cache_folder, exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"hash": key, "source": os.path.abspath(path), "puzzle": asdict(puzzle)}, f)
+    os.replace(temp_path, cache_path)
+    return puzzle
+
+
+# ============================================================================
+# Initial problem
+# ============================================================================
+RULES = [
+    "Each player is exactly one of: knight, knave, spy",
+    "A knight always tells the truth",
+    "A knave always lies",
+    "A spy can either tell the truth or lie",
+]
+
+
+def _join_names(names: list[str]) -> str:
+    return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def initial_problem_args(puzzle: type_puzzle) -> tuple[list[str], list[str]]:
+    """Hypothesis and objectives of the initial problem for a puzzle.
+
+    Returns:
+        Tuple of (hypothesis, objectives) for prob_init.create_initial_problem()
+    """
+    hypothesis = [f"The players are {_join_names(puzzle.players)}"] + RULES
+    for claim in puzzle.statements:
+        hypothesis.append(f'{claim.speaker} says: "{claim.text}"')
+    for claim in puzzle.hints:
+        hypothesis.append(f'The game manager (always truthful) says: "{claim.text}"')
+
+    objectives = [f"Determine the role of {player}" for player in puzzle.players]
+    return hypothesis, objectives
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a Knights/Knaves/Spy puzzle")
+    parser.add_argument('puzzle', nargs='?', default=None,
+                        help='Path to the puzzle markdown (default: puzzle.md of the workspace)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse again without reading or writing the cache')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the compiled puzzle as JSON')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    puzzle = compile_puzzle(args.puzzle, use_cache=not args.no_cache)
+    if args.json:
+        print(json.dumps(asdict(puzzle), indent=2))
+    else:
+        print(f"Players: {', '.join(puzzle.players)}")
+        for claim in puzzle.statements + puzzle.hints:
+            who = claim.speaker or "game manager"
+            status = "ok" if claim.expr is not None else "UNPARSED"
+            print(f"  [{status}] {who}: {claim.text}")
+        hypothesis, objectives = initial_problem_args(puzzle)
+        print("Hypothesis:")
+        for item in hypothesis:
+            print(f"  {item}")
+        print("Objectives:")
+        for item in objectives:
+            print(f"  {item}")
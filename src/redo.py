@@ -0,0 +1,244 @@
+"""Redo stack for rewinds.
+
+A rewind from head H to target T no longer deletes what it drops: the
+segment (T, H] is pushed onto contents/redo/ as
+    <nnnn>/segment.json      base T, head H, config.json at H
+    <nnnn>/log.jsonl         the dropped log lines
+    <nnnn>/history/<log_id>  the dropped backup folders (moved, not copied)
+    <nnnn>/objects/<id>.json objects touched in the segment, as they were at H
+and redo_segment() puts it back: backup folders and objects are moved back,
+the log lines appended and config.json restored, so a redo costs about as
+much as the rewind did.
+
+Only the top segment can be redone, and only while the store is still at
+its base: a commit made after a rewind starts a new line of history, and
+the stack is cleared on the next push. The oldest segments expire once
+the stack holds more than MAX_SEGMENTS segments or MAX_BYTES bytes.
+
+Usage:
+    python src/redo.py [--steps 2]      redo the last rewind(s)
+    python src/redo.py --list | --clear
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from cus_types_main import type_redo_segment
+from log_store import iter_lines, line_log_id, roll
+from utils import IDManager, add_workspace_argument, get_log_id_from_entry, get_workspace, set_workspace
+
+
+MAX_SEGMENTS = 10
+MAX_BYTES = 256 * 1024 * 1024
+
+SEGMENT_META = "segment.json"
+
+
+def _folder_bytes(folder: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+    return total
+
+
+def list_segments() -> list[type_redo_segment]:
+    """Segments on the stack, bottom (oldest) first."""
+    folder = get_workspace().redo_folder
+    segments = []
+    if not os.path.isdir(folder):
+        return segments
+    for name in sorted(os.listdir(folder)):
+        meta_path = os.path.join(folder, name, SEGMENT_META)
+        if not os.path.exists(meta_path):
+            continue  # Half-written segment of an interrupted rewind
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        segments.append(type_redo_segment(name=name, base=meta["base"], head=meta["head"],
+                                          entries=meta["entries"], bytes=meta.get("bytes", 0),
+                                          time=meta.get("time", 0.0)))
+    return segments
+
+
+def segment_path(segment: type_redo_segment) -> str:
+    return os.path.join(get_workspace().redo_folder, segment.name)
+
+
+def drop_segment(segment: type_redo_segment) -> None:
+    shutil.rmtree(segment_path(segment), ignore_errors=True)
+
+
+def clear() -> int:
+    """Empty the redo stack; returns the number of segments dropped."""
+    segments = list_segments()
+    shutil.rmtree(get_workspace().redo_folder, ignore_errors=True)
+    return len(segments)
+
+
+def expire(max_segments: int = MAX_SEGMENTS, max_bytes: int = MAX_BYTES) -> list[type_redo_segment]:
+    """Drop the oldest segments beyond the count and byte limits (the top one is always kept)."""
+    segments = list_segments()
+    dropped = []
+    while len(segments) > 1 and (len(segments) > max_segments or sum(s.bytes for s in segments) > max_bytes):
+        segment = segments.pop(0)
+        drop_segment(segment)
+        dropped.append(segment)
+    return dropped
+
+
+def push_segment(target_log_id: str) -> str | None:
+    """Save what a rewind to target_log_id is about to drop (call before rewinding).
+
+    Copies the log lines after the target, config.json and the current
+    version of every object they touch. The rewind then moves the backup
+    folders into <segment>/history (see rewind.cleanup_history).
+
+    Returns:
+        The segment folder, or None if nothing follows the target
+
+    Raises:
+        ValueError: If target_log_id is not in the log
+    """
+    workspace = get_workspace()
+    lines, touched, found = [], [], target_log_id == "l-000"
+    for line in iter_lines(since=target_log_id):
+        if not line.strip():
+            continue
+        if not found:
+            found = line_log_id(line) == target_log_id
+            continue
+        entry = json.loads(line)
+        log_id = get_log_id_from_entry(entry)
+        lines.append(line if line.endswith("\n") else line + "\n")
+        body = entry[log_id]
+        touched += body.get("creation", []) + body.get("modification", []) + body.get("deletion", [])
+    if not found:
+        raise ValueError(f"Log ID '{target_log_id}' not found in log.jsonl")
+    if not lines:
+        return None
+    head = get_log_id_from_entry(json.loads(lines[-1]))
+
+    # A stack whose top does not continue from the current head belongs to an abandoned line of history
+    segments = list_segments()
+    if segments and segments[-1].base != head:
+        clear()
+        segments = []
+
+    existing = os.listdir(workspace.redo_folder) if os.path.isdir(workspace.redo_folder) else []
+    name = f"{max((int(n) for n in existing if n.isdigit()), default=0) + 1:04d}"
+    folder = os.path.join(workspace.redo_folder, name)
+    os.makedirs(os.path.join(folder, "objects"))
+    os.makedirs(os.path.join(folder, "history"))
+    with open(os.path.join(folder, "log.jsonl"), "w") as f:
+        f.writelines(lines)
+    for obj_id in dict.fromkeys(touched):
+        source = os.path.join(workspace.object_folders[obj_id.split("-")[0]], f"{obj_id}.json")
+        target = os.path.join(folder, "objects", f"{obj_id}.json")
+        # The rewind deletes or replaces (never rewrites) each of these files, so a hard link keeps this version
+        try:
+            os.link(source, target)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            shutil.copy2(source, target)
+    with open(workspace.config_path, "r") as f:
+        config = json.load(f)
+
+    # segment.json is written last: its presence marks a complete segment
+    meta = {"base": target_log_id, "head": head, "entries": len(lines), "config": config,
+            "touched": list(dict.fromkeys(touched)), "time": time.time()}
+    with open(os.path.join(folder, SEGMENT_META), "w") as f:
+        json.dump(meta, f)
+    return folder
+
+
+def finish_push(folder: str) -> None:
+    """Record the segment size once the rewind moved the backups in, then apply the limits."""
+    meta_path = os.path.join(folder, SEGMENT_META)
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    meta["bytes"] = _folder_bytes(folder)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    expire()
+
+
+def redo_segment() -> type_redo_segment:
+    """Re-apply the top segment of the stack.
+
+    Raises:
+        ValueError: If the stack is empty or the store moved on since the rewind
+    """
+    workspace = get_workspace()
+    segments = list_segments()
+    if not segments:
+        raise ValueError("Nothing to redo")
+    segment = segments[-1]
+    head = IDManager().current_ids["l"]
+    if head != segment.base:
+        raise ValueError(f"The store is at {head}, the last rewind was to {segment.base}: "
+                         f"commits made since then replaced the rewound history")
+    folder = segment_path(segment)
+    with open(os.path.join(folder, SEGMENT_META), "r") as f:
+        meta = json.load(f)
+
+    history = os.path.join(folder, "history")
+    for log_id in os.listdir(history):
+        shutil.move(os.path.join(history, log_id), os.path.join(workspace.history_folder, log_id))
+
+    saved = os.path.join(folder, "objects")
+    for obj_id in meta["touched"]:
+        target = os.path.join(workspace.object_folders[obj_id.split("-")[0]], f"{obj_id}.json")
+        source = os.path.join(saved, f"{obj_id}.json")
+        if os.path.exists(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+        elif os.path.exists(target):
+            os.remove(target)  # Deleted within the segment
+
+    with open(os.path.join(folder, "log.jsonl"), "r") as f:
+        lines = f.read()
+    with open(workspace.log_path, "a") as f:
+        f.write(lines)
+    roll(workspace)
+    with open(workspace.config_path, "w") as f:
+        json.dump(meta["config"], f, indent=4)
+    IDManager._instances.pop(workspace.root, None)
+
+    drop_segment(segment)
+    return segment
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redo rewinds from the redo stack")
+    parser.add_argument('--steps', type=int, default=1,
+                        help='Number of rewinds to redo (default: 1)')
+    parser.add_argument('--list', action='store_true',
+                        help='Show the redo stack')
+    parser.add_argument('--clear', action='store_true',
+                        help='Empty the redo stack')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.list:
+        segments = list_segments()
+        if not segments:
+            print("Redo stack is empty.")
+        for segment in reversed(segments):
+            print(f"  {segment.base} -> {segment.head}: {segment.entries} entries, {segment.bytes} bytes, "
+                  f"rewound {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(segment.time))}")
+    elif args.clear:
+        print(f"Dropped {clear()} segments.")
+    else:
+        for _ in range(args.steps):
+            try:
+                segment = redo_segment()
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+            print(f"Redone {segment.base} -> {segment.head} ({segment.entries} entries)")
@@ -0,0 +1,97 @@
+"""Hypothesis reference resolution shared by prob.py, state.py and prob_init.py.
+
+Hypothesis items may start with a reference to an existing object, e.g.
+"(s-003) Alice is a knave" or "(e-001) ...". resolve_references() extracts
+all references of a hypothesis list in one pass and fetches the referenced
+texts in one bulk read:
+- statement conclusions come from the search index (contents/index) when it
+  is current, which is a single SQL query;
+- anything else is read from the object files (concurrently for big batches).
+
+Missing references are returned explicitly instead of being swallowed.
+"""
+import re
+import sqlite3
+import sys
+
+from utils import IDManager, load_objects
+
+
+REFERENCE_PATTERN = re.compile(r'^\(([se]-[a-z]*\d+)\)')
+REFERENCE_PREFIX_PATTERN = re.compile(r'^\([se]-[a-z]*\d+\)\s*')
+
+
+def parse_reference(text: str) -> str | None:
+    """Extract the object ID from text starting with (s-...) or (e-...).
+
+    Args:
+        text: Input text to parse
+
+    Returns:
+        Referenced ID if found, else None
+    """
+    match = REFERENCE_PATTERN.match(text.lstrip())
+    return match.group(1) if match else None
+
+
+def strip_reference(text: str) -> str:
+    """Remove a leading (s-...)/(e-...) reference from text."""
+    return REFERENCE_PREFIX_PATTERN.sub('', text.lstrip()).strip()
+
+
+def _object_text(obj: dict) -> str:
+    """Text a reference expands to: statement conclusion or experience content."""
+    if "conclusion" in obj:
+        conclusion = obj["conclusion"]
+        return ' '.join(conclusion) if isinstance(conclusion, list) else str(conclusion)
+    return str(obj.get("content", ""))
+
+
+def _conclusions_from_index(statement_ids: list[str]) -> dict[str, str]:
+    """Bulk-read conclusions from the search index if it is current."""
+    from search import SearchIndex
+
+    if not statement_ids:
+        return {}
+    try:
+        index = SearchIndex()
+    except sqlite3.Error:
+        return {}
+    try:
+        if index.last_log_id != IDManager().current_ids["l"]:
+            return {}
+        placeholders = ",".join("?" * len(statement_ids))
+        rows = index.conn.execute(
+            f"SELECT id, conclusion FROM docs WHERE id IN ({placeholders})", statement_ids
+        )
+        return dict(rows.fetchall())
+    finally:
+        index.close()
+
+
+def resolve_references(items: list[str]) -> tuple[dict[str, str], list[str]]:
+    """Resolve all references of a hypothesis list in one pass.
+
+    Args:
+        items: Hypothesis items
+
+    Returns:
+        Tuple of (texts, missing):
+        - texts: {referenced_id: conclusion/content text}
+        - missing: referenced IDs with no object, in order of appearance
+    """
+    refs = [ref for ref in (parse_reference(item) for item in items) if ref]
+    refs = list(dict.fromkeys(refs))
+    if not refs:
+        return {}, []
+
+    texts = _conclusions_from_index([r for r in refs if r.startswith("s-")])
+    remaining = [r for r in refs if r not in texts]
+    for obj_id, obj in load_objects(remaining).items():
+        texts[obj_id] = _object_text(obj)
+
+    missing = [r for r in refs if r not in texts]
+    if missing:
+        print(f"Warning: hypothesis references not found: {', '.join(missing)} (reference dropped)",
+              file=sys.stderr)
+    return texts, missing
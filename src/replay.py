@@ -0,0 +1,409 @@
+"""Replay a workspace's history against a storage backend.
+
+log.jsonl only records which ids each commit created or modified; the
+object versions are recovered from the backups:
+- contents/history/<log_id>/<id>.json is an object as it was BEFORE the
+  commit <log_id> modified it,
+- so the version written by a commit is the backup taken at the object's
+  next modification (or deletion), or the object file if there is none.
+
+Consecutive versions are diffed into the field updates handle_changes()
+would have received (list growth becomes an "append", everything else an
+"overwrite"). The resulting transactions are applied to a backend as fast
+as it accepts them:
+
+    workspace   a fresh workspace, through handle_changes() (the real path,
+                event subscribers and indexes included); rebuilds a store
+    sqlite      one SQLite file (objects, backups and log tables)
+    memory      a dict, to measure the replay overhead itself
+    module:Class  any ReplayBackend subclass
+
+Usage:
+    python src/replay.py --source runs/gen-5p-0 --backend workspace --target /tmp/copy [--verify]
+    python src/replay.py --backend sqlite --target /tmp/store.db [--json]
+"""
+import argparse
+import copy
+import importlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Iterator
+
+from cus_types_main import type_object_change, type_transaction
+from log_store import iter_lines, log_tail
+from utils import (IDManager, Workspace, add_workspace_argument, apply_updates, get_log_id_from_entry,
+                   get_object_type_from_id, get_workspace, handle_changes, set_workspace, use_workspace)
+
+
+BACKENDS = {
+    "workspace": "replay:WorkspaceBackend",
+    "sqlite": "replay:SqliteBackend",
+    "memory": "replay:MemoryBackend",
+}
+
+
+# ============================================================================
+# Reconstruction
+# ============================================================================
+def object_updates(old: dict, new: dict, prefix: str = "") -> dict:
+    """Field updates turning old into new, in apply_updates() form.
+
+    Nested dicts are diffed per field ("proof.full"); a list that only grew
+    becomes ("append", added items), any other list change ("overwrite",
+    items). Keys missing from new cannot be expressed and are left out.
+
+    Args:
+        old: Previous version
+        new: Next version
+        prefix: Dot path of old/new inside the object (recursion)
+    """
+    updates = {}
+    for key, value in new.items():
+        path = prefix + key
+        before = old.get(key)
+        if key in old and before == value:
+            continue
+        if isinstance(value, dict) and isinstance(before, dict) and set(before) <= set(value):
+            updates.update(object_updates(before, value, path + "."))
+        elif isinstance(value, list):
+            if isinstance(before, list) and len(value) > len(before) and value[:len(before)] == before:
+                updates[path] = ("append", value[len(before):])
+            else:
+                updates[path] = ("overwrite", value)
+        else:
+            updates[path] = value
+    return updates
+
+
+def read_log(workspace: Workspace) -> list[dict]:
+    """Parsed log entries of a workspace, cold segments included (a torn last line is skipped)."""
+    entries = []
+    for line in iter_lines(workspace=workspace):
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            print(f"Warning: skipping unreadable log line: {line[:80]!r}", file=sys.stderr)
+    return entries
+
+
+class HistoryReader:
+    """Rebuild the transactions of a workspace from its log and backups."""
+
+    def __init__(self, workspace: Workspace):
+        self.workspace = workspace
+        self.entries = read_log(workspace)
+        self.missing: list[str] = []  # "<log_id>/<id>" backups that were expected but absent
+
+        # Log ids touching each object, in log order
+        self._touches: dict[str, list[str]] = {}
+        for entry in self.entries:
+            log_id = get_log_id_from_entry(entry)
+            body = entry[log_id]
+            for obj_id in body.get("creation", []) + body.get("modification", []) + body.get("deletion", []):
+                self._touches.setdefault(obj_id, []).append(log_id)
+
+    def _read(self, path: str) -> dict | None:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def backup(self, log_id: str, obj_id: str) -> dict | None:
+        """Object as it was before commit log_id modified or deleted it."""
+        return self._read(os.path.join(self.workspace.history_folder, log_id, f"{obj_id}.json"))
+
+    def version_after(self, obj_id: str, log_id: str) -> dict | None:
+        """Object as written by commit log_id (None if no copy survives)."""
+        touches = self._touches[obj_id]
+        later = touches[touches.index(log_id) + 1:]
+        if later:
+            data = self._read(os.path.join(self.workspace.history_folder, later[0], f"{obj_id}.json"))
+            if data is not None:
+                return data
+            self.missing.append(f"{later[0]}/{obj_id}")
+            return None
+        folder = self.workspace.object_folders[get_object_type_from_id(obj_id)]
+        return self._read(os.path.join(folder, f"{obj_id}.json"))
+
+    def transactions(self) -> Iterator[type_transaction]:
+        """Yield the commits in log order.
+
+        Modified objects whose version cannot be recovered are left out of
+        their transaction (and listed in self.missing).
+        """
+        versions: dict[str, dict] = {}
+        parent = "l-000"
+        for entry in self.entries:
+            log_id = get_log_id_from_entry(entry)
+            tx = type_transaction(log_id=log_id, parent_log_id=parent, current=entry["current"])
+            for obj_id in entry[log_id].get("creation", []):
+                data = self.version_after(obj_id, log_id)
+                if data is None:
+                    self.missing.append(f"{log_id}/{obj_id}")
+                    continue
+                versions[obj_id] = data
+                tx.creates.append(copy.deepcopy(data))
+            for obj_id in entry[log_id].get("modification", []):
+                data = self.version_after(obj_id, log_id)
+                before = versions.get(obj_id)
+                if before is None:
+                    # Created before a gap in the history: start from its first backup
+                    before = self.backup(log_id, obj_id)
+                if data is None or before is None:
+                    continue
+                tx.updates.append((obj_id, object_updates(before, data)))
+                versions[obj_id] = data
+            for obj_id in entry[log_id].get("deletion", []):
+                tx.deletes.append(obj_id)
+                versions.pop(obj_id, None)
+            parent = log_id
+            yield tx
+
+
+# ============================================================================
+# Backends
+# ============================================================================
+class ReplayBackend:
+    """Target of a replay. apply() is called once per transaction, in log order."""
+
+    def __init__(self, target: str | None = None):
+        self.target = target
+
+    def begin(self) -> None:
+        pass
+
+    def apply(self, tx: type_transaction) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> dict:
+        """Close the store and return backend stats (e.g. {"bytes": ...})."""
+        return {}
+
+
+class MemoryBackend(ReplayBackend):
+    """Objects and log in a dict."""
+
+    def begin(self) -> None:
+        self.objects: dict[str, dict] = {}
+        self.log: list[str] = []
+
+    def apply(self, tx: type_transaction) -> None:
+        for data in tx.creates:
+            self.objects[data["id"]] = copy.deepcopy(data)
+        for obj_id, updates in tx.updates:
+            apply_updates(self.objects[obj_id], copy.deepcopy(updates))
+        for obj_id in tx.deletes:
+            self.objects.pop(obj_id, None)
+        self.log.append(tx.log_id)
+
+    def finish(self) -> dict:
+        return {"objects": len(self.objects), "bytes": sum(len(json.dumps(o)) for o in self.objects.values())}
+
+
+REPLAY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (id TEXT PRIMARY KEY, data TEXT);
+CREATE TABLE IF NOT EXISTS backups (log_id TEXT, id TEXT, data TEXT, PRIMARY KEY (log_id, id));
+CREATE TABLE IF NOT EXISTS log (seq INTEGER PRIMARY KEY, log_id TEXT UNIQUE, entry TEXT);
+"""
+
+
+class SqliteBackend(ReplayBackend):
+    """Objects, backups and log in one SQLite file (one SQL transaction per commit)."""
+
+    def begin(self) -> None:
+        if not self.target:
+            raise ValueError("The sqlite backend needs --target (database file)")
+        if os.path.exists(self.target):
+            raise ValueError(f"Target {self.target} already exists")
+        self.conn = sqlite3.connect(self.target)
+        self.conn.executescript(REPLAY_SCHEMA)
+
+    def apply(self, tx: type_transaction) -> None:
+        with self.conn:
+            for data in tx.creates:
+                self.conn.execute("INSERT INTO objects (id, data) VALUES (?, ?)", (data["id"], json.dumps(data)))
+            for obj_id, updates in tx.updates:
+                row = self.conn.execute("SELECT data FROM objects WHERE id = ?", (obj_id,)).fetchone()
+                self.conn.execute("INSERT INTO backups (log_id, id, data) VALUES (?, ?, ?)",
+                                  (tx.log_id, obj_id, row[0]))
+                data = apply_updates(json.loads(row[0]), copy.deepcopy(updates))
+                self.conn.execute("UPDATE objects SET data = ? WHERE id = ?", (json.dumps(data), obj_id))
+            for obj_id in tx.deletes:
+                self.conn.execute("INSERT INTO backups (log_id, id, data) "
+                                  "SELECT ?, id, data FROM objects WHERE id = ?", (tx.log_id, obj_id))
+                self.conn.execute("DELETE FROM objects WHERE id = ?", (obj_id,))
+            entry = {tx.log_id: {"creation": [d["id"] for d in tx.creates],
+                                 "modification": [i for i, _ in tx.updates]},
+                     "current": tx.current}
+            if tx.deletes:
+                entry[tx.log_id]["deletion"] = tx.deletes
+            self.conn.execute("INSERT INTO log (log_id, entry) VALUES (?, ?)", (tx.log_id, json.dumps(entry)))
+
+    def finish(self) -> dict:
+        objects = self.conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        self.conn.close()
+        return {"objects": objects, "bytes": os.path.getsize(self.target)}
+
+
+class WorkspaceBackend(ReplayBackend):
+    """A fresh workspace, written through handle_changes().
+
+    Counters are restored before each commit, so log ids and object ids
+    match the source as long as its log has no gaps.
+    """
+
+    def begin(self) -> None:
+        if not self.target:
+            raise ValueError("The workspace backend needs --target (workspace folder)")
+        self.workspace = get_workspace(self.target)
+        if log_tail(self.workspace)[2] > 0:
+            raise ValueError(f"Target workspace {self.workspace.root} already has a log")
+        self.mismatched: list[str] = []
+
+    def apply(self, tx: type_transaction) -> None:
+        with use_workspace(self.workspace):
+            id_manager = IDManager()
+            id_manager.restore(dict(zip("pse", tx.current), l=tx.parent_log_id))
+            changes = [type_object_change(change_type="create", obj=data) for data in tx.creates]
+            changes += [type_object_change(change_type="update", obj={"id": obj_id}, updates=updates)
+                        for obj_id, updates in tx.updates]
+            changes += [type_object_change(change_type="delete", obj={"id": obj_id}) for obj_id in tx.deletes]
+            if not changes:
+                return
+            log_id, _, _ = handle_changes(changes)
+            if log_id != tx.log_id:
+                self.mismatched.append(f"{tx.log_id}->{log_id}")
+
+    def finish(self) -> dict:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.workspace.contents):
+            total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+        return {"bytes": total, "mismatched_log_ids": self.mismatched}
+
+
+def load_backend(spec: str) -> type[ReplayBackend]:
+    """Backend class from a name in BACKENDS or a "module:Class" spec."""
+    module_name, class_name = BACKENDS.get(spec, spec).split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+# ============================================================================
+# Replay
+# ============================================================================
+def replay(source: Workspace, backend: ReplayBackend) -> dict:
+    """Replay a workspace's history into a backend.
+
+    Returns:
+        Report: transaction/create/update/delete counts, read and apply seconds,
+        transactions/sec, missing backups and the backend's own stats
+    """
+    reader = HistoryReader(source)
+    read_seconds = apply_seconds = 0.0
+    counts = {"transactions": 0, "creates": 0, "updates": 0, "deletes": 0}
+
+    backend.begin()
+    transactions = reader.transactions()
+    while True:
+        start = time.perf_counter()
+        tx = next(transactions, None)
+        read_seconds += time.perf_counter() - start
+        if tx is None:
+            break
+        start = time.perf_counter()
+        backend.apply(tx)
+        apply_seconds += time.perf_counter() - start
+        counts["transactions"] += 1
+        counts["creates"] += len(tx.creates)
+        counts["updates"] += len(tx.updates)
+        counts["deletes"] += len(tx.deletes)
+    stats = backend.finish()
+
+    return {
+        "source": source.root,
+        "backend": type(backend).__name__,
+        **counts,
+        "read_seconds": read_seconds,
+        "apply_seconds": apply_seconds,
+        "transactions_per_sec": counts["transactions"] / apply_seconds if apply_seconds else 0.0,
+        "missing_backups": reader.missing,
+        "backend_stats": stats,
+    }
+
+
+def verify_workspace(source: Workspace, target: Workspace) -> list[str]:
+    """Ids whose object file differs between two workspaces (or exists in only one)."""
+    differences = []
+    for obj_type, folder in source.object_folders.items():
+        names = set()
+        for ws in (source, target):
+            if os.path.isdir(ws.object_folders[obj_type]):
+                names |= {n for n in os.listdir(ws.object_folders[obj_type]) if n.endswith(".json")}
+        for name in sorted(names):
+            versions = []
+            for ws in (source, target):
+                path = os.path.join(ws.object_folders[obj_type], name)
+                try:
+                    with open(path, "r") as f:
+                        versions.append(json.load(f))
+                except (FileNotFoundError, ValueError):
+                    versions.append(None)
+            if versions[0] != versions[1]:
+                differences.append(name[:-5])
+    return differences
+
+
+def print_report(report: dict) -> None:
+    print(f"Replayed {report['source']} into {report['backend']}")
+    print(f"  {report['transactions']} transactions ({report['creates']} creates, {report['updates']} updates, "
+          f"{report['deletes']} deletes)")
+    print(f"  read {report['read_seconds'] * 1000:.1f} ms, apply {report['apply_seconds'] * 1000:.1f} ms "
+          f"({report['transactions_per_sec']:.0f} transactions/sec)")
+    if report["missing_backups"]:
+        print(f"  [!] {len(report['missing_backups'])} missing backups: {', '.join(report['missing_backups'][:5])}")
+    for key, value in report["backend_stats"].items():
+        if value or value == 0:
+            print(f"  {key}: {value}")
+    if "differences" in report:
+        if report["differences"]:
+            print(f"  [!] {len(report['differences'])} objects differ: {', '.join(report['differences'][:10])}")
+        else:
+            print("  Verified: every object matches the source")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a workspace's history against a storage backend")
+    parser.add_argument('--source', type=str, default=None,
+                        help='Workspace to replay (default: the current workspace)')
+    parser.add_argument('--backend', type=str, default="workspace",
+                        help=f'One of {", ".join(BACKENDS)}, or module:Class (default: workspace)')
+    parser.add_argument('--target', type=str, default=None,
+                        help='Target workspace folder (workspace) or database file (sqlite)')
+    parser.add_argument('--verify', action='store_true',
+                        help='workspace backend: compare every object with the source afterwards')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    source = get_workspace(args.source)
+    backend = load_backend(args.backend)(args.target)
+    try:
+        report = replay(source, backend)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.verify and getattr(backend, "workspace", None) is not None:
+        report["differences"] = verify_workspace(source, backend.workspace)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
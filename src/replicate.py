@@ -0,0 +1,292 @@
+"""Incremental log shipping to a replica workspace.
+
+A replica is an ordinary workspace (every tool runs on it with
+--workspace) that follows a source workspace, e.g. a warm standby on
+another disk or a copy for analytics. Each pass of ship():
+1. reads the source log after the replica's last entry (cold segments
+   before it are not opened, see log_store.iter_lines),
+2. copies the objects those entries created or modified, in their current
+   version, removes the ones that are gone and copies the entries' backup
+   folders,
+3. appends the entries to the replica's log, sets its config.json and
+   records the checkpoint (contents/replication.json).
+A pass costs about what the commits since the previous one wrote, whatever
+the size of the store, and a replica that fell behind catches up in one
+pass. Object files can be ahead of the replica's log by the commits made
+during a pass; the next pass brings the log level.
+
+The checkpoint keeps a hash of the last shipped log line. If the source no
+longer has that line (it was rewound), the replica is rebuilt from scratch.
+
+Usage:
+    python src/replicate.py --replica /mnt/standby/run-01 [--follow] [--interval 1.0]
+    python src/replicate.py --replica /mnt/standby/run-01 --status
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cus_types_main import type_ship_report
+from log_store import SEGMENT_BYTES, iter_lines, line_log_id, log_tail, manifest_path, roll
+from utils import IDManager, Workspace, add_workspace_argument, get_log_id_from_entry, get_workspace, set_workspace
+
+
+CHECKPOINT_NAME = "replication.json"
+
+# Threads copying files; each thread takes CHUNK_SIZE files at a time
+WORKERS = 8
+CHUNK_SIZE = 256
+
+
+def checkpoint_path(replica: Workspace) -> str:
+    return os.path.join(replica.contents, CHECKPOINT_NAME)
+
+
+def read_checkpoint(replica: Workspace) -> dict | None:
+    """{"source", "log_id", "hash", "time"} of the last pass, or None for a new replica."""
+    path = checkpoint_path(replica)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_checkpoint(replica: Workspace, checkpoint: dict) -> None:
+    path = checkpoint_path(replica)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def _line_hash(line: str) -> str:
+    return hashlib.sha1(line.encode()).hexdigest()
+
+
+def _replica_position(replica: Workspace, checkpoint: dict | None) -> tuple[str, str | None]:
+    """Last log id of the replica and the hash of its line."""
+    log_id = log_tail(replica)[0]
+    if log_id == "l-000":
+        return log_id, None
+    if checkpoint and checkpoint["log_id"] == log_id:
+        return log_id, checkpoint["hash"]
+    # A pass stopped between the log append and the checkpoint
+    for line in iter_lines(since=log_id, workspace=replica):
+        if line.strip() and line_log_id(line) == log_id:
+            return log_id, _line_hash(line)
+    return log_id, None
+
+
+def _new_lines(source: Workspace, log_id: str, line_hash: str | None) -> list[str] | None:
+    """Complete source log lines after log_id; None if the source no longer has that line."""
+    lines, found = [], log_id == "l-000"
+    for line in iter_lines(since=None if found else log_id, workspace=source):
+        if not line.endswith("\n"):
+            break  # Commit in progress, shipped next pass
+        if not line.strip():
+            continue
+        if found:
+            lines.append(line)
+        elif line_log_id(line) == log_id:
+            if line_hash is not None and _line_hash(line) != line_hash:
+                return None
+            found = True
+    return lines if found else None
+
+
+def _copy(pair: tuple[str, str]) -> int:
+    """Copy one file; returns its size (0 if the source is gone)."""
+    source, target = pair
+    try:
+        shutil.copyfile(source, target)
+    except FileNotFoundError:
+        return 0
+    return os.path.getsize(target)
+
+
+def _copy_all(pool: ThreadPoolExecutor, pairs: list[tuple[str, str]]) -> int:
+    chunks = [pairs[i:i + CHUNK_SIZE] for i in range(0, len(pairs), CHUNK_SIZE)]
+    return sum(pool.map(lambda chunk: sum(_copy(pair) for pair in chunk), chunks))
+
+
+def _append_lines(replica: Workspace, lines: list[str]) -> None:
+    """Append to the replica's log, rolling it every SEGMENT_BYTES as commits would."""
+    batch, size = [], 0
+    for line in lines + [None]:
+        if line is not None:
+            batch.append(line)
+            size += len(line)
+        if batch and (line is None or size >= SEGMENT_BYTES):
+            with open(replica.log_path, "a") as f:
+                f.writelines(batch)
+            roll(replica)
+            batch, size = [], 0
+
+
+def reset_replica(replica: Workspace) -> None:
+    """Remove everything a replica received (objects, history, log, indexes, config)."""
+    for folder in list(replica.object_folders.values()) + [replica.history_folder, replica.segments_folder,
+                                                           replica.index_folder]:
+        shutil.rmtree(folder, ignore_errors=True)
+    for path in (replica.config_path, checkpoint_path(replica)):
+        if os.path.exists(path):
+            os.remove(path)
+    IDManager._instances.pop(replica.root, None)
+
+
+def ship(source: Workspace, replica: Workspace, workers: int = WORKERS) -> type_ship_report:
+    """Bring a replica up to the source's last complete log entry.
+
+    Raises:
+        ValueError: If the replica is the source, follows another source, or
+            is a workspace with its own history
+    """
+    start = time.perf_counter()
+    if source.root == replica.root:
+        raise ValueError("The replica cannot be the source workspace")
+    checkpoint = read_checkpoint(replica)
+    if checkpoint is None and log_tail(replica)[2] > 0:
+        raise ValueError(f"{replica.root} has its own log and is not a replica (no {CHECKPOINT_NAME})")
+    if checkpoint is not None and checkpoint["source"] != source.root:
+        raise ValueError(f"{replica.root} is a replica of {checkpoint['source']}")
+
+    report = type_ship_report()
+    log_id, line_hash = _replica_position(replica, checkpoint)
+    lines = _new_lines(source, log_id, line_hash)
+    if lines is None:
+        # The source was rewound past the replica's last entry
+        reset_replica(replica)
+        checkpoint, report.resynced = None, True
+        log_id, lines = "l-000", _new_lines(source, "l-000", None)
+    report.log_id = log_id
+    if not lines and checkpoint is not None:
+        report.seconds = time.perf_counter() - start
+        return report
+    if checkpoint is None:
+        # Mark the folder as a replica before it gets a log of its own
+        os.makedirs(replica.contents, exist_ok=True)
+        _write_checkpoint(replica, {"source": source.root, "log_id": "l-000", "hash": None, "time": time.time()})
+
+    # Each object is copied once per pass, in its latest version
+    objects: dict[str, None] = {}
+    backups: list[tuple[str, str]] = []
+    for line in lines:
+        entry = json.loads(line)
+        entry_id = get_log_id_from_entry(entry)
+        body = entry[entry_id]
+        for obj_id in body.get("creation", []) + body.get("modification", []) + body.get("deletion", []):
+            objects[obj_id] = None
+        folder = os.path.join(source.history_folder, entry_id)
+        if os.path.isdir(folder):
+            os.makedirs(os.path.join(replica.history_folder, entry_id), exist_ok=True)
+            backups += [(os.path.join(folder, name), os.path.join(replica.history_folder, entry_id, name))
+                        for name in os.listdir(folder)]
+
+    copies = []
+    for obj_id in objects:
+        obj_type = obj_id.split("-")[0]
+        path = os.path.join(source.object_folders[obj_type], f"{obj_id}.json")
+        target = os.path.join(replica.object_folders[obj_type], f"{obj_id}.json")
+        if os.path.exists(path):
+            copies.append((path, target))
+        elif os.path.exists(target):
+            os.remove(target)
+            report.deleted += 1
+    for folder in replica.object_folders.values():
+        os.makedirs(folder, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        report.bytes = _copy_all(pool, copies) + _copy_all(pool, backups)
+    report.objects, report.backups = len(copies), len(backups)
+
+    if os.path.exists(source.puzzle_path) and not os.path.exists(replica.puzzle_path):
+        shutil.copy2(source.puzzle_path, replica.puzzle_path)
+    os.makedirs(replica.history_folder, exist_ok=True)
+    if lines:
+        _append_lines(replica, lines)
+        last = json.loads(lines[-1])
+        report.log_id = get_log_id_from_entry(last)
+        with open(replica.config_path, "w") as f:
+            json.dump(dict(zip("pse", last["current"]), l=report.log_id), f, indent=4)
+        IDManager._instances.pop(replica.root, None)
+    report.entries = len(lines)
+
+    _write_checkpoint(replica, {"source": source.root, "log_id": report.log_id,
+                                "hash": _line_hash(lines[-1]) if lines else None, "time": time.time()})
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _source_signature(source: Workspace) -> tuple:
+    """Changes whenever the source log does (hot segment or manifest)."""
+    signature = []
+    for path in (source.log_path, manifest_path(source)):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def print_report(report: type_ship_report) -> None:
+    if report.resynced:
+        print("Source was rewound past the replica: rebuilt the replica from scratch")
+    print(f"Shipped {report.entries} entries up to {report.log_id}: {report.objects} objects, "
+          f"{report.deleted} removed, {report.backups} backup files, {report.bytes} bytes in {report.seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ship new log entries of a workspace to a replica workspace")
+    parser.add_argument('--replica', type=str, required=True, metavar='DIR',
+                        help='Replica workspace root folder (created if missing)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep shipping as new entries arrive (Ctrl-C to stop)')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Poll interval in seconds for --follow (default: 1.0)')
+    parser.add_argument('--status', action='store_true',
+                        help='Show how far behind the replica is')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f'Threads copying files (default: {WORKERS})')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+    source, replica = get_workspace(), get_workspace(args.replica)
+
+    if args.status:
+        checkpoint = read_checkpoint(replica)
+        source_log_id, _, source_count = log_tail(source)
+        replica_log_id, _, replica_count = log_tail(replica)
+        print(f"Source  {source.root}: {source_log_id} ({source_count} entries)")
+        print(f"Replica {replica.root}: {replica_log_id} ({replica_count} entries)")
+        if checkpoint is None:
+            print("Not replicated yet.")
+        else:
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(checkpoint['time']))
+            print(f"{max(source_count - replica_count, 0)} entries behind, last pass {when}")
+        sys.exit(0)
+
+    try:
+        if not args.follow:
+            print_report(ship(source, replica, args.workers))
+            sys.exit(0)
+        print(f"=== Shipping {source.root} -> {replica.root} every {args.interval}s (Ctrl-C to stop) ===")
+        signature = None
+        while True:
+            current = _source_signature(source)
+            if current != signature:
+                report = ship(source, replica, args.workers)
+                if report.entries or report.resynced:
+                    print_report(report)
+                signature = current
+            time.sleep(args.interval)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
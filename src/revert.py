@@ -0,0 +1,231 @@
+"""Undo one log entry with a new commit.
+
+Unlike rewind.py, nothing after the entry is dropped. The inverse of the
+entry is computed from its backups and applied through handle_changes()
+as a new log entry:
+- objects it created are deleted (the deletion keeps a backup, so the
+  revert can itself be reverted or rewound),
+- objects it deleted are created again from their backups,
+- objects it modified get back the fields it changed; fields changed only
+  by later entries are kept. A list the entry appended to loses just the
+  appended items, even if later entries appended more.
+
+A later entry that changed the same field again, modified or deleted an
+object the revert would delete, or refers to such an object is a conflict.
+Conflicts stop the revert unless --force is given, in which case the
+entry's earlier version wins.
+
+Usage:
+    python src/revert.py l-007 [--dry-run] [--force] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict
+
+from cus_types_main import type_object_change, type_revert_plan
+from fsck import object_references
+from replay import HistoryReader, object_updates
+from utils import add_workspace_argument, get_log_id_from_entry, get_workspace, handle_changes, set_workspace
+
+
+# Marks a key absent from one version of a dict
+_MISSING = object()
+
+
+def revert_value(before, after, current) -> tuple[object, bool]:
+    """Value of a field once an entry's change (before -> after) is taken out of current.
+
+    Args:
+        before: Value before the entry (_MISSING if absent)
+        after: Value the entry wrote (_MISSING if absent)
+        current: Value now (_MISSING if absent)
+
+    Returns:
+        Tuple of (reverted value, conflict); on a conflict the value is before
+    """
+    if current == after:
+        return before, False
+    if isinstance(before, dict) and isinstance(after, dict) and isinstance(current, dict):
+        merged, conflict = dict(current), False
+        for key in set(before) | set(after):
+            b, a = before.get(key, _MISSING), after.get(key, _MISSING)
+            if b == a:
+                continue
+            value, clash = revert_value(b, a, current.get(key, _MISSING))
+            conflict |= clash
+            if value is _MISSING:
+                merged.pop(key, None)
+            else:
+                merged[key] = value
+        return merged, conflict
+    if (isinstance(before, list) and isinstance(after, list) and isinstance(current, list)
+            and after[:len(before)] == before and current[:len(after)] == after):
+        # The entry appended and later entries appended more: drop only the entry's items
+        return before + current[len(after):], False
+    return before, True
+
+
+def _load_current(obj_id: str) -> dict | None:
+    workspace = get_workspace()
+    path = os.path.join(workspace.object_folders[obj_id.split("-")[0]], f"{obj_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def plan_revert(log_id: str) -> type_revert_plan:
+    """Compute the inverse of one log entry of the current workspace.
+
+    Raises:
+        ValueError: If log_id is not in log.jsonl
+    """
+    reader = HistoryReader(get_workspace())
+    position = next((i for i, e in enumerate(reader.entries) if get_log_id_from_entry(e) == log_id), None)
+    if position is None:
+        raise ValueError(f"Log ID '{log_id}' not found in log.jsonl")
+    body = reader.entries[position][log_id]
+
+    # Later entries touching each object, in log order
+    later: dict[str, list[str]] = {}
+    for entry in reader.entries[position + 1:]:
+        later_id = get_log_id_from_entry(entry)
+        changes = entry[later_id]
+        for obj_id in changes.get("creation", []) + changes.get("modification", []) + changes.get("deletion", []):
+            later.setdefault(obj_id, []).append(later_id)
+
+    plan = type_revert_plan(log_id=log_id)
+    reverted: dict[str, dict] = {}  # obj_id -> version after the revert (modified objects)
+
+    for obj_id in body.get("modification", []):
+        before, after = reader.backup(log_id, obj_id), reader.version_after(obj_id, log_id)
+        current = _load_current(obj_id)
+        if before is None or after is None:
+            plan.conflicts.append(f"{obj_id}: a backup is missing, the change cannot be computed")
+            continue
+        if current is None:
+            if obj_id in later:
+                plan.conflicts.append(f"{obj_id}: deleted in {later[obj_id][-1]} (revert that entry first)")
+            else:
+                plan.conflicts.append(f"{obj_id}: its file is gone though no later entry deleted it (run fsck.py)")
+            continue
+        version, conflict = revert_value(before, after, current)
+        if conflict:
+            plan.conflicts.append(f"{obj_id}: the same fields were changed again in "
+                                  f"{', '.join(later.get(obj_id, ['no log entry']))}")
+        dropped = sorted(set(current) - set(version))
+        if dropped:
+            plan.notes.append(f"{obj_id}: fields {', '.join(dropped)} added by {log_id} are kept")
+        updates = object_updates(current, version)
+        if updates:
+            plan.updates.append((obj_id, updates))
+            reverted[obj_id] = version
+        else:
+            plan.notes.append(f"{obj_id}: already back to its earlier version")
+
+    for obj_id in body.get("creation", []):
+        if _load_current(obj_id) is None:
+            plan.notes.append(f"{obj_id}: already deleted")
+            continue
+        if obj_id in later:
+            plan.conflicts.append(f"{obj_id}: changed again in {', '.join(later[obj_id])}, the revert deletes it")
+        plan.deletes.append(obj_id)
+
+    for obj_id in body.get("deletion", []):
+        if _load_current(obj_id) is not None:
+            plan.notes.append(f"{obj_id}: exists again")
+            continue
+        data = reader.backup(log_id, obj_id)
+        if data is None:
+            plan.conflicts.append(f"{obj_id}: its backup in {log_id} is missing, it cannot be recreated")
+            continue
+        plan.recreates.append(data)
+
+    # Only objects changed by or after the entry can refer to the ones it created
+    deleting = set(plan.deletes)
+    for obj_id in sorted((set(later) | set(reverted)) - deleting):
+        obj = reverted.get(obj_id) or _load_current(obj_id)
+        for ref in sorted(set(object_references(obj))) if obj else []:
+            if ref in deleting:
+                plan.conflicts.append(f"{obj_id}: refers to {ref}, which the revert deletes")
+    return plan
+
+
+def apply_revert(plan: type_revert_plan, force: bool = False) -> str:
+    """Commit a revert plan as a new log entry.
+
+    Args:
+        plan: Plan from plan_revert()
+        force: Apply despite conflicts (the reverted entry's earlier version wins)
+
+    Returns:
+        The new log id ("" if there was nothing to undo)
+
+    Raises:
+        ValueError: If the plan has conflicts and force is False
+    """
+    if plan.conflicts and not force:
+        raise ValueError(f"Reverting {plan.log_id} conflicts with later changes: " + "; ".join(plan.conflicts))
+    tasks = [type_object_change(change_type="create", obj=data) for data in plan.recreates]
+    tasks += [type_object_change(change_type="update", obj={"id": obj_id}, updates=updates)
+              for obj_id, updates in plan.updates]
+    tasks += [type_object_change(change_type="delete", obj={"id": obj_id}) for obj_id in plan.deletes]
+    if not tasks:
+        return ""
+    log_id, _, _ = handle_changes(tasks)
+    return log_id
+
+
+def print_plan(plan: type_revert_plan) -> None:
+    print(f"Revert of {plan.log_id}:")
+    for obj_id, updates in plan.updates:
+        print(f"  restore  {obj_id}: {', '.join(updates)}")
+    for data in plan.recreates:
+        print(f"  recreate {data['id']}")
+    for obj_id in plan.deletes:
+        print(f"  delete   {obj_id}")
+    for note in plan.notes:
+        print(f"  [note] {note}")
+    for conflict in plan.conflicts:
+        print(f"  [conflict] {conflict}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Undo one log entry with a new commit (later entries are kept)")
+    parser.add_argument('log_id', type=str,
+                        help='Log entry to revert (e.g. l-007)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Show the plan without committing')
+    parser.add_argument('--force', action='store_true',
+                        help='Revert despite conflicts (the entry\'s earlier version wins)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the plan as JSON')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    try:
+        plan = plan_revert(args.log_id)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(asdict(plan), indent=2))
+    else:
+        print_plan(plan)
+    if args.dry_run:
+        sys.exit(0)
+    if plan.conflicts and not args.force:
+        print("Conflicts found; nothing committed (use --force to revert anyway).", file=sys.stderr)
+        sys.exit(1)
+
+    new_log_id = apply_revert(plan, force=args.force)
+    if new_log_id:
+        print(f"Committed {new_log_id} (revert of {plan.log_id})")
+    else:
+        print("Nothing to revert.")
@@ -1,10 +1,47 @@
+"""Rewind the store to a past log id.
+
+A rewind is planned first (plan_rewind: history index lookups that list
+the objects to delete and restore and the log ids to drop, with the bytes
+involved), so --dry-run can show it without touching anything. It
+then runs in phases:
+    delete   objects that did not exist at the target
+    restore  objects changed after the target, from their backups
+    log      drop the log entries after the target (log_store.truncate)
+    cleanup  move the dropped backup folders to the redo stack (redo.py)
+    config   reset config.json to the target's counters
+File operations within a phase run on a thread pool. The plan and the
+current phase are kept in a journal (contents/rewind_journal.json) until
+the last phase is done; every phase can be repeated safely, so an
+interrupted rewind is finished with --resume (or fsck.py --repair).
+
+Usage (set targeted_log_id in the main block first):
+    python src/rewind.py [--dry-run]
+    python src/rewind.py --resume
+"""
+import argparse
 import json
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 
-from utils import OBJECT_FOLDERS, HISTORY_FOLDER, CONFIG_PATH
+from cus_types_main import type_rewind_plan
+from history_index import HistoryIndex
+from log_store import truncate
+from redo import finish_push, push_segment
+from utils import IDManager, Workspace, add_workspace_argument, get_workspace, set_workspace
 
-LOG_PATH = os.path.join(HISTORY_FOLDER, "log.jsonl")
+
+# Threads for the file operations of a phase; each thread takes CHUNK_SIZE files at a time
+WORKERS = 8
+CHUNK_SIZE = 256
+
+JOURNAL_NAME = "rewind_journal.json"
+PHASES = ["delete", "restore", "log", "cleanup", "config"]
+
+
+def journal_path() -> str:
+    return os.path.join(get_workspace().contents, JOURNAL_NAME)
 
 
 def validate_log_id(log_id: str | None) -> bool:
@@ -26,12 +63,101 @@ def validate_log_id(log_id: str | None) -> bool:
     if log_id == "l-000":
         return True
 
-    with open(LOG_PATH, "r") as f:
-        for line in f:
-            entry = json.loads(line.strip())
-            if log_id in entry:
-                return True
-    return False
+    index = HistoryIndex()
+    try:
+        index.ensure_current()
+        return index.seq_of(log_id) is not None
+    finally:
+        index.close()
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _folder_size(folder: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(folder):
+        total += sum(_size(os.path.join(dirpath, name)) for name in filenames)
+    return total
+
+
+def plan_rewind(log_id: str) -> type_rewind_plan:
+    """Plan a rewind to log_id without changing anything.
+
+    Answered from the history index (history_index.py), without reading the log:
+    1. Find targeted_log_id, take its "current" counters for config update
+    2. Track objects whose first change after targeted_log_id is a creation (to delete)
+    3. Track objects whose first change after targeted_log_id is a modification
+       or deletion (to restore from that entry's backup)
+    4. Track log_ids after targeted_log_id (for backup folder cleanup)
+    "l-000" deletes every object file and drops every entry and backup folder.
+    """
+    workspace = get_workspace()
+    plan = type_rewind_plan(target=log_id, current=["p-000", "s-000", "e-000"])
+    found_target = log_id == "l-000"
+    already_tracked = set()  # Objects whose first change after target is known (skip later ones)
+    log_bytes = 0
+
+    index = HistoryIndex()
+    try:
+        index.ensure_current()
+        start = index.seq_of(log_id)
+        if start is not None:
+            plan.current = index.current_at(log_id) or plan.current
+            entries = index.entries_after(start)
+            plan.cleanup = [entry_log_id for entry_log_id, _ in entries]
+            log_bytes = sum(size for _, size in entries)
+            for obj_id, change_log_id, kind in index.changes_between(start):
+                if obj_id in already_tracked:
+                    continue
+                already_tracked.add(obj_id)
+                if kind == "creation":
+                    plan.deletes.append(obj_id)
+                else:
+                    plan.restores[obj_id] = change_log_id
+    finally:
+        index.close()
+
+    if log_id == "l-000":
+        # Full reset: every object file goes, logged or not
+        plan.restores = {}
+        plan.deletes = [name[:-5] for folder in workspace.object_folders.values() if os.path.isdir(folder)
+                        for name in sorted(os.listdir(folder)) if name.endswith(".json")]
+        if os.path.isdir(workspace.history_folder):
+            plan.cleanup = sorted(set(plan.cleanup) | {
+                name for name in os.listdir(workspace.history_folder)
+                if os.path.isdir(os.path.join(workspace.history_folder, name))})
+
+    plan.bytes = {
+        "delete": sum(_size(_object_path(obj_id)) for obj_id in plan.deletes),
+        "restore": sum(_size(_backup_path(log, obj_id)) for obj_id, log in plan.restores.items()),
+        "cleanup": sum(_folder_size(os.path.join(workspace.history_folder, log)) for log in plan.cleanup),
+        "log": log_bytes,
+    }
+    return plan
+
+
+# Pool threads do not see use_workspace(): resolve the workspace before handing work to them
+def _object_path(obj_id: str, workspace: Workspace | None = None) -> str:
+    workspace = workspace or get_workspace()
+    return os.path.join(workspace.object_folders[obj_id.split("-")[0]], f"{obj_id}.json")
+
+
+def _backup_path(log_id: str, obj_id: str, workspace: Workspace | None = None) -> str:
+    return os.path.join((workspace or get_workspace()).history_folder, log_id, f"{obj_id}.json")
+
+
+def _run_chunked(pool: ThreadPoolExecutor, operation, items: list) -> int:
+    """Apply operation to every item on the pool, in chunks; returns how many returned True."""
+    def run(chunk: list) -> int:
+        return sum(1 for item in chunk if operation(item))
+
+    chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+    return sum(pool.map(run, chunks))
 
 
 def update_config(current: list[str], log_id: str) -> None:
@@ -47,27 +173,32 @@ def update_config(current: list[str], log_id: str) -> None:
         "e": current[2],
         "l": log_id
     }
-    with open(CONFIG_PATH, "w") as f:
+    workspace = get_workspace()
+    with open(workspace.config_path, "w") as f:
         json.dump(config, f, indent=4)
-    print(f"  Updated config.json")
+    # Drop the cached ids so later commits in this process read the new config
+    IDManager._instances.pop(workspace.root, None)
 
 
-def delete_objects(obj_ids: list[str]) -> None:
-    """Delete object files created after target.
+def delete_objects(obj_ids: list[str], pool: ThreadPoolExecutor) -> int:
+    """Delete object files that did not exist at the target (missing files are skipped).
 
-    Args:
-        obj_ids: List of object IDs to delete
+    Returns:
+        Number of files deleted
     """
-    for obj_id in obj_ids:
-        obj_type = obj_id.split("-")[0]
-        if obj_type in OBJECT_FOLDERS:
-            file_path = os.path.join(OBJECT_FOLDERS[obj_type], f"{obj_id}.json")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"  Deleted: {obj_id}")
+    workspace = get_workspace()
+
+    def delete(obj_id: str) -> bool:
+        try:
+            os.remove(_object_path(obj_id, workspace))
+            return True
+        except FileNotFoundError:
+            return False
+
+    return _run_chunked(pool, delete, obj_ids)
 
 
-def restore_objects(restore_map: dict[str, str]) -> None:
+def restore_objects(restore_map: dict[str, str], pool: ThreadPoolExecutor) -> int:
     """Restore objects to their state at target log_id.
 
     Args:
@@ -75,44 +206,71 @@ def restore_objects(restore_map: dict[str, str]) -> None:
                      The backup folder contents/history/{log_id}/ contains
                      the old version BEFORE the modification at that log_id,
                      which is the state at target_log_id.
+
+    Returns:
+        Number of files restored
     """
-    for obj_id, backup_log_id in restore_map.items():
-        obj_type = obj_id.split("-")[0]
-        if obj_type in OBJECT_FOLDERS:
-            backup_path = os.path.join(HISTORY_FOLDER, backup_log_id, f"{obj_id}.json")
-            target_path = os.path.join(OBJECT_FOLDERS[obj_type], f"{obj_id}.json")
+    workspace = get_workspace()
+
+    def restore(item: tuple[str, str]) -> bool:
+        obj_id, backup_log_id = item
+        backup_path = _backup_path(backup_log_id, obj_id, workspace)
+        if not os.path.exists(backup_path):
+            return False
+        target_path = _object_path(obj_id, workspace)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Copy aside and swap: the old file may be hard-linked from the redo stack
+        shutil.copy2(backup_path, target_path + ".tmp")
+        os.replace(target_path + ".tmp", target_path)
+        return True
+
+    return _run_chunked(pool, restore, list(restore_map.items()))
+
 
-            if os.path.exists(backup_path):
-                shutil.copy2(backup_path, target_path)
-                print(f"  Restored: {obj_id} from {backup_log_id}")
+def truncate_log(target_log_id: str) -> None:
+    """Keep the log, and the history index, up to and including target_log_id ("l-000": empty)."""
+    truncate(target_log_id)
+    index = HistoryIndex()
+    try:
+        index.truncate(target_log_id)
+    finally:
+        index.close()
 
 
-def cleanup_history(target_log_id: str, logs_to_remove: list[str]) -> None:
-    """Remove log entries after target and delete backup folders.
+def cleanup_history(logs_to_remove: list[str], pool: ThreadPoolExecutor, redo_folder: str | None = None) -> int:
+    """Remove the backup folders of dropped log entries.
 
     Args:
-        target_log_id: The target log ID (keep this and earlier)
-        logs_to_remove: List of log IDs to remove
+        logs_to_remove: Dropped log IDs
+        pool: Thread pool for the file operations
+        redo_folder: Redo segment (see redo.py) to move the backup folders into instead of deleting them
+
+    Returns:
+        Number of folders moved or deleted
     """
-    # Truncate log.jsonl: keep only lines up to and including target
-    lines_to_keep = []
-    with open(LOG_PATH, "r") as f:
-        for line in f:
-            lines_to_keep.append(line)
-            entry = json.loads(line.strip())
-            if target_log_id in entry:
-                break
-
-    with open(LOG_PATH, "w") as f:
-        f.writelines(lines_to_keep)
-    print(f"  Truncated log.jsonl (kept up to {target_log_id})")
-
-    # Delete backup folders
-    for log_id in logs_to_remove:
-        folder_path = os.path.join(HISTORY_FOLDER, log_id)
-        if os.path.exists(folder_path):
+    history_folder = get_workspace().history_folder
+
+    def remove(log_id: str) -> bool:
+        folder_path = os.path.join(history_folder, log_id)
+        if not os.path.exists(folder_path):
+            return False
+        if redo_folder:
+            shutil.move(folder_path, os.path.join(redo_folder, "history", log_id))
+        else:
             shutil.rmtree(folder_path)
-            print(f"  Deleted backup folder: {log_id}")
+        return True
+
+    return _run_chunked(pool, remove, logs_to_remove)
+
+
+def print_plan(plan: type_rewind_plan) -> None:
+    b = plan.bytes
+    print(f"Rewind plan to {plan.target}:")
+    print(f"  delete   {len(plan.deletes):>6} objects ({b.get('delete', 0)} bytes)")
+    print(f"  restore  {len(plan.restores):>6} objects ({b.get('restore', 0)} bytes from backups)")
+    print(f"  drop     {len(plan.cleanup):>6} log entries ({b.get('log', 0)} bytes of log, "
+          f"{b.get('cleanup', 0)} bytes of backups)")
+    print(f"  config   -> {', '.join(plan.current)}, {plan.target}")
 
 
 # ============================================================================
@@ -154,117 +312,119 @@ def confirm_rewind(log_id: str) -> bool:
 # ============================================================================
 
 
-def reset_to_initial() -> None:
+def _write_journal(journal: dict) -> None:
+    temp_path = journal_path() + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(journal, f)  # Compact: rewritten after every phase, and can list many ids
+    os.replace(temp_path, journal_path())
+
+
+def read_journal() -> dict | None:
+    """Journal of an unfinished rewind, or None."""
+    if not os.path.exists(journal_path()):
+        return None
+    with open(journal_path(), "r") as f:
+        return json.load(f)
+
+
+def execute_plan(plan: type_rewind_plan, redo_folder: str | None = None, workers: int = WORKERS,
+                 journal: dict | None = None) -> None:
+    """Carry out a rewind plan, phase by phase, under the journal.
+
+    Args:
+        plan: Plan from plan_rewind()
+        redo_folder: Redo segment from redo.push_segment() (backup folders are moved there)
+        workers: Threads for file operations
+        journal: Journal of an interrupted run to resume (None: start a new one)
+    """
+    journal = journal or {"plan": asdict(plan), "redo_folder": redo_folder, "phase": 0}
+    _write_journal(journal)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index in range(journal["phase"], len(PHASES)):
+            phase = PHASES[index]
+            if phase == "delete":
+                count = delete_objects(plan.deletes, pool)
+                print(f"  [{phase}] {count} objects deleted")
+            elif phase == "restore":
+                count = restore_objects(plan.restores, pool)
+                print(f"  [{phase}] {count} objects restored")
+            elif phase == "log":
+                truncate_log(plan.target)
+                print(f"  [{phase}] log truncated after {plan.target}")
+            elif phase == "cleanup":
+                count = cleanup_history(plan.cleanup, pool, redo_folder)
+                print(f"  [{phase}] {count} backup folders {'moved to the redo stack' if redo_folder else 'deleted'}")
+            else:
+                update_config(plan.current, plan.target)
+                print(f"  [{phase}] config.json reset")
+            journal["phase"] = index + 1
+            _write_journal(journal)
+
+    if redo_folder:
+        finish_push(redo_folder)
+    os.remove(journal_path())
+
+
+def resume_rewind(workers: int = WORKERS) -> str | None:
+    """Finish an interrupted rewind.
+
+    Returns:
+        The rewind's target log id, or None if no rewind was pending
+    """
+    journal = read_journal()
+    if journal is None:
+        return None
+    plan = type_rewind_plan(**journal["plan"])
+    print(f"Resuming the rewind to {plan.target} at phase '{PHASES[min(journal['phase'], len(PHASES) - 1)]}'...")
+    execute_plan(plan, journal.get("redo_folder"), workers, journal)
+    return plan.target
+
+
+def reset_to_initial(redo_folder: str | None = None) -> None:
     """Reset the system to initial state (l-000).
 
     This is a special case that:
     1. Deletes ALL objects in problem, statement, experience folders
-    2. Clears log.jsonl (empty file)
-    3. Deletes ALL backup folders in history
+    2. Clears the log (empty log.jsonl, no cold segments)
+    3. Deletes ALL backup folders in history (or moves them into redo_folder)
     4. Resets config.json to initial state (all IDs to "-000")
     """
-    print("\n[1/4] Resetting config.json to initial state...")
-    config = {
-        "p": "p-000",
-        "s": "s-000",
-        "e": "e-000",
-        "l": "l-000"
-    }
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config, f, indent=4)
-    print("  Reset config.json")
-
-    print("\n[2/4] Deleting all objects...")
-    for folder in OBJECT_FOLDERS.values():
-        if os.path.exists(folder):
-            for filename in os.listdir(folder):
-                if filename.endswith(".json"):
-                    file_path = os.path.join(folder, filename)
-                    os.remove(file_path)
-                    print(f"  Deleted: {filename}")
-
-    print("\n[3/4] Clearing log.jsonl...")
-    with open(LOG_PATH, "w") as f:
-        pass  # Empty the file
-    print("  Cleared log.jsonl")
-
-    print("\n[4/4] Deleting all backup folders...")
-    if os.path.exists(HISTORY_FOLDER):
-        for item in os.listdir(HISTORY_FOLDER):
-            item_path = os.path.join(HISTORY_FOLDER, item)
-            if os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-                print(f"  Deleted backup folder: {item}")
-
-
-def rewind_to(log_id: str) -> None:
-    """Rewind the system state to the specified log_id.
-
-    Process (single traversal of log.jsonl):
-    1. Find targeted_log_id line, extract "current" for config update
-    2. Track all objects created after targeted_log_id (to delete)
-    3. Track first modification of each object after targeted_log_id (to restore)
-    4. Track log_ids after targeted_log_id (for backup folder cleanup)
-    """
-    # State variables during traversal
-    found_target = False
-    target_current = None  # [p-XXX, s-XXX, e-XXX] from target line
-    objects_to_delete = []  # Objects created after target
-    objects_to_restore = {}  # {obj_id: first_log_id_after_target_that_modified_it}
-    already_tracked = set()  # Objects already tracked for restore (skip duplicates)
-    logs_to_cleanup = []  # Log IDs after target (for backup folder deletion)
-
-    with open(LOG_PATH, "r") as f:
-        for line in f:
-            entry = json.loads(line.strip())
-
-            # Extract log_id (first key that starts with "l-")
-            current_log_id = None
-            for key in entry:
-                if key.startswith("l-"):
-                    current_log_id = key
-                    break
-
-            if not found_target:
-                if current_log_id == log_id:
-                    found_target = True
-                    target_current = entry["current"]
-            else:
-                # After target: collect cleanup info
-                logs_to_cleanup.append(current_log_id)
-
-                # Track objects created after target (to delete)
-                created = entry[current_log_id].get("creation", [])
-                objects_to_delete.extend(created)
-
-                # Track first modification of objects after target (to restore)
-                modified = entry[current_log_id].get("modification", [])
-                for obj_id in modified:
-                    if obj_id not in already_tracked:
-                        objects_to_restore[obj_id] = current_log_id
-                        already_tracked.add(obj_id)
-
-    # Execute rewind operations
-    print("\n[1/4] Updating config.json...")
-    update_config(target_current, log_id)
-
-    print("\n[2/4] Deleting objects created after target...")
-    if objects_to_delete:
-        delete_objects(objects_to_delete)
-    else:
-        print("  No objects to delete")
+    execute_plan(plan_rewind("l-000"), redo_folder)
 
-    print("\n[3/4] Restoring modified objects...")
-    if objects_to_restore:
-        restore_objects(objects_to_restore)
-    else:
-        print("  No objects to restore")
 
-    print("\n[4/4] Cleaning up history...")
-    cleanup_history(log_id, logs_to_cleanup)
+def rewind_to(log_id: str, redo_folder: str | None = None) -> None:
+    """Rewind the system state to the specified log_id (see plan_rewind).
+
+    Args:
+        log_id: Target log id
+        redo_folder: Redo segment from redo.push_segment() (backup folders are moved there)
+    """
+    execute_plan(plan_rewind(log_id), redo_folder)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewind the workspace to a log id (set targeted_log_id below)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Show the plan (counts and bytes) without changing anything')
+    parser.add_argument('--resume', action='store_true',
+                        help='Finish an interrupted rewind')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f'Threads for file operations (default: {WORKERS})')
+    add_workspace_argument(parser)
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    pending = read_journal()
+    if args.resume:
+        target = resume_rewind(args.workers)
+        print(f"\nRewind to {target} complete." if target else "No interrupted rewind to resume.")
+        exit(0)
+    if pending is not None:
+        print(f"Error: the rewind to {pending['plan']['target']} was interrupted; finish it with --resume first.")
+        exit(1)
+
     # =========================================================
     # USER: Set the target log ID here before running
     # =========================================================
@@ -277,15 +437,20 @@ if __name__ == "__main__":
             print(f"Error: Log ID '{targeted_log_id}' not found in log.jsonl")
         exit(1)
 
+    plan = plan_rewind(targeted_log_id)
+    print_plan(plan)
+    if args.dry_run:
+        exit(0)
+
     # Safety confirmation
     if not confirm_rewind(targeted_log_id):
         print("Rewind cancelled.")
         exit(0)
 
-    # Execute rewind
+    # Execute rewind, keeping the dropped entries on the redo stack
     print(f"\nRewinding to {targeted_log_id}...")
-    if targeted_log_id == "l-000":
-        reset_to_initial()
-    else:
-        rewind_to(targeted_log_id)
+    redo_folder = push_segment(targeted_log_id)
+    execute_plan(plan, redo_folder, args.workers)
     print("\nRewind complete.")
+    if redo_folder:
+        print("The rewound entries are on the redo stack: run src/redo.py to re-apply them.")
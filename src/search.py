@@ -0,0 +1,233 @@
+"""Full-text search over statements.
+
+Keeps an inverted index (SQLite, contents/index/search.db) over each
+statement's conclusion, hypothesis and proof.full, ranked with BM25.
+
+The index is maintained incrementally: when it is read, the statements
+touched by the commits since its last read are re-indexed (see
+index_store.py). If the event spool cannot account for those commits (e.g.
+after a rewind), it is rebuilt from the statement files.
+
+Usage:
+    python src/search.py "Alice knave" --status true --type proposition
+"""
+import argparse
+import math
+import re
+
+from index_store import StatementIndex
+from utils import add_workspace_argument, set_workspace
+
+# Term-frequency multiplier per indexed field
+FIELD_WEIGHTS = {
+    "conclusion": 2,
+    "hypothesis": 1,
+    "proof.full": 1,
+}
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "be", "by", "for", "if", "in", "is",
+    "it", "of", "on", "or", "that", "the", "then", "this", "to", "we",
+}
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS docs (
+    id TEXT PRIMARY KEY, status TEXT, type TEXT, length INTEGER, conclusion TEXT
+);
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT, id TEXT, tf INTEGER, PRIMARY KEY (term, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_id ON postings (id);
+"""
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords."""
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def statement_terms(statement: dict) -> dict[str, int]:
+    """Weighted term frequencies for a statement.
+
+    Args:
+        statement: Statement object
+
+    Returns:
+        {term: weighted_tf}
+    """
+    texts = {
+        "conclusion": " ".join(statement.get("conclusion", [])),
+        "hypothesis": " ".join(statement.get("hypothesis", [])),
+        "proof.full": statement.get("proof", {}).get("full", ""),
+    }
+    tf = {}
+    for field_name, text in texts.items():
+        weight = FIELD_WEIGHTS[field_name]
+        for term in tokenize(text):
+            tf[term] = tf.get(term, 0) + weight
+    return tf
+
+
+class SearchIndex(StatementIndex):
+    """BM25 inverted index over statements."""
+    DB_NAME = "search.db"
+    SCHEMA = SEARCH_SCHEMA
+    TABLES = ("docs", "terms", "postings")
+
+    def _remove(self, statement_id: str) -> None:
+        row = self.conn.execute("SELECT length FROM docs WHERE id = ?", (statement_id,)).fetchone()
+        if row is None:
+            return
+        terms = [r[0] for r in self.conn.execute("SELECT term FROM postings WHERE id = ?", (statement_id,))]
+        self.conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", [(t,) for t in terms])
+        self.conn.execute("DELETE FROM postings WHERE id = ?", (statement_id,))
+        self.conn.execute("DELETE FROM docs WHERE id = ?", (statement_id,))
+        self._set_meta("doc_count", int(self._get_meta("doc_count", "0")) - 1)
+        self._set_meta("total_length", int(self._get_meta("total_length", "0")) - row[0])
+
+    def _upsert(self, statement: dict) -> None:
+        statement_id = statement["id"]
+        self._remove(statement_id)
+
+        tf = statement_terms(statement)
+        length = sum(tf.values())
+        self.conn.execute(
+            "INSERT INTO docs (id, status, type, length, conclusion) VALUES (?, ?, ?, ?, ?)",
+            (statement_id, statement.get("status"), statement.get("type"), length,
+             " ".join(statement.get("conclusion", [])))
+        )
+        self.conn.executemany("INSERT OR IGNORE INTO terms (term, df) VALUES (?, 0)", [(t,) for t in tf])
+        self.conn.executemany("UPDATE terms SET df = df + 1 WHERE term = ?", [(t,) for t in tf])
+        self.conn.executemany(
+            "INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)",
+            [(t, statement_id, n) for t, n in tf.items()]
+        )
+        self._set_meta("doc_count", int(self._get_meta("doc_count", "0")) + 1)
+        self._set_meta("total_length", int(self._get_meta("total_length", "0")) + length)
+
+    def search(
+        self,
+        query: str,
+        status: list[str] | None = None,
+        type: list[str] | None = None,
+        limit: int = 10
+    ) -> list[dict]:
+        """Rank statements against a query with BM25.
+
+        Args:
+            query: Free-text query
+            status: Only return statements with one of these statuses
+            type: Only return statements with one of these types
+            limit: Maximum number of results
+
+        Returns:
+            List of {"id", "status", "type", "conclusion", "score"}, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        doc_count = int(self._get_meta("doc_count", "0"))
+        if doc_count == 0:
+            return []
+        avg_length = int(self._get_meta("total_length", "0")) / doc_count
+
+        filters = ""
+        filter_params = []
+        if status:
+            filters += f" AND d.status IN ({','.join('?' * len(status))})"
+            filter_params.extend(status)
+        if type:
+            filters += f" AND d.type IN ({','.join('?' * len(type))})"
+            filter_params.extend(type)
+
+        # idf per query term (df counts all documents, independent of filters)
+        weighted_terms = []
+        for term in terms:
+            row = self.conn.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+            if row is None or row[0] == 0:
+                continue
+            df = row[0]
+            weighted_terms.append((term, math.log(1 + (doc_count - df + 0.5) / (df + 0.5))))
+        if not weighted_terms:
+            return []
+
+        # Score inside SQLite so postings never round-trip through Python
+        values = ",".join("(?, ?)" for _ in weighted_terms)
+        params = [x for pair in weighted_terms for x in pair]
+        sql = (
+            f"WITH q(term, idf) AS (VALUES {values}) "
+            "SELECT d.id, d.status, d.type, d.conclusion, "
+            "SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * d.length / ?))) AS score "
+            "FROM q JOIN postings p ON p.term = q.term JOIN docs d ON d.id = p.id "
+            "WHERE 1 = 1" + filters +
+            " GROUP BY d.id ORDER BY score DESC, d.id LIMIT ?"
+        )
+        params += [BM25_K1, BM25_K1, BM25_B, BM25_B, avg_length] + filter_params + [limit]
+
+        results = []
+        for statement_id, status_, type_, conclusion, score in self.conn.execute(sql, params):
+            results.append({
+                "id": statement_id,
+                "status": status_,
+                "type": type_,
+                "conclusion": conclusion,
+                "score": score,
+            })
+        return results
+
+
+def search(
+    query: str,
+    status: list[str] | None = None,
+    type: list[str] | None = None,
+    limit: int = 10
+) -> list[dict]:
+    """Search statements (see SearchIndex.search)."""
+    index = SearchIndex()
+    try:
+        index.ensure_current()
+        return index.search(query, status=status, type=type, limit=limit)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search statements by conclusion, hypothesis and proof")
+    parser.add_argument('query', nargs='*', type=str,
+                        help='Search terms')
+    parser.add_argument('--status', nargs='+', type=str,
+                        help='Only statements with one of these statuses (e.g. true)')
+    parser.add_argument('--type', nargs='+', type=str,
+                        help='Only statements with one of these types')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='Maximum number of results (default: 10)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Rebuild the index from the statement files')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.rebuild:
+        index = SearchIndex()
+        count = index.rebuild()
+        index.close()
+        print(f"Rebuilt search index: {count} statements")
+
+    if args.query:
+        results = search(" ".join(args.query), status=args.status, type=args.type, limit=args.limit)
+        if not results:
+            print("(no match)")
+        for r in results:
+            print(f"[{r['id']}] ({r['status']}, {r['type']}) score={r['score']:.2f}")
+            print(f"    {r['conclusion']}")
+    elif not args.rebuild:
+        parser.error("a query or --rebuild is required")
@@ -0,0 +1,365 @@
+"""Knights/Knaves/Spy solver for puzzle.md.
+
+Takes the parsed puzzle (puzzle_parser.py) as role constraints, then
+enumerates all 3^n role assignments with NumPy:
+- Knight: the statement is true
+- Knave: the statement is false
+- Spy: no constraint
+- Game-manager hints are always true
+
+Worlds are enumerated in blocks of 3^BLOCK_DIGITS assignments. Inside a
+block the roles of the first BLOCK_DIGITS players come from a precomputed
+digit table and the remaining players are constants, so every constraint is
+evaluated for the whole block at once (and constraints on constant players
+reduce to scalars that can skip a block entirely). Puzzles with at most
+BLOCK_DIGITS players are a single batch.
+
+Larger puzzles go to the SAT engine (solver_sat.py); solve() picks the
+engine automatically and --bench compares both on planted random puzzles.
+
+Usage:
+    python src/solver.py [path/to/puzzle.md] [--engine auto|enumeration|sat]
+    python src/solver.py --bench 8 12 20 40
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from cus_types_main import type_claim, type_expr, type_puzzle, type_solve_result
+from puzzle_parser import ParseError, compile_puzzle
+from utils import add_workspace_argument, set_workspace
+
+
+ROLES = ["knight", "knave", "spy"]
+KNIGHT, KNAVE, SPY = 0, 1, 2
+
+# Players whose roles come from the digit table inside one block
+BLOCK_DIGITS = 12
+
+# "auto" engine: enumeration up to this many players, SAT above
+ENUMERATION_MAX_PLAYERS = 15
+
+ENGINES = ["auto", "enumeration", "sat"]
+
+# --bench stops SAT after this many solutions where enumeration is skipped
+# (every solution is enumerated where both engines run, to compare them)
+BENCH_SAT_ONLY_MAX_SOLUTIONS = 2
+
+
+# ============================================================================
+# Vectorized evaluation
+# ============================================================================
+def evaluate(expr: type_expr, column) -> np.ndarray:
+    """Evaluate an expression over a batch of worlds.
+
+    Args:
+        expr: Expression to evaluate
+        column: Callable player_name -> role codes (array or scalar)
+
+    Returns:
+        Boolean array (or NumPy bool scalar) of the expression's truth value
+    """
+    op = expr.op
+    if op == "role":
+        return column(expr.players[0]) == ROLES.index(expr.role)
+    if op == "not":
+        return np.logical_not(evaluate(expr.args[0], column))
+    if op == "and":
+        result = evaluate(expr.args[0], column)
+        for arg in expr.args[1:]:
+            result = np.logical_and(result, evaluate(arg, column))
+        return result
+    if op == "or":
+        result = evaluate(expr.args[0], column)
+        for arg in expr.args[1:]:
+            result = np.logical_or(result, evaluate(arg, column))
+        return result
+    if op == "implies":
+        return np.logical_or(np.logical_not(evaluate(expr.args[0], column)), evaluate(expr.args[1], column))
+    if op == "iff":
+        return evaluate(expr.args[0], column) == evaluate(expr.args[1], column)
+    if op == "same":
+        first = column(expr.players[0])
+        result = np.bool_(True)
+        for player in expr.players[1:]:
+            result = np.logical_and(result, column(player) == first)
+        return result
+    if op == "count":
+        code = ROLES.index(expr.role)
+        total = np.int16(0)
+        for player in expr.players:
+            total = total + (column(player) == code)
+        if expr.cmp == "==":
+            return total == expr.k
+        if expr.cmp == ">=":
+            return total >= expr.k
+        if expr.cmp == "<=":
+            return total <= expr.k
+        raise ValueError(f"Invalid count comparison '{expr.cmp}'")
+    raise ValueError(f"Invalid expression op '{op}'")
+
+
+def claim_constraint(claim: type_claim, column) -> np.ndarray:
+    """Consistency of a claim with the speaker's role.
+
+    Knights tell the truth, knaves lie, spies are unconstrained; the game
+    manager ("" speaker) always tells the truth.
+    """
+    truth = evaluate(claim.expr, column)
+    if not claim.speaker:
+        return truth
+    role = column(claim.speaker)
+    return np.logical_or(
+        np.logical_or(np.logical_and(role == KNIGHT, truth),
+                      np.logical_and(role == KNAVE, np.logical_not(truth))),
+        role == SPY
+    )
+
+
+def _constraints(puzzle: type_puzzle) -> list[type_claim]:
+    unparsed = [c.text for c in puzzle.statements + puzzle.hints if c.expr is None]
+    if unparsed:
+        raise ParseError(f"Unsupported sentence(s): {unparsed}")
+    # Hints first: they are usually the strongest filters
+    return puzzle.hints + puzzle.statements
+
+
+def _digit_table(digits: int) -> np.ndarray:
+    """Role codes of the first `digits` players for worlds 0..3^digits-1."""
+    worlds = np.arange(3 ** digits, dtype=np.int64)
+    table = np.empty((digits, worlds.size), dtype=np.uint8)
+    for i in range(digits):
+        table[i] = (worlds // 3 ** i) % 3
+    return table
+
+
+def solve_enumeration(puzzle: type_puzzle, max_solutions: int | None = None) -> type_solve_result:
+    """Find consistent role assignments by vectorized enumeration.
+
+    Args:
+        puzzle: Parsed puzzle
+        max_solutions: Stop after this many solutions (None for all)
+
+    Returns:
+        type_solve_result with every consistent assignment found
+    """
+    start = time.perf_counter()
+    constraints = _constraints(puzzle)
+    players = puzzle.players
+    n = len(players)
+    position = {p: i for i, p in enumerate(players)}
+
+    low = min(n, BLOCK_DIGITS)
+    table = _digit_table(low)
+    solutions = []
+    complete = True
+
+    for block in range(3 ** (n - low)):
+        # Constant roles of the high players in this block
+        high = [np.uint8((block // 3 ** (i - low)) % 3) for i in range(low, n)]
+        survivors = None  # indices into the block; None means all worlds
+
+        def column(player: str, survivors_=None):
+            i = position[player]
+            if i >= low:
+                return high[i - low]
+            return table[i] if survivors_ is None else table[i][survivors_]
+
+        for claim in constraints:
+            ok = claim_constraint(claim, lambda p: column(p, survivors))
+            if np.ndim(ok) == 0:
+                if not ok:
+                    survivors = np.empty(0, dtype=np.int64)
+                    break
+                continue
+            survivors = np.nonzero(ok)[0] if survivors is None else survivors[ok]
+            if survivors.size == 0:
+                break
+
+        if survivors is None:
+            survivors = np.arange(table.shape[1], dtype=np.int64)
+
+        for local in survivors:
+            roles = [ROLES[table[i][local]] for i in range(low)] + [ROLES[h] for h in high]
+            solutions.append(dict(zip(players, roles)))
+            if max_solutions is not None and len(solutions) >= max_solutions:
+                complete = False
+                break
+        if not complete:
+            break
+
+    return type_solve_result(
+        solutions=solutions,
+        engine="enumeration",
+        elapsed=time.perf_counter() - start,
+        complete=complete
+    )
+
+
+def solve(puzzle: type_puzzle, max_solutions: int | None = None, engine: str = "auto") -> type_solve_result:
+    """Solve a puzzle.
+
+    Args:
+        puzzle: Parsed puzzle
+        max_solutions: Stop after this many solutions (None for all)
+        engine: "enumeration", "sat", or "auto" (enumeration for small puzzles)
+
+    Returns:
+        type_solve_result; result.engine names the engine actually used
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Invalid engine '{engine}'. Must be one of {ENGINES}")
+    if engine == "auto":
+        engine = "enumeration" if len(puzzle.players) <= ENUMERATION_MAX_PLAYERS else "sat"
+    if engine == "sat":
+        from solver_sat import solve_sat
+        return solve_sat(puzzle, max_solutions)
+    return solve_enumeration(puzzle, max_solutions)
+
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+def _role_atom(player: str, role: str) -> type_expr:
+    return type_expr(op="role", players=[player], role=role)
+
+
+def _truth(expr: type_expr, roles: dict[str, str]) -> bool:
+    return bool(evaluate(expr, lambda p: np.uint8(ROLES.index(roles[p]))))
+
+
+def planted_puzzle(n: int, seed: int = 0) -> type_puzzle:
+    """Random puzzle with n players that is consistent with a planted assignment.
+
+    Each player makes one statement about other players (a role claim, a
+    disjunction, or a count) whose truth value matches their planted role;
+    the game manager announces the number of spies. The puzzle may have
+    more than one solution.
+    """
+    rng = random.Random(seed)
+    players = [f"P{i}" for i in range(n)]
+    roles = {p: rng.choice(ROLES) for p in players}
+    puzzle = type_puzzle(players=players)
+
+    for speaker in players:
+        others = [p for p in players if p != speaker] or [speaker]
+        want = {"knight": True, "knave": False}.get(roles[speaker], rng.random() < 0.5)
+        while True:
+            form = rng.random()
+            if form < 0.5:
+                expr = _role_atom(rng.choice(others), rng.choice(ROLES))
+            elif form < 0.8:
+                a, b = rng.sample(others, 2) if len(others) > 1 else (others[0], others[0])
+                expr = type_expr(op="or", args=[_role_atom(a, rng.choice(ROLES)), _role_atom(b, rng.choice(ROLES))])
+            else:
+                group = rng.sample(others, min(len(others), 3))
+                expr = type_expr(op="count", players=group, role=rng.choice(ROLES),
+                                 cmp="==", k=rng.randint(0, len(group)))
+            if _truth(expr, roles) == want:
+                break
+        puzzle.statements.append(type_claim(speaker=speaker, text=str(expr), expr=expr))
+
+    spies = sum(1 for r in roles.values() if r == "spy")
+    puzzle.hints.append(type_claim(
+        speaker="", text=f"There are exactly {spies} spies.",
+        expr=type_expr(op="count", players=list(players), role="spy", cmp="==", k=spies)
+    ))
+    return puzzle
+
+
+def _satisfies(puzzle: type_puzzle, solution: dict[str, str]) -> bool:
+    """Whether a role assignment is consistent with every claim of the puzzle."""
+    column = lambda p: np.uint8(ROLES.index(solution[p]))
+    return all(bool(claim_constraint(claim, column)) for claim in _constraints(puzzle))
+
+
+def _uniqueness(result: type_solve_result) -> str | None:
+    """Uniqueness verdict ("none", "unique" or "multiple"); None if a capped result cannot tell."""
+    if len(result.solutions) >= 2:
+        return "multiple"
+    if result.complete:
+        return "unique" if result.solutions else "none"
+    return None
+
+
+def bench(sizes: list[int], seeds: int = 3, max_solutions: int | None = None) -> None:
+    """Compare the engines on planted puzzles and print one line per run.
+
+    Enumeration is skipped above ENUMERATION_MAX_PLAYERS players. Every
+    solution an engine returns is checked against the puzzle; when both
+    engines run, complete solution sets must be equal and capped ones must
+    agree on whether the solution is unique.
+
+    Args:
+        sizes: Numbers of players
+        seeds: Puzzles per size
+        max_solutions: Cap for every run; None for all solutions where both
+            engines run and BENCH_SAT_ONLY_MAX_SOLUTIONS above that
+    """
+    print(f"{'players':>7} {'seed':>4} {'engine':>11} {'solutions':>9} {'ms':>9}")
+    for n in sizes:
+        for seed in range(seeds):
+            puzzle = planted_puzzle(n, seed)
+            cap = max_solutions
+            if cap is None and n > ENUMERATION_MAX_PLAYERS:
+                cap = BENCH_SAT_ONLY_MAX_SOLUTIONS
+            results = []
+            for engine in ("enumeration", "sat"):
+                if engine == "enumeration" and n > ENUMERATION_MAX_PLAYERS:
+                    continue
+                result = solve(puzzle, cap, engine)
+                results.append(result)
+                count = f"{len(result.solutions)}{'' if result.complete else '+'}"
+                print(f"{n:>7} {seed:>4} {engine:>11} {count:>9} {result.elapsed * 1000:>9.1f}")
+                wrong = sum(1 for solution in result.solutions if not _satisfies(puzzle, solution))
+                if wrong:
+                    print(f"{engine} returned {wrong} inconsistent solution(s) for players={n} seed={seed}")
+            if len(results) < 2:
+                continue
+            if results[0].complete and results[1].complete:
+                found = [sorted(tuple(s.items()) for s in r.solutions) for r in results]
+                if found[0] != found[1]:
+                    print(f"Mismatch between engines for players={n} seed={seed}")
+            else:
+                verdicts = [_uniqueness(r) for r in results]
+                if None not in verdicts and verdicts[0] != verdicts[1]:
+                    print(f"Mismatch between engines for players={n} seed={seed}: "
+                          f"enumeration says {verdicts[0]}, sat says {verdicts[1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a Knights/Knaves/Spy puzzle")
+    parser.add_argument('puzzle', nargs='?', default=None,
+                        help='Path to the puzzle markdown (default: puzzle.md of the workspace)')
+    parser.add_argument('--max-solutions', type=int, default=None,
+                        help='Stop after this many solutions (also caps --bench runs; default: all)')
+    parser.add_argument('--engine', choices=ENGINES, default="auto",
+                        help='Solver engine (default: auto)')
+    parser.add_argument('--bench', nargs='+', type=int, metavar='PLAYERS',
+                        help='Benchmark the engines on planted puzzles of these sizes')
+    parser.add_argument('--seeds', type=int, default=3,
+                        help='Puzzles per size for --bench (default: 3)')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.bench:
+        bench(args.bench, args.seeds, args.max_solutions)
+        raise SystemExit(0)
+
+    puzzle = compile_puzzle(args.puzzle)
+    for claim in puzzle.statements + puzzle.hints:
+        if claim.expr is None:
+            who = claim.speaker or "game manager"
+            print(f"Cannot parse ({who}): {claim.text}")
+    result = solve(puzzle, args.max_solutions, args.engine)
+
+    print(f"Players: {', '.join(puzzle.players)}")
+    print(f"Solutions: {len(result.solutions)}{'' if result.complete else '+'} "
+          f"({result.engine}, {result.elapsed * 1000:.1f} ms)")
+    for solution in result.solutions:
+        print("  " + ", ".join(f"{p}: {r}" for p, r in solution.items()))
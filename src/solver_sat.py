@@ -0,0 +1,395 @@
+"""SAT backend for Knights/Knaves/Spy puzzles.
+
+Brute-force enumeration (solver.solve_enumeration) grows as 3^n. This
+engine encodes the puzzle as CNF and solves it with a small pure-Python
+CDCL core (two watched literals, first-UIP learning, activity-based
+decisions with phase saving, geometric restarts):
+- One boolean per (player, role) plus "exactly one role" clauses
+- Expressions are Tseitin-encoded; counts ("exactly one spy") use a
+  totalizer, whose unary outputs encode >=, <= and == in both directions
+- Knight: role -> claim, Knave: role -> not claim, Spy: unconstrained
+
+Every model found is blocked on the role variables before searching again,
+so max_solutions=2 proves (or refutes) uniqueness.
+"""
+import time
+
+from cus_types_main import type_expr, type_puzzle, type_solve_result
+from solver import ROLES, _constraints
+
+
+class CDCLSolver:
+    """Minimal CDCL SAT solver over DIMACS-style integer literals."""
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses: list[list[int]] = []
+        self.watches: dict[int, list[int]] = {}
+        self.value: list[int] = [0]  # per var: 0 unassigned, 1 true, -1 false
+        self.level: list[int] = [0]
+        self.reason: list[int] = [-1]
+        self.activity: list[float] = [0.0]
+        self.phase: list[int] = [-1]
+        self.trail: list[int] = []
+        self.trail_lim: list[int] = []
+        self.qhead = 0
+        self.unsat = False
+        self.bump = 1.0
+        self.conflicts = 0
+
+    # ------------------------------------------------------------------
+    def new_var(self) -> int:
+        self.num_vars += 1
+        self.value.append(0)
+        self.level.append(0)
+        self.reason.append(-1)
+        self.activity.append(0.0)
+        self.phase.append(-1)
+        self.watches[self.num_vars] = []
+        self.watches[-self.num_vars] = []
+        return self.num_vars
+
+    def _lit_value(self, lit: int) -> int:
+        v = self.value[abs(lit)]
+        return v if lit > 0 else -v
+
+    def _enqueue(self, lit: int, reason: int) -> None:
+        v = abs(lit)
+        self.value[v] = 1 if lit > 0 else -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def add_clause(self, lits: list[int]) -> None:
+        """Add a clause (backtracks to level 0 first)."""
+        if self.unsat:
+            return
+        self._backtrack(0)
+
+        clause = []
+        for lit in dict.fromkeys(lits):
+            if -lit in clause:
+                return  # Tautology
+            value = self._lit_value(lit)
+            if value == 1:
+                return  # Already satisfied at level 0
+            if value == 0:
+                clause.append(lit)
+
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self._enqueue(clause[0], -1)
+            if self._propagate() is not None:
+                self.unsat = True
+        else:
+            self._attach(clause)
+
+    def _attach(self, clause: list[int]) -> int:
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    # ------------------------------------------------------------------
+    def _propagate(self) -> int | None:
+        """Unit propagation. Returns a conflicting clause index or None."""
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watching = self.watches[false_lit]
+            kept = []
+            i = 0
+            while i < len(watching):
+                ci = watching[i]
+                i += 1
+                clause = self.clauses[ci]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self._lit_value(clause[0]) == 1:
+                    kept.append(ci)
+                    continue
+
+                for k in range(2, len(clause)):
+                    if self._lit_value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(ci)
+                        break
+                else:
+                    kept.append(ci)
+                    if self._lit_value(clause[0]) == -1:
+                        kept.extend(watching[i:])
+                        self.watches[false_lit] = kept
+                        return ci
+                    self._enqueue(clause[0], ci)
+            self.watches[false_lit] = kept
+        return None
+
+    def _analyze(self, conflict: int) -> tuple[list[int], int]:
+        """First-UIP conflict analysis. Returns (learnt clause, backjump level)."""
+        current = len(self.trail_lim)
+        seen = set()
+        learnt = [0]
+        counter = 0
+        lit = 0
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+
+        while True:
+            for q in clause:
+                if q == lit:
+                    continue
+                v = abs(q)
+                if v in seen or self.level[v] == 0:
+                    continue
+                seen.add(v)
+                self._bump_var(v)
+                if self.level[v] == current:
+                    counter += 1
+                else:
+                    learnt.append(q)
+
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reason[abs(lit)]]
+
+        learnt[0] = -lit
+        if len(learnt) == 1:
+            return learnt, 0
+
+        # Second watch: the literal with the highest level
+        best = max(range(1, len(learnt)), key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def _bump_var(self, v: int) -> None:
+        self.activity[v] += self.bump
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.bump *= 1e-100
+
+    def _backtrack(self, level: int) -> None:
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            self.phase[v] = self.value[v]
+            self.value[v] = 0
+            self.reason[v] = -1
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def _decide(self) -> int | None:
+        best, best_activity = None, -1.0
+        for v in range(1, self.num_vars + 1):
+            if self.value[v] == 0 and self.activity[v] > best_activity:
+                best, best_activity = v, self.activity[v]
+        if best is None:
+            return None
+        return best if self.phase[best] == 1 else -best
+
+    def solve(self) -> list[int] | None:
+        """Search for a model.
+
+        Returns:
+            Model as a list indexed by var (1 true, -1 false), or None if UNSAT
+        """
+        if self.unsat:
+            return None
+        restart_limit = 100
+        conflicts_since_restart = 0
+
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self.trail_lim:
+                    self.unsat = True
+                    return None
+                learnt, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], -1)
+                else:
+                    self._enqueue(learnt[0], self._attach(learnt))
+                self.bump *= 1.05
+                continue
+
+            if conflicts_since_restart >= restart_limit:
+                self._backtrack(0)
+                conflicts_since_restart = 0
+                restart_limit = int(restart_limit * 1.5)
+                continue
+
+            lit = self._decide()
+            if lit is None:
+                return list(self.value)
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(lit, -1)
+
+
+class PuzzleEncoder:
+    """Encode a type_puzzle into CNF on a CDCLSolver."""
+
+    def __init__(self, puzzle: type_puzzle):
+        self.puzzle = puzzle
+        self.sat = CDCLSolver()
+        self.role_var = {}  # {(player, role): var}
+        for player in puzzle.players:
+            for role in ROLES:
+                self.role_var[(player, role)] = self.sat.new_var()
+            lits = [self.role_var[(player, r)] for r in ROLES]
+            self.sat.add_clause(lits)
+            for i in range(3):
+                for j in range(i + 1, 3):
+                    self.sat.add_clause([-lits[i], -lits[j]])
+        self._true = self.sat.new_var()
+        self.sat.add_clause([self._true])
+
+    def _gate_and(self, lits: list[int]) -> int:
+        if len(lits) == 1:
+            return lits[0]
+        out = self.sat.new_var()
+        for lit in lits:
+            self.sat.add_clause([-out, lit])
+        self.sat.add_clause([out] + [-lit for lit in lits])
+        return out
+
+    def _gate_or(self, lits: list[int]) -> int:
+        return -self._gate_and([-lit for lit in lits])
+
+    def _gate_iff(self, a: int, b: int) -> int:
+        out = self.sat.new_var()
+        self.sat.add_clause([-out, -a, b])
+        self.sat.add_clause([-out, a, -b])
+        self.sat.add_clause([out, a, b])
+        self.sat.add_clause([out, -a, -b])
+        return out
+
+    def _totalizer(self, lits: list[int]) -> list[int]:
+        """Unary counter: output[k-1] <-> (at least k of lits are true)."""
+        if len(lits) <= 1:
+            return list(lits)
+        mid = len(lits) // 2
+        left = self._totalizer(lits[:mid])
+        right = self._totalizer(lits[mid:])
+        out = [self.sat.new_var() for _ in range(len(left) + len(right))]
+        for i in range(len(left) + 1):
+            for j in range(len(right) + 1):
+                # sum >= i + j  if  left >= i and right >= j
+                if i + j > 0:
+                    clause = [out[i + j - 1]]
+                    if i > 0:
+                        clause.append(-left[i - 1])
+                    if j > 0:
+                        clause.append(-right[j - 1])
+                    self.sat.add_clause(clause)
+                # sum <= i + j  if  left <= i and right <= j
+                if i + j < len(out):
+                    clause = [-out[i + j]]
+                    if i < len(left):
+                        clause.append(left[i])
+                    if j < len(right):
+                        clause.append(right[j])
+                    self.sat.add_clause(clause)
+        return out
+
+    def _at_least(self, counter: list[int], k: int) -> int:
+        if k <= 0:
+            return self._true
+        if k > len(counter):
+            return -self._true
+        return counter[k - 1]
+
+    def encode(self, expr: type_expr) -> int:
+        """Return a literal equivalent to expr."""
+        op = expr.op
+        if op == "role":
+            return self.role_var[(expr.players[0], expr.role)]
+        if op == "not":
+            return -self.encode(expr.args[0])
+        if op == "and":
+            return self._gate_and([self.encode(a) for a in expr.args])
+        if op == "or":
+            return self._gate_or([self.encode(a) for a in expr.args])
+        if op == "implies":
+            return self._gate_or([-self.encode(expr.args[0]), self.encode(expr.args[1])])
+        if op == "iff":
+            return self._gate_iff(self.encode(expr.args[0]), self.encode(expr.args[1]))
+        if op == "same":
+            first = expr.players[0]
+            pairs = []
+            for other in expr.players[1:]:
+                pairs.append(self._gate_or([
+                    self._gate_and([self.role_var[(first, r)], self.role_var[(other, r)]]) for r in ROLES
+                ]))
+            return self._gate_and(pairs) if pairs else self._true
+        if op == "count":
+            counter = self._totalizer([self.role_var[(p, expr.role)] for p in expr.players])
+            if expr.cmp == ">=":
+                return self._at_least(counter, expr.k)
+            if expr.cmp == "<=":
+                return -self._at_least(counter, expr.k + 1)
+            if expr.cmp == "==":
+                return self._gate_and([self._at_least(counter, expr.k), -self._at_least(counter, expr.k + 1)])
+            raise ValueError(f"Invalid count comparison '{expr.cmp}'")
+        raise ValueError(f"Invalid expression op '{op}'")
+
+    def add_puzzle_constraints(self) -> None:
+        for claim in _constraints(self.puzzle):
+            truth = self.encode(claim.expr)
+            if not claim.speaker:
+                self.sat.add_clause([truth])
+            else:
+                self.sat.add_clause([-self.role_var[(claim.speaker, "knight")], truth])
+                self.sat.add_clause([-self.role_var[(claim.speaker, "knave")], -truth])
+
+    def decode(self, model: list[int]) -> dict[str, str]:
+        return {
+            player: next(r for r in ROLES if model[self.role_var[(player, r)]] == 1)
+            for player in self.puzzle.players
+        }
+
+    def block(self, assignment: dict[str, str]) -> None:
+        """Exclude an assignment from further search."""
+        self.sat.add_clause([-self.role_var[(p, r)] for p, r in assignment.items()])
+
+
+def solve_sat(puzzle: type_puzzle, max_solutions: int | None = None) -> type_solve_result:
+    """Find consistent role assignments with the CDCL engine.
+
+    Same API as solver.solve_enumeration. Use max_solutions=2 to prove
+    uniqueness: one solution with complete=True means it is unique.
+    """
+    start = time.perf_counter()
+    encoder = PuzzleEncoder(puzzle)
+    encoder.add_puzzle_constraints()
+
+    solutions = []
+    complete = True
+    while True:
+        if max_solutions is not None and len(solutions) >= max_solutions:
+            complete = False
+            break
+        model = encoder.sat.solve()
+        if model is None:
+            break
+        assignment = encoder.decode(model)
+        solutions.append(assignment)
+        encoder.block(assignment)
+
+    return type_solve_result(
+        solutions=solutions,
+        engine="sat",
+        elapsed=time.perf_counter() - start,
+        complete=complete
+    )
@@ -1,84 +1,37 @@
 import argparse
-import json
-import os
-import re
 from dataclasses import asdict
 from typing import Optional
 
 from cus_types_main import type_statement, type_object_change
-from utils import IDManager, handle_changes, load_object, OBJECT_FOLDERS
+from dedupe import find_reusable_statement
+from refs import parse_reference, resolve_references, strip_reference
+from utils import IDManager, add_workspace_argument, handle_changes, load_object, set_workspace
 
 
 VALID_TYPES = ["assumption", "proposition", "normal"]
-STATEMENT_FOLDER = OBJECT_FOLDERS["s"]
 
 
-def parse_statement_id(text: str) -> str | None:
-    """Extract statement ID from text starting with (s-...) or (e-...).
-
-    Args:
-        text: Input text to parse
-
-    Returns:
-        Statement ID if found, else None
-    """
-    text = text.lstrip()
-    if not text.startswith('('):
-        return None
-
-    match = re.match(r'^\(([se]-[a-z]*\d+)\)', text)
-    if match:
-        return match.group(1)
-    return None
-
-
-def load_statement_conclusion(statement_id: str) -> str | None:
-    """Load conclusion from statement file.
-
-    Args:
-        statement_id: Statement ID (e.g., "s-001")
-
-    Returns:
-        Conclusion text (joined from list) if file exists, else None
-    """
-    statement_path = os.path.join(STATEMENT_FOLDER, f"{statement_id}.json")
-
-    if not os.path.exists(statement_path):
-        return None
-
-    try:
-        with open(statement_path, 'r') as f:
-            statement_data = json.load(f)
-
-        conclusion = statement_data.get('conclusion', [])
-        if isinstance(conclusion, list):
-            return ' '.join(conclusion)
-        return str(conclusion)
-    except Exception:
-        return None
-
-
-def process_hypothesis_item(item: str) -> str:
+def process_hypothesis_item(item: str, references: dict[str, str]) -> str:
     """Process single hypothesis item for statement creation.
 
     Args:
         item: Hypothesis item text
+        references: {referenced_id: text} from refs.resolve_references()
 
     Returns:
         Formatted hypothesis string
     """
     # Check for existing statement ID
-    statement_id = parse_statement_id(item)
+    statement_id = parse_reference(item)
 
     if statement_id:
-        # Try to load the statement
-        conclusion = load_statement_conclusion(statement_id)
+        conclusion = references.get(statement_id)
         if conclusion:
             # Existing statement found
             return f"({statement_id}) {conclusion}"
 
-        # ID format valid but file doesn't exist - strip invalid ID
-        cleaned_text = re.sub(r'^\([se]-[a-z]*\d+\)\s*', '', item.lstrip()).strip()
+        # ID format valid but object doesn't exist - strip invalid ID
+        cleaned_text = strip_reference(item)
         # If after stripping the ID there's text remaining, use it; otherwise use original
         return cleaned_text if cleaned_text else item.strip()
     else:
@@ -123,7 +76,8 @@ def handle_statement(
     progresses: Optional[tuple[str, list[str]]] = None,
     validation_issues: Optional[tuple[str, list[str]]] = None,
     validation_responses: Optional[tuple[str, list[str]]] = None,
-    root_change: bool = True
+    root_change: bool = True,
+    allow_duplicate: bool = False
 ) -> str | tuple[str, list[type_object_change]]:
     """Handle statement creation or update.
 
@@ -142,6 +96,9 @@ def handle_statement(
         validation_issues: Validation issues (mode, values)
         validation_responses: Validation responses (mode, values)
         root_change: If True, commit changes; if False, return changes for parent
+        allow_duplicate: Create mode only; if False, an identical existing
+            statement (same type, normalized conclusion and hypothesis) is
+            reused when nothing else (proof, status, ...) is given
 
     Returns:
         If root_change=True: statement_id (for create) or log_id (for update)
@@ -162,7 +119,8 @@ def handle_statement(
             progresses=progresses,
             validation_issues=validation_issues,
             validation_responses=validation_responses,
-            root_change=root_change
+            root_change=root_change,
+            allow_duplicate=allow_duplicate
         )
     else:
         # UPDATE MODE
@@ -197,9 +155,16 @@ def _create_statement(
     progresses: Optional[tuple[str, list[str]]],
     validation_issues: Optional[tuple[str, list[str]]],
     validation_responses: Optional[tuple[str, list[str]]],
-    root_change: bool
+    root_change: bool,
+    allow_duplicate: bool = False
 ) -> str | tuple[str, list[type_object_change]]:
-    """Create a new statement."""
+    """Create a new statement.
+
+    If an identical statement of the same type already exists (see
+    dedupe.py), allow_duplicate is False and nothing but the type,
+    conclusion and hypothesis is given, its id is returned and nothing is
+    created.
+    """
     # Validate required fields
     if type is None:
         raise ValueError("'type' is required for creating a statement.")
@@ -208,6 +173,24 @@ def _create_statement(
     if conclusion is None:
         raise ValueError("'conclusion' is required for creating a statement.")
 
+    # Process hypothesis items first (extract values from mode tuple)
+    processed_hypothesis = []
+    if hypothesis is not None:
+        _, values = hypothesis
+        references, _ = resolve_references(values)
+        processed_hypothesis = [process_hypothesis_item(item, references) for item in values]
+
+    # Reuse an identical existing statement instead of creating a copy, unless
+    # the caller brings content that reusing would drop (proof, status, ...)
+    if not allow_duplicate:
+        supplied = any(value is not None for value in (
+            status, reliability, proof_cot, proof_full, proof_ref, preliminaries, progresses,
+            validation_issues, validation_responses))
+        existing_id = find_reusable_statement(conclusion, processed_hypothesis, statement_type=type,
+                                              reuse=not supplied)
+        if existing_id is not None:
+            return existing_id if root_change else (existing_id, [])
+
     # Generate new statement ID
     id_manager = IDManager()
     statement_id = id_manager.generate_id("s")
@@ -221,10 +204,7 @@ def _create_statement(
         reliability=reliability if reliability is not None else 0.0
     )
 
-    # Handle hypothesis if provided (extract values from mode tuple and process each item)
     if hypothesis is not None:
-        _, values = hypothesis
-        processed_hypothesis = [process_hypothesis_item(item) for item in values]
         statement.hypothesis = processed_hypothesis
 
     # Handle proof fields
@@ -435,6 +415,9 @@ def build_args_from_parsed(args) -> dict:
         values = args.validation_responses[1:]
         kwargs["validation_responses"] = (mode, values)
 
+    if args.allow_duplicate:
+        kwargs["allow_duplicate"] = True
+
     return kwargs
 
 
@@ -472,8 +455,13 @@ if __name__ == "__main__":
                         help='Mode (Overwrite/Append) followed by validation issues')
     parser.add_argument('--validation.responses', nargs='+', type=str, dest='validation_responses',
                         help='Mode (Overwrite/Append) followed by validation responses')
+    parser.add_argument('--allow-duplicate', action='store_true',
+                        help='Create mode: create even if an identical statement exists')
+    add_workspace_argument(parser)
 
     args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
 
     kwargs = build_args_from_parsed(args)
 
@@ -483,11 +471,15 @@ if __name__ == "__main__":
         if args.type is None or args.conclusion is None:
             parser.error("--type and --conclusion are required for create mode (when --id is not provided)")
 
+    last_statement_id = IDManager().current_ids["s"]
     result = handle_statement(**kwargs)
 
     if args.id is None:
-        # Create mode: result is statement_id
-        print(f"Created statement: {result}")
+        # Create mode: result is statement_id (an existing one if reused)
+        if IDManager().current_ids["s"] == last_statement_id:
+            print(f"Reused statement: {result}")
+        else:
+            print(f"Created statement: {result}")
     else:
         # Update mode: result is (log_id, fields_str)
         log_id, fields_str = result
@@ -1,38 +1,130 @@
 import json
 import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 
-# Get project root (parent of src folder)
+# Get project root (parent of src folder); also the default workspace
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-CONFIG_PATH = os.path.join(PROJECT_ROOT, "contents/config.json")
+# Environment variable selecting the workspace root (see Workspace)
+WORKSPACE_ENV = "MRA_WORKSPACE"
 
 VALID_TYPES = ["p", "s", "e", "l"]
 
-OBJECT_FOLDERS = {
-    "p": os.path.join(PROJECT_ROOT, "contents/problem"),
-    "s": os.path.join(PROJECT_ROOT, "contents/statement"),
-    "e": os.path.join(PROJECT_ROOT, "contents/experience")
-}
 
-HISTORY_FOLDER = os.path.join(PROJECT_ROOT, "contents/history")
+class Workspace:
+    """Folder layout of one run.
 
+    A workspace is a root folder holding puzzle.md and contents/ (objects,
+    history, indexes, caches and events). Every path is derived from the
+    root, so many runs can share one copy of src/ without touching each
+    other's files. The project root is the default workspace.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.contents = os.path.join(self.root, "contents")
+        self.config_path = os.path.join(self.contents, "config.json")
+        self.object_folders = {
+            "p": os.path.join(self.contents, "problem"),
+            "s": os.path.join(self.contents, "statement"),
+            "e": os.path.join(self.contents, "experience")
+        }
+        self.history_folder = os.path.join(self.contents, "history")
+        # Hot log segment; older entries are gzipped into segments_folder (log_store.py)
+        self.log_path = os.path.join(self.history_folder, "log.jsonl")
+        self.segments_folder = os.path.join(self.contents, "log_segments")
+        # Derived, rebuildable indexes (search, duplicates, ...)
+        self.index_folder = os.path.join(self.contents, "index")
+        # Content-addressed caches (compiled puzzles, ...); safe to delete
+        self.cache_folder = os.path.join(self.contents, "cache")
+        self.events_folder = os.path.join(self.contents, "events")
+        # Segments dropped by rewinds, kept for redo.py
+        self.redo_folder = os.path.join(self.contents, "redo")
+        self.puzzle_path = os.path.join(self.root, "puzzle.md")
+
+    def __repr__(self) -> str:
+        return f"Workspace({self.root!r})"
+
+
+_workspaces: dict[str, Workspace] = {}
+_selected_root: str | None = None
+_active_workspace: ContextVar[Workspace | None] = ContextVar("workspace", default=None)
+
+
+def get_workspace(root: str | None = None) -> Workspace:
+    """Resolve a workspace.
+
+    Without root, the first of these wins:
+    1. the workspace of an enclosing use_workspace() block
+    2. the one selected with set_workspace() (the CLIs' --workspace)
+    3. the MRA_WORKSPACE environment variable
+    4. the project root
+
+    Args:
+        root: Workspace root folder (relative paths are taken from the cwd)
+
+    Returns:
+        The Workspace (one instance per root folder)
+    """
+    if root is None:
+        active = _active_workspace.get()
+        if active is not None:
+            return active
+        root = _selected_root or os.environ.get(WORKSPACE_ENV) or PROJECT_ROOT
+    root = os.path.abspath(root)
+    if root not in _workspaces:
+        _workspaces[root] = Workspace(root)
+    return _workspaces[root]
+
+
+def set_workspace(root: str | None) -> Workspace:
+    """Select the workspace for the rest of the process (None: back to the default)."""
+    global _selected_root
+    _selected_root = os.path.abspath(root) if root else None
+    return get_workspace()
+
+
+@contextmanager
+def use_workspace(root: str | Workspace):
+    """Run a block against a workspace (context-local, so safe across threads).
+
+    Example:
+        with use_workspace("/tmp/run-7"):
+            handle_statement(id="s-001", status="true")
+    """
+    workspace = root if isinstance(root, Workspace) else get_workspace(root)
+    token = _active_workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _active_workspace.reset(token)
+
+
+def add_workspace_argument(parser) -> None:
+    """Add the common --workspace option to a CLI's argparse parser."""
+    parser.add_argument('--workspace', type=str, default=None, metavar='DIR',
+                        help=f'Workspace root folder (default: ${WORKSPACE_ENV} or the project root)')
 
-def ensure_config() -> dict:
+
+def ensure_config(workspace: Workspace | None = None) -> dict:
     """Ensure config file exists and return its contents."""
-    os.makedirs(os.path.join(PROJECT_ROOT, "contents"), exist_ok=True)
+    workspace = workspace or get_workspace()
+    os.makedirs(workspace.contents, exist_ok=True)
 
-    if not os.path.exists(CONFIG_PATH):
+    if not os.path.exists(workspace.config_path):
         config = {
             "p": "p-000",
             "s": "s-000",
             "e": "e-000",
             "l": "l-000"
         }
-        with open(CONFIG_PATH, "w") as f:
+        with open(workspace.config_path, "w") as f:
             json.dump(config, f, indent=4)
     else:
-        with open(CONFIG_PATH, "r") as f:
+        with open(workspace.config_path, "r") as f:
             config = json.load(f)
 
     return config
@@ -108,29 +200,41 @@ def increment_id(current_id: str) -> str:
     return f"{prefix}-{letters}{number:03d}"
 
 
+def id_sort_key(obj_id: str) -> tuple[int, str, int]:
+    """Sort key following increment_id() order ("s-999" < "s-a001" < "s-b001")."""
+    counter = obj_id.split("-")[1]
+    i = 0
+    while i < len(counter) and counter[i].isalpha():
+        i += 1
+    return (i, counter[:i], int(counter[i:] or 0))
+
+
 class IDManager:
-    """Singleton manager for ID generation and tracking.
+    """Singleton manager for ID generation and tracking (one per workspace).
 
     This class ensures a single source of truth for ID management across
     the application. Config file is read once at initialization and updated
     atomically on each ID generation.
     """
-    _instance = None
-    _initialized = False
-
-    def __new__(cls):
-        """Implement singleton pattern."""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-
-    def __init__(self):
-        """Initialize the IDManager (only once)."""
-        if IDManager._initialized:
+    _instances: dict[str, "IDManager"] = {}
+
+    def __new__(cls, workspace: Workspace | None = None):
+        """Implement singleton pattern, keyed by workspace root."""
+        workspace = workspace or get_workspace()
+        if workspace.root not in cls._instances:
+            instance = super().__new__(cls)
+            instance._initialized = False
+            cls._instances[workspace.root] = instance
+        return cls._instances[workspace.root]
+
+    def __init__(self, workspace: Workspace | None = None):
+        """Initialize the IDManager (only once per workspace)."""
+        if self._initialized:
             return
+        workspace = workspace or get_workspace()
 
         # Read config once at initialization
-        config = ensure_config()
+        config = ensure_config(workspace)
 
         # Store current IDs as dict for direct access
         self._current_ids = {
@@ -141,9 +245,9 @@ class IDManager:
         }
 
         # Store config path for updates
-        self._config_path = CONFIG_PATH
+        self._config_path = workspace.config_path
 
-        IDManager._initialized = True
+        self._initialized = True
 
     @property
     def current_ids(self) -> dict[str, str]:
@@ -154,6 +258,19 @@ class IDManager:
         """
         return self._current_ids.copy()
 
+    def restore(self, ids: dict[str, str]) -> None:
+        """Set counters to given values and persist them (used by replay).
+
+        Args:
+            ids: Subset of {"p", "s", "e", "l"} mapped to the new current IDs
+        """
+        for type, value in ids.items():
+            if type not in VALID_TYPES:
+                raise ValueError(f"Invalid type '{type}'. Expected one of: {VALID_TYPES}")
+            self._current_ids[type] = value
+        with open(self._config_path, "w") as f:
+            json.dump(self._current_ids, f, indent=4)
+
     def generate_id(self, type: str) -> str:
         """Generate a new ID, update instance state, and persist to config.
 
@@ -209,26 +326,28 @@ class LogManager:
     - Instead, collect objects to create, then call commit_objects()
     - commit_objects() handles both file writing AND log creation atomically
     """
-    _instance = None
-    _initialized = False
-
-    LOG_PATH = os.path.join(PROJECT_ROOT, "contents/history/log.jsonl")
-
-    def __new__(cls):
-        """Implement singleton pattern."""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-
-    def __init__(self):
-        """Initialize the LogManager (only once)."""
-        if LogManager._initialized:
+    _instances: dict[str, "LogManager"] = {}
+
+    def __new__(cls, workspace: Workspace | None = None):
+        """Implement singleton pattern, keyed by workspace root."""
+        workspace = workspace or get_workspace()
+        if workspace.root not in cls._instances:
+            instance = super().__new__(cls)
+            instance._initialized = False
+            cls._instances[workspace.root] = instance
+        return cls._instances[workspace.root]
+
+    def __init__(self, workspace: Workspace | None = None):
+        """Initialize the LogManager (only once per workspace)."""
+        if self._initialized:
             return
+        self.workspace = workspace or get_workspace()
+        self.log_path = self.workspace.log_path
 
         # Ensure log directory exists
-        os.makedirs(os.path.dirname(self.LOG_PATH), exist_ok=True)
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
 
-        LogManager._initialized = True
+        self._initialized = True
 
     def log_changes(
         self,
@@ -245,7 +364,7 @@ class LogManager:
             The log ID for this change batch
         """
         # Generate log ID
-        id_manager = IDManager()
+        id_manager = IDManager(self.workspace)
         log_id = id_manager.generate_id("l")
 
         # Build log entry with current indices (p, s, e only)
@@ -258,12 +377,35 @@ class LogManager:
             "current": [current_ids["p"], current_ids["s"], current_ids["e"]]
         }
 
-        # Append to JSONL file
-        with open(self.LOG_PATH, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-
+        self.append(log_entry)
         return log_id
 
+    def append(self, log_entry: dict) -> None:
+        """Append one entry to the hot log segment (rolled once it is full) and index it."""
+        from history_index import on_append
+        from log_store import roll
+
+        line = json.dumps(log_entry) + "\n"
+        with open(self.log_path, "a") as f:
+            f.write(line)
+        roll(self.workspace)
+        on_append(self.workspace, log_entry, len(line.encode()))
+
+
+def get_log_id_from_entry(entry: dict) -> str | None:
+    """Extract the log ID from a parsed log.jsonl entry.
+
+    Args:
+        entry: Parsed log line, e.g. {"l-003": {...}, "current": [...]}
+
+    Returns:
+        The log ID (first key starting with "l-"), or None if absent
+    """
+    for key in entry:
+        if key.startswith("l-"):
+            return key
+    return None
+
 
 def commit_objects(objects: list[tuple[str, dict]]) -> tuple[str, list[str]]:
     """Unified function to create objects and log the changes.
@@ -283,14 +425,15 @@ def commit_objects(objects: list[tuple[str, dict]]) -> tuple[str, list[str]]:
     if not objects:
         raise ValueError("Cannot commit empty object list")
 
+    workspace = get_workspace()
     created_ids = []
 
     # Write each object to its corresponding file
     for obj_type, obj_data in objects:
-        if obj_type not in OBJECT_FOLDERS:
-            raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(OBJECT_FOLDERS.keys())}")
+        if obj_type not in workspace.object_folders:
+            raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(workspace.object_folders.keys())}")
 
-        folder = OBJECT_FOLDERS[obj_type]
+        folder = workspace.object_folders[obj_type]
         os.makedirs(folder, exist_ok=True)
 
         obj_id = obj_data["id"]
@@ -302,7 +445,7 @@ def commit_objects(objects: list[tuple[str, dict]]) -> tuple[str, list[str]]:
         created_ids.append(obj_id)
 
     # Create log entry
-    log_manager = LogManager()
+    log_manager = LogManager(workspace)
     log_id = log_manager.log_changes(created_ids=created_ids)
 
     return log_id, created_ids
@@ -339,11 +482,12 @@ def load_object(obj_id: str) -> dict:
         ValueError: If object type is invalid
     """
     obj_type = get_object_type_from_id(obj_id)
+    workspace = get_workspace()
 
-    if obj_type not in OBJECT_FOLDERS:
-        raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(OBJECT_FOLDERS.keys())}")
+    if obj_type not in workspace.object_folders:
+        raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(workspace.object_folders.keys())}")
 
-    folder = OBJECT_FOLDERS[obj_type]
+    folder = workspace.object_folders[obj_type]
     file_path = os.path.join(folder, f"{obj_id}.json")
 
     if not os.path.exists(file_path):
@@ -353,6 +497,48 @@ def load_object(obj_id: str) -> dict:
         return json.load(f)
 
 
+def load_objects(obj_ids: list[str], max_workers: int = 8) -> dict[str, dict]:
+    """Load many objects at once.
+
+    Files are read concurrently for large batches. Ids without a file are
+    left out of the result, so callers can report them as missing.
+
+    Args:
+        obj_ids: Object IDs to load (duplicates are read once)
+        max_workers: Thread count used for large batches
+
+    Returns:
+        {obj_id: object data} for every id whose file exists
+
+    Raises:
+        ValueError: If an object type is invalid
+    """
+    workspace = get_workspace()
+    paths = {}
+    for obj_id in dict.fromkeys(obj_ids):
+        obj_type = get_object_type_from_id(obj_id)
+        if obj_type not in workspace.object_folders:
+            raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(workspace.object_folders.keys())}")
+        paths[obj_id] = os.path.join(workspace.object_folders[obj_type], f"{obj_id}.json")
+
+    def read(item: tuple[str, str]) -> tuple[str, dict | None]:
+        obj_id, file_path = item
+        try:
+            with open(file_path, "r") as f:
+                return obj_id, json.load(f)
+        except FileNotFoundError:
+            return obj_id, None
+
+    if len(paths) > 32:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(read, paths.items()))
+    else:
+        results = [read(item) for item in paths.items()]
+
+    return {obj_id: data for obj_id, data in results if data is not None}
+
+
 def apply_updates(obj_data: dict, updates: dict) -> dict:
     """Apply updates to an object, handling nested fields and list modes.
 
@@ -429,12 +615,14 @@ def update_objects(updates_list: list[tuple[str, dict]]) -> tuple[str, list[str]
     if not updates_list:
         raise ValueError("Cannot update with empty updates list")
 
+    workspace = get_workspace()
+
     # Generate log ID first (needed for backup folder)
-    id_manager = IDManager()
+    id_manager = IDManager(workspace)
     log_id = id_manager.generate_id("l")
 
     # Create backup folder
-    backup_folder = os.path.join(HISTORY_FOLDER, log_id)
+    backup_folder = os.path.join(workspace.history_folder, log_id)
     os.makedirs(backup_folder, exist_ok=True)
 
     modified_ids = []
@@ -453,7 +641,7 @@ def update_objects(updates_list: list[tuple[str, dict]]) -> tuple[str, list[str]
         updated_data = apply_updates(obj_data, updates)
 
         # Write updated object back to original location
-        folder = OBJECT_FOLDERS[obj_type]
+        folder = workspace.object_folders[obj_type]
         file_path = os.path.join(folder, f"{obj_id}.json")
         with open(file_path, "w") as f:
             json.dump(updated_data, f, indent=4)
@@ -461,7 +649,7 @@ def update_objects(updates_list: list[tuple[str, dict]]) -> tuple[str, list[str]
         modified_ids.append(obj_id)
 
     # Write log entry with current indices (p, s, e only)
-    log_manager = LogManager()
+    log_manager = LogManager(workspace)
     current_ids = id_manager.current_ids
     log_entry = {
         log_id: {
@@ -470,8 +658,7 @@ def update_objects(updates_list: list[tuple[str, dict]]) -> tuple[str, list[str]
         },
         "current": [current_ids["p"], current_ids["s"], current_ids["e"]]
     }
-    with open(log_manager.LOG_PATH, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    log_manager.append(log_entry)
 
     return log_id, modified_ids
 
@@ -484,8 +671,8 @@ def handle_changes(tasks: list) -> tuple[str, list[str], list[str]]:
 
     Args:
         tasks: List of type_object_change objects, each containing:
-            - change_type: "create" or "update"
-            - obj: The object (type_problem or type_statement)
+            - change_type: "create", "update" or "delete"
+            - obj: The object (type_problem or type_statement; for deletes only the id is used)
             - updates: For update operations, the updates dict (optional)
 
     Returns:
@@ -493,14 +680,18 @@ def handle_changes(tasks: list) -> tuple[str, list[str], list[str]]:
 
     Process:
         1. Generate log_id
-        2. For updates: create backup folder and backup files
+        2. For updates and deletes: create backup folder and backup files
         3. Process each task:
            - "create": write new object file
            - "update": load, apply updates, write back
-        4. Write log entry with both created and modified IDs
+           - "delete": remove the object file
+        4. Write log entry with the created, modified and deleted IDs
+           ("deletion" only appears in entries that delete something)
+        5. Publish a commit event (see events.py)
     """
-    from dataclasses import asdict
-    from cus_types_main import type_object_change
+    from dataclasses import asdict, is_dataclass
+    from cus_types_main import type_object_change, type_commit_event
+    import events
 
     if not tasks:
         raise ValueError("Cannot handle empty task list")
@@ -508,24 +699,30 @@ def handle_changes(tasks: list) -> tuple[str, list[str], list[str]]:
     # Separate tasks by type
     create_tasks = [t for t in tasks if t.change_type == "create"]
     update_tasks = [t for t in tasks if t.change_type == "update"]
+    delete_tasks = [t for t in tasks if t.change_type == "delete"]
+
+    workspace = get_workspace()
 
     # Generate log ID first (needed for backup folder if there are updates)
-    id_manager = IDManager()
+    id_manager = IDManager(workspace)
+    parent_log_id = id_manager.current_ids["l"]
     log_id = id_manager.generate_id("l")
 
     created_ids = []
     modified_ids = []
+    deleted_ids = []
+    changed_fields = {}
 
     # Handle creations
     for task in create_tasks:
-        obj_data = asdict(task.obj)
+        obj_data = asdict(task.obj) if is_dataclass(task.obj) else dict(task.obj)
         obj_id = obj_data["id"]
         obj_type = get_object_type_from_id(obj_id)
 
-        if obj_type not in OBJECT_FOLDERS:
-            raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(OBJECT_FOLDERS.keys())}")
+        if obj_type not in workspace.object_folders:
+            raise ValueError(f"Invalid object type '{obj_type}'. Expected one of: {list(workspace.object_folders.keys())}")
 
-        folder = OBJECT_FOLDERS[obj_type]
+        folder = workspace.object_folders[obj_type]
         os.makedirs(folder, exist_ok=True)
 
         file_path = os.path.join(folder, f"{obj_id}.json")
@@ -536,7 +733,7 @@ def handle_changes(tasks: list) -> tuple[str, list[str], list[str]]:
 
     # Handle updates (with backup)
     if update_tasks:
-        backup_folder = os.path.join(HISTORY_FOLDER, log_id)
+        backup_folder = os.path.join(workspace.history_folder, log_id)
         os.makedirs(backup_folder, exist_ok=True)
 
         for task in update_tasks:
@@ -558,15 +755,34 @@ def handle_changes(tasks: list) -> tuple[str, list[str], list[str]]:
                 updated_data = obj_data
 
             # Write updated object back to original location
-            folder = OBJECT_FOLDERS[obj_type]
+            folder = workspace.object_folders[obj_type]
             file_path = os.path.join(folder, f"{obj_id}.json")
             with open(file_path, "w") as f:
                 json.dump(updated_data, f, indent=4)
 
             modified_ids.append(obj_id)
+            changed_fields[obj_id] = list(task.updates.keys()) if task.updates else []
+
+    # Handle deletions (the backup keeps the last version)
+    if delete_tasks:
+        backup_folder = os.path.join(workspace.history_folder, log_id)
+        os.makedirs(backup_folder, exist_ok=True)
+
+        for task in delete_tasks:
+            obj_id = task.obj.id if hasattr(task.obj, 'id') else task.obj["id"]
+            obj_data = load_object(obj_id)
+
+            backup_path = os.path.join(backup_folder, f"{obj_id}.json")
+            with open(backup_path, "w") as f:
+                json.dump(obj_data, f, indent=4)
+
+            folder = workspace.object_folders[get_object_type_from_id(obj_id)]
+            os.remove(os.path.join(folder, f"{obj_id}.json"))
+
+            deleted_ids.append(obj_id)
 
     # Write log entry
-    log_manager = LogManager()
+    log_manager = LogManager(workspace)
     current_ids = id_manager.current_ids
     log_entry = {
         log_id: {
@@ -575,7 +791,19 @@ def handle_changes(tasks: list) -> tuple[str, list[str], list[str]]:
         },
         "current": [current_ids["p"], current_ids["s"], current_ids["e"]]
     }
-    with open(log_manager.LOG_PATH, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    if deleted_ids:
+        log_entry[log_id]["deletion"] = deleted_ids
+    log_manager.append(log_entry)
+
+    # Notify subscribers only after the commit is fully on disk
+    events.publish(type_commit_event(
+        log_id=log_id,
+        parent_log_id=parent_log_id,
+        created=created_ids,
+        modified=modified_ids,
+        deleted=deleted_ids,
+        fields=changed_fields,
+        time=time.time()
+    ))
 
     return log_id, created_ids, modified_ids
@@ -0,0 +1,320 @@
+"""Persistent cache of proof-check verdicts.
+
+A verdict is keyed by a hash of what the check depends on: the puzzle
+(content_hash of puzzle.md), the statement's conclusion, hypothesis,
+proof.full, proof.cot and the statuses of its preliminaries. A rewind, or a
+rerun of the same puzzle, that brings back an identical statement therefore
+gets the earlier verdict immediately, while a new puzzle.md in the same
+workspace starts from an empty cache.
+
+Verdicts are recorded from the commit events in the spool (see events.py),
+outside the commit path: catch_up() runs before the cache is read and goes
+through the commits since its previous run:
+- status -> "true"                      : "confirm"
+- status -> "false"                     : "mark-false"
+- new validation.issues while validating: "reject" (with the issue text)
+each keyed on the statement as that commit left it (its backup in the next
+commit that touched it, or its file). checker.py looks verdicts up before
+any work is done.
+
+The cache is a SQLite file in contents/cache, outside contents/history, so
+rewind.py leaves it alone. It is bounded by MAX_ENTRIES and MAX_BYTES with
+least-recently-used eviction; hit/miss/eviction counters are kept with it.
+
+Usage:
+    python src/verdict_cache.py --lookup s-001
+    python src/verdict_cache.py --stats | --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from events import events_since, last_seq
+from puzzle_parser import content_hash
+from utils import IDManager, add_workspace_argument, get_workspace, load_objects, set_workspace
+
+
+# SQLite file in the workspace's contents/cache
+VERDICT_DB_NAME = "verdicts.db"
+
+MAX_ENTRIES = 10000
+MAX_BYTES = 16 * 1024 * 1024
+
+VERDICTS = ["confirm", "reject", "mark-false"]
+
+VERDICT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY, statement_id TEXT, verdict TEXT, detail TEXT,
+    bytes INTEGER, created REAL, last_used REAL, hits INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS verdicts_by_last_used ON verdicts (last_used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+# puzzle.md (path, mtime, size) -> content_hash, so keys do not reread the file
+_puzzle_hashes: dict[tuple[str, int, int], str] = {}
+
+
+def puzzle_hash() -> str:
+    """content_hash of the workspace's puzzle.md ("" if there is none)."""
+    path = get_workspace().puzzle_path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return ""
+    stamp = (path, stat.st_mtime_ns, stat.st_size)
+    if stamp not in _puzzle_hashes:
+        with open(path, "r") as f:
+            _puzzle_hashes[stamp] = content_hash(f.read())
+    return _puzzle_hashes[stamp]
+
+
+def verdict_key(
+    statement: dict,
+    preliminary_statuses: dict[str, str] | None = None,
+    puzzle: str | None = None
+) -> str:
+    """Hash of everything a proof check depends on.
+
+    Args:
+        statement: Statement object (dict as stored)
+        preliminary_statuses: {id: status} of the preliminaries (read from disk if None)
+        puzzle: puzzle_hash() of the workspace (computed if None)
+    """
+    preliminaries = statement.get("preliminaries", [])
+    if preliminary_statuses is None:
+        preliminary_statuses = {i: o.get("status", "") for i, o in load_objects(preliminaries).items()}
+    proof = statement.get("proof", {})
+    payload = {
+        "puzzle": puzzle_hash() if puzzle is None else puzzle,
+        "conclusion": statement.get("conclusion", []),
+        "hypothesis": statement.get("hypothesis", []),
+        "proof.full": proof.get("full", ""),
+        "proof.cot": proof.get("cot", []),
+        "preliminaries": sorted((i, preliminary_statuses.get(i, "")) for i in preliminaries),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _version_after(obj_id: str, later: list[dict]) -> dict | None:
+    """Object as a commit left it, given the events of the commits after it.
+
+    That is the backup taken by the next commit that touched it, or the
+    current file; None if neither exists.
+    """
+    workspace = get_workspace()
+    folder = workspace.object_folders.get(obj_id.split("-")[0])
+    if folder is None:
+        return None
+    path = os.path.join(folder, f"{obj_id}.json")
+    for event in later:
+        if obj_id in event["created"] + event["modified"] + event["deleted"]:
+            path = os.path.join(workspace.history_folder, event["log_id"], f"{obj_id}.json")
+            break
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class VerdictCache:
+    """Bounded LRU verdict store."""
+
+    def __init__(self, db_path: str | None = None, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        db_path = db_path or os.path.join(get_workspace().cache_folder, VERDICT_DB_NAME)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(VERDICT_SCHEMA)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _count(self, name: str, n: int = 1) -> None:
+        self.conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n)
+        )
+
+    def get(self, key: str) -> dict | None:
+        """Look up a verdict (counts a hit or a miss).
+
+        Returns:
+            {"statement_id", "verdict", "issues", "counterexample"} or None
+        """
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT statement_id, verdict, detail FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            self._count("hits")
+            self.conn.execute(
+                "UPDATE verdicts SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+        detail = json.loads(row[2])
+        return {"statement_id": row[0], "verdict": row[1],
+                "issues": detail.get("issues", []), "counterexample": detail.get("counterexample", {})}
+
+    def put(
+        self,
+        key: str,
+        statement_id: str,
+        verdict: str,
+        issues: list[str] | None = None,
+        counterexample: dict[str, str] | None = None,
+        replace: bool = True
+    ) -> None:
+        """Store a verdict, then evict down to the limits.
+
+        Args:
+            replace: If False, an existing entry with the same verdict is kept
+                as is (it may carry more detail, e.g. a counterexample)
+        """
+        if verdict not in VERDICTS:
+            raise ValueError(f"Invalid verdict '{verdict}'. Expected one of: {VERDICTS}")
+        if not replace:
+            row = self.conn.execute("SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row and row[0] == verdict:
+                return
+        detail = json.dumps({"issues": issues or [], "counterexample": counterexample or {}})
+        size = len(key) + len(detail) + len(verdict) + len(statement_id)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, statement_id, verdict, detail, bytes, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, statement_id, verdict, detail, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until both limits hold."""
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM verdicts").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, bytes FROM verdicts ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    def catch_up(self) -> int:
+        """Record the verdicts of the commits since the previous catch-up.
+
+        Returns:
+            Number of commits gone through (0 if the spool cannot account
+            for them, e.g. after a rewind: those verdicts are not recorded)
+        """
+        current = IDManager().current_ids["l"]
+        meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        events = events_since(meta.get("last_log_id", "l-000"), current, int(meta.get("spool_seq", "0")))
+        for position, event in enumerate(events or []):
+            self._record(event, events[position + 1:])
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+                ("last_log_id", current), ("spool_seq", str(events[-1]["seq"] if events else last_seq()))])
+        return len(events or [])
+
+    def _record(self, event: dict, later: list[dict]) -> None:
+        """Store the verdicts implied by one commit's status and issue changes."""
+        touched = {
+            obj_id: fields for obj_id, fields in event["fields"].items()
+            if obj_id.startswith("s-") and ("status" in fields or "validation.issues" in fields)
+        }
+        for obj_id, fields in touched.items():
+            statement = _version_after(obj_id, later)
+            if statement is None:
+                continue
+            preliminaries = {i: _version_after(i, later) for i in statement.get("preliminaries", [])}
+            key = verdict_key(statement, {i: (o or {}).get("status", "") for i, o in preliminaries.items()})
+            status = statement.get("status")
+            if "status" in fields and status == "true":
+                self.put(key, obj_id, "confirm", replace=False)
+            elif "status" in fields and status == "false":
+                self.put(key, obj_id, "mark-false", issues=statement.get("progresses", [])[-1:], replace=False)
+            elif "validation.issues" in fields and status == "validating":
+                issues = statement.get("validation", {}).get("issues", [])
+                if issues:
+                    self.put(key, obj_id, "reject", issues=issues[-1:], replace=False)
+
+    def stats(self) -> dict:
+        """Counters plus current size: {"hits", "misses", "evictions", "entries", "bytes", "hit_rate"}."""
+        counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM verdicts").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": total,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM verdicts")
+            self.conn.execute("DELETE FROM counters")
+
+
+def lookup(statement: dict) -> dict | None:
+    """Cached verdict for a statement's current content, or None."""
+    cache = VerdictCache()
+    try:
+        cache.catch_up()
+        return cache.get(verdict_key(statement))
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the proof-check verdict cache")
+    parser.add_argument('--lookup', nargs='+', type=str, metavar='ID',
+                        help='Look up the cached verdict of statements by id')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print hit/miss/eviction counters and size')
+    parser.add_argument('--clear', action='store_true',
+                        help='Remove all cached verdicts and counters')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    if args.clear:
+        cache = VerdictCache()
+        cache.clear()
+        cache.close()
+        print("Cleared verdict cache")
+    if args.lookup:
+        statements = load_objects(args.lookup)
+        for statement_id in args.lookup:
+            found = lookup(statements[statement_id]) if statement_id in statements else None
+            if statement_id not in statements:
+                print(f"[{statement_id}] (statement not found)")
+            elif found is None:
+                print(f"[{statement_id}] (no cached verdict)")
+            else:
+                detail = "; ".join(found["issues"])
+                print(f"[{statement_id}] {found['verdict']}" + (f": {detail}" if detail else ""))
+    if args.stats or not (args.lookup or args.clear):
+        cache = VerdictCache()
+        cache.catch_up()
+        s = cache.stats()
+        cache.close()
+        print(f"Verdict cache: {s['entries']} entries, {s['bytes']} bytes; "
+              f"{s['hits']} hits, {s['misses']} misses (hit rate {s['hit_rate']:.0%}), "
+              f"{s['evictions']} evictions")
@@ -0,0 +1,303 @@
+"""Possible-worlds knowledge base for the current puzzle.
+
+A world is one role assignment of all players (3^n worlds). The knowledge
+base keeps a NumPy boolean mask of the worlds that are still consistent with
+what the agents have established, i.e. every non-assumption statement with
+status "true" whose text the puzzle parser understands:
+- conclusion "Alice is a knave"             -> keep worlds where it holds
+- with hypothesis H1..Hk                    -> keep worlds where H1..Hk imply it
+- '<player> says: "..."' items              -> speaker semantics (knight/knave/spy)
+- 'The game manager ... says: "..."' items  -> always true
+
+Becoming true only ever removes worlds, so each such commit is one mask
+intersection. A statement that leaves "true" (or is rewound) triggers a
+rebuild from the statement files. The mask lives in contents/index and
+catches up when it is read, from the commits in the event spool since its
+last read (see events.py).
+
+Usage:
+    python src/worlds.py [--rebuild]
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from cus_types_main import type_claim
+from events import events_since, last_seq, statements_touched
+from puzzle_parser import ParseError, SentenceParser, compile_puzzle, content_hash
+from refs import strip_reference
+from solver import ROLES, claim_constraint, evaluate
+from utils import IDManager, add_workspace_argument, get_workspace, set_workspace
+
+
+# Mask file in the workspace's contents/index
+WORLDS_NAME = "worlds.npz"
+
+# 3^13 worlds is ~1.6M; the per-player role columns stay around 20 MB
+MAX_PLAYERS = 13
+
+# Fields whose change can alter the worlds a statement excludes
+LOGIC_FIELDS = {"status", "type", "conclusion", "hypothesis"}
+
+SAYS_PATTERN = re.compile(r'^(.+?) says:?\s*"(.+)"$')
+GAME_MANAGER_PATTERN = re.compile(r'^the game manager\b', re.IGNORECASE)
+
+
+class WorldSpace:
+    """All role assignments of a list of players, with lazily built columns."""
+
+    def __init__(self, players: list[str]):
+        self.players = list(players)
+        self.size = 3 ** len(self.players)
+        self._by_lower = {p.lower(): p for p in self.players}
+        self._columns: dict[str, np.ndarray] = {}
+
+    def player(self, name: str) -> str | None:
+        return self._by_lower.get(name.strip().lower())
+
+    def column(self, player: str) -> np.ndarray:
+        """Role code of player in every world (world w: digit i of w in base 3)."""
+        if player not in self._columns:
+            i = self.players.index(player)
+            worlds = np.arange(self.size, dtype=np.int64)
+            self._columns[player] = ((worlds // 3 ** i) % 3).astype(np.uint8)
+        return self._columns[player]
+
+
+def sentence_mask(text: str, parser: SentenceParser, space: WorldSpace) -> np.ndarray | None:
+    """Worlds in which one conclusion/hypothesis item holds (None if unparseable)."""
+    text = strip_reference(text).strip()
+    try:
+        m = SAYS_PATTERN.match(text)
+        if m:
+            if GAME_MANAGER_PATTERN.match(m.group(1)):
+                speaker = ""
+            else:
+                speaker = space.player(m.group(1))
+                if speaker is None:
+                    return None
+            expr = parser.parse(m.group(2), speaker or None)
+            mask = claim_constraint(type_claim(speaker=speaker, text=m.group(2), expr=expr), space.column)
+        else:
+            mask = evaluate(parser.parse(text), space.column)
+    except ParseError:
+        return None
+    return np.broadcast_to(mask, (space.size,))
+
+
+def statement_mask(statement: dict, parser: SentenceParser, space: WorldSpace) -> np.ndarray | None:
+    """Worlds consistent with a statement (hypothesis -> conclusion).
+
+    Returns:
+        Boolean mask, or None if any item is outside the parser's forms
+    """
+    conclusion = statement.get("conclusion") or []
+    if isinstance(conclusion, str):
+        conclusion = [conclusion]
+    if not conclusion:
+        return None
+
+    result = np.ones(space.size, dtype=bool)
+    for item in conclusion:
+        mask = sentence_mask(item, parser, space)
+        if mask is None:
+            return None
+        result &= mask
+
+    premise = np.ones(space.size, dtype=bool)
+    for item in statement.get("hypothesis") or []:
+        mask = sentence_mask(item, parser, space)
+        if mask is None:
+            return None
+        premise &= mask
+    return result | ~premise
+
+
+def is_applicable(statement: dict) -> bool:
+    """Whether a statement constrains the worlds (derived and proven true)."""
+    return statement.get("status") == "true" and statement.get("type") != "assumption"
+
+
+class WorldKnowledge:
+    """Mask of the worlds consistent with the true statements, kept in sync with the log."""
+
+    def __init__(self, puzzle_path: str | None = None, path: str | None = None):
+        """Load the stored mask for the puzzle (or start from all worlds).
+
+        Args:
+            puzzle_path: Puzzle file (default: the workspace's puzzle.md)
+            path: Mask file (default: worlds.npz in the workspace's index folder)
+
+        Raises:
+            FileNotFoundError: If the puzzle file does not exist
+            ValueError: If the puzzle has more than MAX_PLAYERS players
+        """
+        workspace = get_workspace()
+        puzzle_path = puzzle_path or workspace.puzzle_path
+        with open(puzzle_path, "r") as f:
+            self.puzzle_hash = content_hash(f.read())
+        puzzle = compile_puzzle(puzzle_path)
+        if not puzzle.players:
+            raise ValueError("Puzzle has no players")
+        if len(puzzle.players) > MAX_PLAYERS:
+            raise ValueError(f"Too many players for the world mask ({len(puzzle.players)} > {MAX_PLAYERS})")
+
+        self.path = path or os.path.join(workspace.index_folder, WORLDS_NAME)
+        self.space = WorldSpace(puzzle.players)
+        self.parser = SentenceParser(puzzle.players)
+        self.mask = np.ones(self.space.size, dtype=bool)
+        self.applied: set[str] = set()
+        self.last_log_id = ""
+        self.spool_seq = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("puzzle_hash") != self.puzzle_hash:
+                    return  # Different puzzle: start over
+                self.mask = np.unpackbits(data["mask"], count=self.space.size).astype(bool)
+        except (OSError, ValueError, KeyError):
+            return  # Corrupt file: treated as stale
+        self.applied = set(meta.get("applied", []))
+        self.last_log_id = meta.get("last_log_id", "")
+        self.spool_seq = meta.get("spool_seq", 0)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        meta = {"puzzle_hash": self.puzzle_hash, "last_log_id": self.last_log_id,
+                "spool_seq": self.spool_seq, "applied": sorted(self.applied)}
+        temp_path = self.path + ".tmp.npz"
+        np.savez_compressed(temp_path, mask=np.packbits(self.mask), meta=np.array(json.dumps(meta)))
+        os.replace(temp_path, self.path)
+
+    def apply(self, statement: dict) -> bool:
+        """Intersect the mask with a true statement. Returns True if it was understood."""
+        mask = statement_mask(statement, self.parser, self.space)
+        if mask is None:
+            return False
+        self.mask &= mask
+        self.applied.add(statement["id"])
+        return True
+
+    def rebuild(self) -> int:
+        """Recompute the mask from the statement files.
+
+        Returns:
+            Number of statements applied
+        """
+        from current import load_all_statements
+
+        self.mask = np.ones(self.space.size, dtype=bool)
+        self.applied = set()
+        for statement in load_all_statements():
+            if is_applicable(statement):
+                self.apply(statement)
+        self.last_log_id = IDManager().current_ids["l"]
+        self.spool_seq = last_seq()
+        self.save()
+        return len(self.applied)
+
+    def update(self, statement_ids: list[str], log_id: str, fields: dict[str, list[str]] | None = None) -> None:
+        """Apply changed statements incrementally (rebuilds if a world must come back)."""
+        folder = get_workspace().object_folders["s"]
+        pending = []
+        for statement_id in statement_ids:
+            file_path = os.path.join(folder, f"{statement_id}.json")
+            statement = None
+            if os.path.exists(file_path):
+                with open(file_path, "r") as f:
+                    statement = json.load(f)
+
+            if statement_id in self.applied:
+                changed = set((fields or {}).get(statement_id, LOGIC_FIELDS))
+                if statement is None or (changed & LOGIC_FIELDS):
+                    self.rebuild()
+                    return
+            elif statement is not None and is_applicable(statement):
+                pending.append(statement)
+
+        for statement in pending:
+            self.apply(statement)
+        self.last_log_id = log_id
+        self.save()
+
+    def ensure_current(self) -> None:
+        """Catch up with the config's log id (incrementally when the event spool allows)."""
+        current = IDManager().current_ids["l"]
+        if self.last_log_id == current:
+            return
+        events = events_since(self.last_log_id, current, self.spool_seq) if self.last_log_id else None
+        if events is None:
+            self.rebuild()
+            return
+        touched, fields = statements_touched(events)
+        self.spool_seq = events[-1]["seq"]
+        self.update(touched, current, fields)
+
+    def summary(self) -> dict:
+        """Remaining world count and per-player possible roles.
+
+        Returns:
+            {"total", "remaining", "possible": {player: [roles]}, "forced": {player: role}}
+        """
+        remaining = int(np.count_nonzero(self.mask))
+        possible = {}
+        for player in self.space.players:
+            codes = np.unique(self.space.column(player)[self.mask]) if remaining else []
+            possible[player] = [ROLES[c] for c in codes]
+        forced = {p: roles[0] for p, roles in possible.items() if len(roles) == 1}
+        return {"total": self.space.size, "remaining": remaining, "possible": possible, "forced": forced}
+
+
+def knowledge_summary() -> dict | None:
+    """Up-to-date summary (see WorldKnowledge.summary), or None if unavailable."""
+    try:
+        kb = WorldKnowledge()
+    except (FileNotFoundError, ValueError):
+        return None
+    kb.ensure_current()
+    return kb.summary()
+
+
+def display_knowledge(summary: dict) -> None:
+    """Print a knowledge summary."""
+    print("=== Possible Worlds ===")
+    print(f"\nRemaining worlds: {summary['remaining']} / {summary['total']}")
+    if summary["remaining"] == 0:
+        print("  [!] CONTRADICTION: no world is consistent with the true statements")
+        return
+    if summary["forced"]:
+        print("  Forced roles:")
+        for player, role in summary["forced"].items():
+            print(f"    - {player}: {role}")
+    undecided = {p: r for p, r in summary["possible"].items() if p not in summary["forced"]}
+    if undecided:
+        print("  Undecided:")
+        for player, roles in undecided.items():
+            print(f"    - {player}: {' / '.join(roles)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the possible worlds of the current puzzle")
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Recompute the mask from the statement files')
+    add_workspace_argument(parser)
+
+    args = parser.parse_args()
+    if args.workspace:
+        set_workspace(args.workspace)
+
+    kb = WorldKnowledge()
+    if args.rebuild:
+        count = kb.rebuild()
+        print(f"Rebuilt world mask: {count} statements applied")
+    else:
+        kb.ensure_current()
+    display_knowledge(kb.summary())